@@ -0,0 +1,118 @@
+"""
+IDS alert enrichment: subscriber lookup per alert.
+
+Uses the benchmark suite's radacct dataset and synthesizes alerts whose
+source IPs belong to subscribers, spread over the accounting period, so
+most of them land inside (or between) recorded sessions. Compares:
+  * per-alert query: one radacct query per alert on the indexed
+    framedipaddress column (what looking it up by hand amounts to),
+    timed on a sample and extrapolated;
+  * SubscriberService.enrich_alerts: one batched query per 1000 IPs, then
+    an in-memory bisect per alert.
+On the sample, the answers are compared. They differ only where the
+per-alert query credits a session that was never stopped even though a
+later session on the same IP had already started (and ended) before the
+alert; the index treats such a session as over at that point.
+
+Run from the controller directory:
+    python -m benchmarks.alert_enrichment --alerts 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.datasets import SCALES, default_data_dir, prepare, _client_ip
+
+def make_alerts(count: int, users: int, rng: random.Random) -> list:
+    end = datetime(2026, 3, 1)
+    span = 90 * 86400
+    alerts = []
+    for _ in range(count):
+        ts = end - timedelta(seconds=rng.randrange(span))
+        alerts.append({
+            "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%S.%f+0000"),
+            "source_ip": _client_ip(rng.randrange(users)),
+            "dest_ip": f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            "signature": "ET SCAN Suspicious inbound",
+            "severity": 2
+        })
+    return alerts
+
+async def per_alert_owner(db, alert: dict):
+    from sqlalchemy import select, or_
+    from models.db import RadAcct
+    from services.subscriber_index import parse_alert_time
+
+    when = parse_alert_time(alert["timestamp"])
+    for key in ("source_ip", "dest_ip"):
+        # Latest session on the IP that started before the alert and hadn't stopped
+        row = (await db.execute(
+            select(RadAcct.username).where(RadAcct.framedipaddress == alert[key])
+            .where(RadAcct.acctstarttime <= when)
+            .where(or_(RadAcct.acctstoptime == None, RadAcct.acctstoptime >= when))
+            .order_by(RadAcct.acctstarttime.desc()).limit(1)
+        )).first()
+        if row is not None:
+            return row[0]
+    return None
+
+async def run(args):
+    from sqlalchemy import select, func
+    import database
+    from models.db import RadAcct
+    from services.subscriber_index import SubscriberService
+
+    # Datasets generated before framedipaddress was indexed
+    for index in RadAcct.__table__.indexes:
+        index.create(database.engine, checkfirst=True)
+
+    rng = random.Random(args.seed)
+    users = SCALES[args.scale]["radcheck"]
+    alerts = make_alerts(args.alerts, users, rng)
+    sample = alerts[:args.sample]
+
+    async with database.AsyncSessionLocal() as db:
+        sessions = await db.scalar(select(func.count()).select_from(RadAcct))
+        print(f"{sessions} radacct rows, {len(alerts)} alerts")
+
+        start = time.perf_counter()
+        naive = [await per_alert_owner(db, a) for a in sample]
+        per_alert = (time.perf_counter() - start) / len(sample)
+        print(f"per-alert query   {per_alert * 1e6:9.1f} us/alert  -> {per_alert * len(alerts):8.2f} s for {len(alerts)} alerts "
+              f"({2 * len(alerts)} queries at most)")
+
+        SubscriberService._cached = None
+        start = time.perf_counter()
+        await SubscriberService.enrich_alerts(db, alerts)
+        batched = time.perf_counter() - start
+        matched = sum(1 for a in alerts if a["subscriber"])
+        queries = -(-len({a[k] for a in alerts for k in ("source_ip", "dest_ip")}) // 1000)
+        print(f"batched + index   {batched / len(alerts) * 1e6:9.1f} us/alert  -> {batched:8.2f} s for {len(alerts)} alerts "
+              f"({queries} queries), {matched} attributed")
+
+        start = time.perf_counter()
+        await SubscriberService.enrich_alerts(db, alerts)
+        print(f"  again (cached)  {(time.perf_counter() - start):8.2f} s")
+
+    mismatches = [(n, a["subscriber"] and a["subscriber"]["username"]) for n, a in zip(naive, sample)
+                  if n != (a["subscriber"] and a["subscriber"]["username"])]
+    print(f"sample of {len(sample)}: {len(sample) - len(mismatches)} identical, {len(mismatches)} differ")
+    for n, b in mismatches[:5]:
+        print(f"  per-alert {n!r} vs index {b!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--data-dir")
+    parser.add_argument("--alerts", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=500, help="Alerts looked up one query at a time")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    prepare(args.data_dir or default_data_dir(args.scale), args.scale)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Bulk VLAN provisioning benchmark.
+
+Run from the controller directory:
+    python -m benchmarks.bulk_vlan --count 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NetplanService.create_vlans_bulk")
+    parser.add_argument("--count", type=int, default=1000, help="Number of VLANs to generate")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of timed rounds")
+    args = parser.parse_args()
+
+    # Generated files go to a throwaway host root, never the real /host-fs
+    os.environ["HOST_FS_ROOT"] = tempfile.mkdtemp(prefix="uac-bench-")
+
+    from models.network import VlanBulkCreate
+    from services.netplan import NetplanService
+
+    request = VlanBulkCreate(
+        parent_interface="eth1",
+        vlan_start=1,
+        vlan_end=args.count,
+        ip_cidr_template="10.{vlan_hi}.{vlan_lo}.1/24",
+        dhcp_server_enabled=True
+    )
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        result = NetplanService.create_vlans_bulk(request)
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    print(f"VLANs per round: {result['count']}")
+    print(f"best: {timings[0] * 1000:.1f} ms  median: {timings[len(timings) // 2] * 1000:.1f} ms  worst: {timings[-1] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
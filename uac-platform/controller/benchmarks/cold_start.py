@@ -0,0 +1,95 @@
+"""
+Worker start-up time.
+
+Measures, over several runs:
+  * fresh process: interpreter start + `import main` + lifespan startup,
+    as a worker spawned without preloading pays it;
+  * forked worker: fork from a master that already imported the app, then
+    lifespan startup, as gunicorn --preload workers (serve.py) pay it.
+
+Both run against a throwaway SQLite database so no MySQL is needed.
+
+Run from the controller directory:
+    python -m benchmarks.cold_start --runs 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FRESH_WORKER = """
+import time, asyncio
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+asyncio.run(boot())
+print(f"{t1 - t0} {time.perf_counter() - t1}")
+"""
+
+def fresh_process(env: dict) -> tuple:
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", FRESH_WORKER], env=env, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - start
+    import_sec, lifespan_sec = map(float, out.stdout.strip().splitlines()[-1].split())
+    return total, import_sec, lifespan_sec
+
+def forked_worker(app) -> float:
+    read_fd, write_fd = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+
+        async def boot():
+            async with app.router.lifespan_context(app):
+                os.write(write_fd, b"ready")
+
+        asyncio.run(boot())
+        os._exit(0)
+    os.close(write_fd)
+    os.read(read_fd, 5)
+    elapsed = time.perf_counter() - start
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    return elapsed
+
+def summary(values) -> str:
+    return f"median {statistics.median(values) * 1000:7.1f} ms  min {min(values) * 1000:7.1f} ms  max {max(values) * 1000:7.1f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uac-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'radius.db')}",
+        "UAC_CONFIG_DB": os.path.join(workdir, "config.db"),
+        "HOST_FS_ROOT": workdir,
+        "DB_AUTO_CREATE": "1",
+    })
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    fresh_process(env)  # creates the tables and warms the OS page cache
+    env["DB_AUTO_CREATE"] = "0"
+    os.environ["DB_AUTO_CREATE"] = "0"
+
+    fresh = [fresh_process(env) for _ in range(args.runs)]
+    print(f"fresh process, total        {summary([f[0] for f in fresh])}")
+    print(f"  of which import main      {summary([f[1] for f in fresh])}")
+    print(f"  of which lifespan startup {summary([f[2] for f in fresh])}")
+
+    import main as controller
+    controller.prepare_database()
+    controller.engine.dispose()
+    forked = [forked_worker(controller.app) for _ in range(args.runs)]
+    print(f"forked from preloaded app   {summary(forked)}")
+
+if __name__ == "__main__":
+    main()
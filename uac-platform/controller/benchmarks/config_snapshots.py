@@ -0,0 +1,135 @@
+"""
+Config snapshots: recording, diffing and rolling back with a long history.
+
+Copies the benchmark suite's config store and host files, generates the
+netplan/chilli, firewall and WireGuard files from them, then makes
+--versions changes (firewall policy pushes, VPN peer adds/removals,
+profile edits followed by a netplan regeneration), recording a version
+after each one. Reports the cost of recording, of diffing random pairs
+of versions, and of rolling back to versions of increasing age; every
+rollback is checked by capturing the state again and comparing it with
+the target version's manifest.
+
+Run from the controller directory:
+    python -m benchmarks.config_snapshots --scale small --versions 2000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.datasets import SCALES, configure_environment, default_data_dir, prepare
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+def _percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"median {statistics.median(samples) * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--data-dir")
+    parser.add_argument("--versions", type=int, default=2000)
+    parser.add_argument("--diffs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or default_data_dir(args.scale)
+    prepare(data_dir, args.scale)
+    workdir = tempfile.mkdtemp(prefix="uac-snapshot-bench-")
+    shutil.copy(os.path.join(data_dir, "config.db"), os.path.join(workdir, "config.db"))
+    shutil.copytree(os.path.join(data_dir, "host-fs"), os.path.join(workdir, "host-fs"))
+    configure_environment(data_dir)
+    os.environ["UAC_CONFIG_DB"] = os.path.join(workdir, "config.db")
+    os.environ["HOST_FS_ROOT"] = os.path.join(workdir, "host-fs")
+    os.environ["HOST_WG_DIR"] = os.path.join(workdir, "host-fs", "etc", "wireguard")
+    os.environ["SNAPSHOT_DIR"] = os.path.join(workdir, "snapshots")
+
+    from models.firewall import FirewallPolicy, FirewallRule
+    from models.network import VpnPeer
+    from services.config_snapshots import ConfigSnapshotService, _is_tracked, _tracked_dirs
+    from services.config_store import ConfigStore
+    from services.firewall import FirewallService, SUPPORTED_APPS
+    from services.hardware import HardwareService
+    from services.netplan import NetplanService
+    from services.vpn import VpnConfigService
+
+    rng = random.Random(args.seed)
+    NetplanService.generate_from_profiles()
+    FirewallService.generate_rules()
+    VpnConfigService.apply_configs()
+    tracked = sum(1 for d, patterns in _tracked_dirs().items() if os.path.isdir(d) for n in os.listdir(d) if _is_tracked(patterns, n))
+
+    start = time.perf_counter()
+    first = ConfigSnapshotService.record("initial")
+    print(f"initial version: {tracked} tracked files, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    record_times, kinds = [], {"firewall": 0, "vpn": 0, "network": 0}
+    for i in range(args.versions):
+        kind = rng.choice(("firewall", "firewall", "vpn", "vpn", "network"))
+        kinds[kind] += 1
+        if kind == "firewall":
+            rules = [FirewallRule(app_id=a.id, action="DROP", enabled=True) for a in rng.sample(SUPPORTED_APPS, rng.randrange(1, 5))]
+            FirewallService.update_policy(FirewallPolicy(rules=rules))
+            FirewallService.generate_rules()
+        elif kind == "vpn":
+            peers = VpnConfigService.get_all_peers()
+            name = f"bench-{rng.randrange(50):02d}"
+            if any(p["name"] == name for p in peers):
+                VpnConfigService.delete_peer(name)
+            else:
+                VpnConfigService.add_peer(VpnPeer(
+                    name=name, mode="L3", endpoint=f"203.0.113.{rng.randrange(1, 255)}:51820",
+                    public_key="%043x=" % rng.getrandbits(172), allowed_ips=f"10.250.{i % 250}.{rng.randrange(64) * 4}/30"
+                ))
+            VpnConfigService.apply_configs()
+        else:
+            profiles = HardwareService.get_network_profiles()
+            profile = rng.choice(profiles)
+            profile["dhcp_server_enabled"] = not profile.get("dhcp_server_enabled")
+            HardwareService.save_network_profile(profile)
+            NetplanService.generate_from_profiles()
+
+        start = time.perf_counter()
+        ConfigSnapshotService.record(f"bench:{kind}")
+        record_times.append(time.perf_counter() - start)
+
+    latest = ConfigSnapshotService.list_versions(limit=1)[0]["version"]
+    blobs = sum(len(files) for _, _, files in os.walk(os.path.join(os.environ["SNAPSHOT_DIR"], "objects")))
+    print(f"{latest} versions ({kinds}); {blobs} blobs, {_dir_size(os.environ['SNAPSHOT_DIR']) / 1e6:.1f} MB on disk, "
+          f"config.db {os.path.getsize(os.environ['UAC_CONFIG_DB']) / 1e6:.1f} MB")
+    print(f"record                {_percentiles(record_times)}")
+
+    for content in (False, True):
+        ConfigSnapshotService._trees.clear()
+        diff_times = []
+        for _ in range(args.diffs):
+            a, b = rng.randrange(first["version"], latest + 1), rng.randrange(first["version"], latest + 1)
+            start = time.perf_counter()
+            ConfigSnapshotService.diff(a, b, content=content)
+            diff_times.append(time.perf_counter() - start)
+        print(f"diff{' + patches' if content else '          '}      {_percentiles(diff_times)}  ({args.diffs} random pairs, cold cache)")
+
+    print(f"\n{'rollback to':<22} {'time':>10}  files restored/removed  collections  verified")
+    targets = [first["version"], latest // 4, latest // 2, latest - 10, latest - 1]
+    for target in targets:
+        result = ConfigSnapshotService.rollback(target)
+        ConfigStore.reset_cache()
+        expected = ConfigSnapshotService._row(target)[3]
+        verified = result["version"] and ConfigSnapshotService._row(result["version"])[3] == expected
+        print(f"version {target:<14} {result['duration_ms']:7.1f} ms  {len(result['files_restored']):>9} / {len(result['files_removed']):<12}"
+              f"{len(result['collections']):>11}  {verified}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Synthetic, reproducible datasets for the benchmark suite.
+
+Everything is generated under one data directory and the controller is
+pointed at it through its environment variables (DATABASE_URL,
+UAC_CONFIG_DB, HOST_FS_ROOT, HOST_WG_DIR, SYS_CLASS_NET, SURICATA_LOG,
+SNORT_LOG), so no real host paths or external services are touched.
+A manifest records the parameters; an existing dataset with the same
+parameters is reused instead of being generated again.
+
+Generate on its own (from the controller directory):
+    python -m benchmarks.datasets --scale large --data-dir /var/tmp/uac-bench
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCALES = {
+    "small": {"radacct": 200_000, "radcheck": 10_000, "eve_mb": 32, "ports": 48, "profiles": 100, "peers": 300},
+    "medium": {"radacct": 1_000_000, "radcheck": 100_000, "eve_mb": 512, "ports": 256, "profiles": 250, "peers": 500},
+    "large": {"radacct": 5_000_000, "radcheck": 100_000, "eve_mb": 4096, "ports": 512, "profiles": 500, "peers": 1000},
+}
+
+SEED = 20240101
+BATCH_ROWS = 50_000
+
+SIGNATURES = [
+    ("ET MALWARE Suspicious User-Agent", "A Network Trojan was detected", 1),
+    ("ET SCAN Nmap Scripting Engine User-Agent Detected", "Web Application Attack", 2),
+    ("ET POLICY SSH session in progress on Unusual Port", "Potential Corporate Privacy Violation", 2),
+    ("GPL ICMP_INFO PING *NIX", "Misc activity", 3),
+    ("ET DNS Query for .onion proxy Domain", "Potentially Bad Traffic", 2),
+]
+
+def default_data_dir(scale: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"uac-bench-{scale}")
+
+def configure_environment(data_dir: str):
+    """ Must run before any controller module is imported (paths are read at import time) """
+    env = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(data_dir, 'radius.db')}",
+        "UAC_CONFIG_DB": os.path.join(data_dir, "config.db"),
+        "HOST_FS_ROOT": os.path.join(data_dir, "host-fs"),
+        "HOST_WG_DIR": os.path.join(data_dir, "host-fs", "etc", "wireguard"),
+        "SYS_CLASS_NET": os.path.join(data_dir, "sys", "class", "net"),
+        "SURICATA_LOG": os.path.join(data_dir, "log", "suricata", "eve.json"),
+        "SNORT_LOG": os.path.join(data_dir, "log", "snort", "alert_json.txt"),
+        "RADACCT_ARCHIVE_DIR": os.path.join(data_dir, "radacct-archive"),
+        "SNAPSHOT_DIR": os.path.join(data_dir, "snapshots"),
+    }
+    os.environ.update(env)
+    # Measure the endpoints themselves; a Redis that isn't there would only add connect timeouts
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    for key in ("HOST_FS_ROOT", "HOST_WG_DIR", "SYS_CLASS_NET"):
+        os.makedirs(env[key], exist_ok=True)
+    os.makedirs(os.path.dirname(env["SURICATA_LOG"]), exist_ok=True)
+    os.makedirs(os.path.dirname(env["SNORT_LOG"]), exist_ok=True)
+    return env
+
+def _mac(i: int) -> str:
+    return "02:%02x:%02x:%02x:%02x:%02x" % ((i >> 32) & 0xFF, (i >> 24) & 0xFF, (i >> 16) & 0xFF, (i >> 8) & 0xFF, i & 0xFF)
+
+def _client_ip(i: int) -> str:
+    return f"10.{64 + (i >> 16) % 64}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+
+def _create_schema():
+    import database
+    from models.db import Base
+    Base.metadata.create_all(bind=database.engine)
+
+def generate_radcheck(db_path: str, users: int):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("DELETE FROM radcheck")
+    conn.execute("DELETE FROM radreply")
+    conn.executemany(
+        "INSERT INTO radcheck (username, attribute, op, value) VALUES (?, 'Cleartext-Password', ':=', ?)",
+        ((f"user{i:06d}", f"pw-{i:06d}") for i in range(users))
+    )
+    conn.executemany(
+        "INSERT INTO radreply (username, attribute, op, value) VALUES (?, 'Session-Timeout', '=', ?)",
+        ((f"user{i:06d}", str(3600 * (1 + i % 8))) for i in range(0, users, 2))
+    )
+    conn.commit()
+    conn.close()
+
+def generate_radacct(db_path: str, rows: int, users: int, rng: random.Random):
+    """ Sessions spread over the last 90 days; ~3% are still open (no stop time) """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("DELETE FROM radacct")
+    now = datetime(2026, 3, 1)
+    span = 90 * 86400
+    # radacctid is a BIGINT key, which SQLite does not auto-number, so ids are explicit
+    sql = ("INSERT INTO radacct (radacctid, acctsessionid, username, acctstarttime, acctupdatetime, acctstoptime, acctsessiontime, "
+           "acctinputoctets, acctoutputoctets, callingstationid, framedipaddress) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    for offset in range(0, rows, BATCH_ROWS):
+        batch = []
+        for i in range(offset, min(rows, offset + BATCH_ROWS)):
+            user = rng.randrange(users)
+            start = now - timedelta(seconds=span * (rows - i) // rows)
+            duration = rng.randrange(60, 8 * 3600)
+            active = rng.random() < 0.03
+            stop = None if active else start + timedelta(seconds=duration)
+            batch.append((
+                i + 1, f"{i:016x}", f"user{user:06d}", str(start), str(start + timedelta(seconds=min(duration, 300))),
+                None if stop is None else str(stop), duration,
+                rng.randrange(1 << 20, 1 << 30), rng.randrange(1 << 22, 1 << 32),
+                _mac(user).replace(":", "-").upper(), _client_ip(user)
+            ))
+        conn.executemany(sql, batch)
+    conn.commit()
+    conn.close()
+
+def generate_eve(path: str, size_mb: int, rng: random.Random):
+    """ Suricata eve.json with a realistic mix: mostly flow/dns/http, ~10% alerts """
+    target = size_mb * 1024 * 1024
+    base = datetime(2026, 3, 1)
+    written = 0
+    chunk = []
+    with open(path, "w") as f:
+        i = 0
+        while written < target:
+            ts = (base + timedelta(milliseconds=i * 7)).strftime("%Y-%m-%dT%H:%M:%S.%f+0000")
+            src = _client_ip(rng.randrange(200_000))
+            dest = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            roll = rng.random()
+            if roll < 0.10:
+                signature, category, severity = SIGNATURES[rng.randrange(len(SIGNATURES))]
+                event = {"timestamp": ts, "flow_id": i, "event_type": "alert", "src_ip": src, "src_port": rng.randrange(1024, 65535),
+                         "dest_ip": dest, "dest_port": 443, "proto": "TCP",
+                         "alert": {"action": "allowed", "gid": 1, "signature_id": 2000000 + rng.randrange(50000), "rev": 1,
+                                   "signature": signature, "category": category, "severity": severity}}
+            elif roll < 0.55:
+                event = {"timestamp": ts, "flow_id": i, "event_type": "flow", "src_ip": src, "src_port": rng.randrange(1024, 65535),
+                         "dest_ip": dest, "dest_port": 443, "proto": "TCP", "app_proto": "tls",
+                         "flow": {"pkts_toserver": rng.randrange(1, 500), "pkts_toclient": rng.randrange(1, 800),
+                                  "bytes_toserver": rng.randrange(60, 1 << 20), "bytes_toclient": rng.randrange(60, 1 << 24),
+                                  "state": "closed", "reason": "timeout"}}
+            elif roll < 0.85:
+                event = {"timestamp": ts, "flow_id": i, "event_type": "dns", "src_ip": src, "src_port": rng.randrange(1024, 65535),
+                         "dest_ip": "10.0.0.1", "dest_port": 53, "proto": "UDP",
+                         "dns": {"type": "query", "id": rng.randrange(65536), "rrname": f"host{rng.randrange(10000)}.example.com", "rrtype": "A"}}
+            else:
+                event = {"timestamp": ts, "flow_id": i, "event_type": "http", "src_ip": src, "src_port": rng.randrange(1024, 65535),
+                         "dest_ip": dest, "dest_port": 80, "proto": "TCP",
+                         "http": {"hostname": f"site{rng.randrange(5000)}.example.org", "url": "/index.html", "http_method": "GET",
+                                  "status": 200, "length": rng.randrange(100, 100000)}}
+            line = json.dumps(event, separators=(",", ":")) + "\n"
+            chunk.append(line)
+            written += len(line)
+            i += 1
+            if len(chunk) >= 10_000:
+                f.write("".join(chunk))
+                chunk = []
+        f.write("".join(chunk))
+
+def generate_snort(path: str, lines: int, rng: random.Random):
+    with open(path, "w") as f:
+        for i in range(lines):
+            signature, category, severity = SIGNATURES[rng.randrange(len(SIGNATURES))]
+            f.write(json.dumps({"timestamp": f"26/03/01-10:{i // 60 % 60:02d}:{i % 60:02d}.00000", "action": "allow",
+                                "src_addr": _client_ip(rng.randrange(200_000)), "dst_addr": "104.28.14.3",
+                                "class_desc": category, "msg": signature, "priority": severity}) + "\n")
+
+def generate_host_state(ports: int, profiles: int, peers: int, rng: random.Random):
+    """ Synthetic sysfs ports, saved profiles/port assignments, netplan VLANs and VPN peers """
+    from models.network import VlanBulkCreate
+    from services.hardware import SYS_CLASS_NET, ports_collection, profiles_collection
+    from services.netplan import NetplanService
+    from services.vpn import peers_collection
+
+    for i in range(ports):
+        port_dir = os.path.join(SYS_CLASS_NET, f"eth{i}")
+        os.makedirs(port_dir, exist_ok=True)
+        for name, value in (("address", _mac(i)), ("operstate", "up" if i % 5 else "down"), ("speed", "10000" if i < 4 else "1000")):
+            with open(os.path.join(port_dir, name), "w") as f:
+                f.write(value + "\n")
+
+    profile_items = [
+        (f"profile-{i:04d}", {
+            "id": f"profile-{i:04d}", "name": f"Profile {i}", "vlan_id": 1000 + i,
+            "ip_cidr": f"10.{(1000 + i) >> 8}.{(1000 + i) & 0xFF}.1/24", "dhcp_server_enabled": i % 2 == 0
+        })
+        for i in range(profiles)
+    ]
+    profiles_collection.replace_all(profile_items)
+
+    port_items = []
+    for i in range(ports):
+        port = {"name": f"eth{i}", "mac_address": _mac(i), "operstate": "up" if i % 5 else "down",
+                "speed": 10000 if i < 4 else 1000,
+                "assigned_profile_id": profile_items[i % profiles][0] if profiles and i >= 2 else None}
+        port_items.append((port["name"], port))
+    ports_collection.replace_all(port_items)
+
+    if profiles:
+        NetplanService.create_vlans_bulk(VlanBulkCreate(
+            parent_interface="eth1", vlan_start=2000, vlan_end=2000 + profiles - 1,
+            ip_cidr_template="172.{vlan_hi}.{vlan_lo}.1/24", dhcp_server_enabled=True
+        ))
+
+    peer_items = []
+    for i in range(peers):
+        l2 = i % 10 == 0
+        peer_items.append((f"site-{i:04d}", {
+            "name": f"site-{i:04d}", "mode": "L2" if l2 else "L3",
+            "endpoint": f"198.51.{i >> 8}.{i & 0xFF}:51820",
+            "public_key": "%043x=" % rng.getrandbits(172),
+            "allowed_ips": None if l2 else f"10.200.{i >> 6}.{(i & 0x3F) * 4}/30",
+            "target_vlan": "vlan100" if l2 else None, "is_active": True
+        }))
+    peers_collection.replace_all(peer_items)
+
+def prepare(data_dir: str, scale: str, force: bool = False) -> dict:
+    """ Generates (or reuses) the dataset for `scale` and returns its manifest """
+    params = dict(SCALES[scale], scale=scale, seed=SEED)
+    env = configure_environment(data_dir)
+    manifest_path = os.path.join(data_dir, "manifest.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            return manifest
+
+    timings = {}
+    rng = random.Random(SEED)
+    db_path = env["DATABASE_URL"][len("sqlite:///"):]
+
+    start = time.perf_counter()
+    _create_schema()
+    generate_radcheck(db_path, params["radcheck"])
+    timings["radcheck"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_radacct(db_path, params["radacct"], params["radcheck"], rng)
+    timings["radacct"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_eve(env["SURICATA_LOG"], params["eve_mb"], rng)
+    generate_snort(env["SNORT_LOG"], 1000, rng)
+    timings["ids_logs"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_host_state(params["ports"], params["profiles"], params["peers"], rng)
+    timings["host_state"] = time.perf_counter() - start
+
+    manifest = {"params": params, "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "generation_sec": {k: round(v, 2) for k, v in timings.items()}}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--data-dir", help="Defaults to a per-scale directory under the system temp dir")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if a matching dataset exists")
+    args = parser.parse_args()
+    data_dir = args.data_dir or default_data_dir(args.scale)
+    manifest = prepare(data_dir, args.scale, force=args.force)
+    print(f"Dataset in {data_dir}")
+    print(json.dumps(manifest, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Load test for the database-backed routers: the legacy sync `def` handlers
+(SessionLocal, one Starlette threadpool slot held per request while it waits
+on the database) against the async handlers on the aiosqlite engine.
+
+A per-statement delay emulates the MySQL round-trip: the tables are exposed
+through views that call a `bench_delay()` SQL function, so the wait happens
+in the driver thread exactly where a network wait would. The peak number of
+statements waiting at the same time is the effective concurrency limit.
+
+Run from the controller directory:
+    python -m benchmarks.db_concurrency --requests 3000 --concurrency 200 --latency-ms 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+class DelayProbe:
+    """ SQL function that sleeps and tracks how many statements wait at once """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        return 1
+
+    def reset(self):
+        self.peak = 0
+
+def seed(path: str, rows: int, users: int):
+    import sqlite3
+    from datetime import datetime, timedelta
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE radacct_data (radacctid INTEGER PRIMARY KEY, acctsessionid TEXT NOT NULL, username TEXT,
+            acctstarttime DATETIME, acctupdatetime DATETIME, acctstoptime DATETIME, acctsessiontime INTEGER,
+            acctinputoctets BIGINT, acctoutputoctets BIGINT, callingstationid TEXT, framedipaddress TEXT);
+        CREATE INDEX ix_radacct_stop ON radacct_data (acctstoptime);
+        CREATE TABLE radcheck_data (id INTEGER PRIMARY KEY, username TEXT NOT NULL, attribute TEXT NOT NULL,
+            op TEXT NOT NULL, value TEXT NOT NULL);
+        CREATE INDEX ix_radcheck_user ON radcheck_data (username);
+        CREATE TABLE radreply_data (id INTEGER PRIMARY KEY, username TEXT NOT NULL, attribute TEXT NOT NULL,
+            op TEXT NOT NULL, value TEXT NOT NULL);
+        CREATE INDEX ix_radreply_user ON radreply_data (username);
+        -- The uncorrelated subquery runs once per statement, not per row
+        CREATE VIEW radacct AS SELECT * FROM radacct_data WHERE (SELECT bench_delay());
+        CREATE VIEW radcheck AS SELECT * FROM radcheck_data WHERE (SELECT bench_delay());
+        CREATE VIEW radreply AS SELECT * FROM radreply_data WHERE (SELECT bench_delay());
+    """)
+    start = datetime(2024, 1, 1)
+    conn.executemany(
+        "INSERT INTO radacct_data VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (f"s{i}", f"user{i % users}", start + timedelta(minutes=i), None,
+             None if i % 10 == 0 else start + timedelta(minutes=i + 30), 1800,
+             i * 1024, i * 4096, f"02-00-00-00-{i // 256 % 256:02X}-{i % 256:02X}", f"10.0.{i // 256 % 256}.{i % 256}")
+            for i in range(rows)
+        )
+    )
+    conn.executemany(
+        "INSERT INTO radcheck_data VALUES (NULL, ?, 'Cleartext-Password', ':=', 'secret')",
+        ((f"user{i}",) for i in range(users))
+    )
+    conn.executemany(
+        "INSERT INTO radreply_data VALUES (NULL, ?, 'Session-Timeout', '=', '3600')",
+        ((f"user{i}",) for i in range(users))
+    )
+    conn.commit()
+    conn.close()
+
+async def storm(client, paths, total: int, concurrency: int):
+    latencies = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            path = paths[remaining % len(paths)]
+            t = time.perf_counter()
+            response = await client.get(path)
+            assert response.status_code == 200, (path, response.status_code, response.text)
+            latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+def report(label: str, latencies, elapsed: float, peak: int):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<34} {len(latencies) / elapsed:8.0f} req/s  p50 {statistics.median(latencies) * 1000:7.1f} ms"
+          f"  p99 {p99:7.1f} ms  peak in DB {peak}")
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="uac-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    seed(db_path, args.rows, args.users)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # Size the pool above the load so it is not what limits either variant
+    os.environ.setdefault("DB_POOL_SIZE", str(args.concurrency))
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+
+    import httpx
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy import event, func
+    from sqlalchemy.orm import Session
+    import database
+    from models.db import RadAcct, RadCheck, RadReply
+    from routers import analytics, radius
+
+    probe = DelayProbe(args.latency_ms / 1000)
+
+    def register(dbapi_connection, _record):
+        dbapi_connection.create_function("bench_delay", 0, probe)
+
+    event.listen(database.engine, "connect", register)
+    event.listen(database.async_engine.sync_engine, "connect", register)
+
+    app = FastAPI()
+    app.include_router(analytics.router)
+    app.include_router(radius.router)
+
+    # The handlers as they were before the async port
+    @app.get("/legacy/analytics/summary")
+    def legacy_summary(db: Session = Depends(database.get_db)):
+        active = db.query(RadAcct).filter(RadAcct.acctstoptime == None).count()
+        total_input = db.query(func.sum(RadAcct.acctinputoctets)).scalar() or 0
+        total_output = db.query(func.sum(RadAcct.acctoutputoctets)).scalar() or 0
+        recent = db.query(RadAcct).filter(RadAcct.acctstoptime != None).order_by(RadAcct.acctstoptime.desc()).limit(10).all()
+        return {"active_users": active, "total_bytes": total_input + total_output, "recent": [s.username for s in recent]}
+
+    @app.get("/legacy/radius/users/{username}")
+    def legacy_user(username: str, db: Session = Depends(database.get_db)):
+        checks = db.query(RadCheck).filter(RadCheck.username == username).all()
+        replies = db.query(RadReply).filter(RadReply.username == username).all()
+        if not checks and not replies:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {"username": username, "checks": [c.attribute for c in checks], "replies": [r.attribute for r in replies]}
+
+    user_paths = [f"/radius/users/user{i}" for i in range(0, args.users, max(1, args.users // 100))]
+    scenarios = [
+        ("before: sync /analytics/summary", ["/legacy/analytics/summary"]),
+        ("after:  async /analytics/summary", ["/analytics/summary"]),
+        ("before: sync /radius/users/{u}", ["/legacy" + p for p in user_paths]),
+        ("after:  async /radius/users/{u}", user_paths),
+    ]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.latency_ms} ms per statement, "
+          f"pool {database.DB_POOL_SIZE}+{database.DB_MAX_OVERFLOW}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label, paths in scenarios:
+            await storm(client, paths, min(args.concurrency, args.requests), args.concurrency)  # warm the pools
+            probe.reset()
+            latencies, elapsed = await storm(client, paths, args.requests, args.concurrency)
+            report(label, latencies, elapsed, probe.peak)
+
+    await database.async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Captive-portal login storm benchmark against a local stub RADIUS responder.
+
+The stub accepts "pass-<username>" for every user and replies with a
+Session-Timeout, so the full client path (password hiding, ID multiplexing,
+response authenticator checks) is exercised without FreeRADIUS.
+
+Run from the controller directory:
+    python -m benchmarks.portal_login --logins 20000 --concurrency 500
+"""
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import tempfile
+import time
+
+SECRET = b"bench-secret"
+
+class StubRadiusServer(asyncio.DatagramProtocol):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+
+    def datagram_received(self, data, addr):
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.reply, data, addr)
+        else:
+            self.reply(data, addr)
+
+    def reply(self, data, addr):
+        from services import radius_client as rc
+
+        if self.transport.is_closing():
+            return
+        identifier, authenticator = data[1], data[4:20]
+        attrs = dict(rc.decode_attributes(data[20:]))
+        username = attrs[rc.ATTR_USER_NAME].decode()
+        password = rc.reveal_password(attrs[rc.ATTR_USER_PASSWORD], SECRET, authenticator).decode()
+
+        if password == f"pass-{username}":
+            code, reply_attrs = rc.ACCESS_ACCEPT, rc.encode_attribute(rc.ATTR_SESSION_TIMEOUT, struct.pack("!I", 3600))
+        else:
+            code, reply_attrs = rc.ACCESS_REJECT, b""
+        packet = struct.pack("!BBH", code, identifier, 20 + len(reply_attrs)) + authenticator + reply_attrs
+        packet = packet[:4] + rc.response_authenticator(packet, authenticator, SECRET) + packet[20:]
+        self.transport.sendto(packet, addr)
+
+def report(label: str, latencies: list, elapsed: float):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<28} {len(latencies) / elapsed:>9.0f} logins/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+async def storm(total: int, concurrency: int, login):
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await login(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: StubRadiusServer(args.delay), local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+
+    os.environ["UAC_CONFIG_DB"] = os.path.join(tempfile.mkdtemp(prefix="uac-bench-"), "config.db")
+    from services import radius_client
+    radius_client.RADIUS_HOST, radius_client.RADIUS_AUTH_PORT = "127.0.0.1", port
+    radius_client.RADIUS_SECRET = SECRET.decode()
+
+    pool = radius_client.RadiusClientPool("127.0.0.1", port, SECRET.decode())
+
+    async def direct(i):
+        result = await pool.authenticate(f"user{i}", f"pass-user{i}", calling_station_id=f"02-00-00-00-{i // 256 % 256:02X}-{i % 256:02X}")
+        assert result.accepted
+
+    latencies, elapsed = await storm(args.logins, args.concurrency, direct)
+    report("RADIUS client (pooled)", latencies, elapsed)
+    pool.close()
+
+    import httpx
+    from fastapi import FastAPI
+    # The ASGI client connects from 127.0.0.1: let it pass each simulated client's address along
+    os.environ["PORTAL_TRUSTED_PROXIES"] = "127.0.0.1"
+    from routers import portal
+    from services.portal_auth import PortalAuthService
+    PortalAuthService._pool = radius_client.RadiusClientPool("127.0.0.1", port, SECRET.decode())
+    PortalAuthService._pool_loop = loop
+
+    app = FastAPI()
+    app.include_router(portal.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def via_http(i):
+            response = await client.post("/portal/login", json={
+                "username": f"user{i}", "password": f"pass-user{i}", "terms_accepted": True,
+                "mac": f"02-00-00-{i // 65536 % 256:02X}-{i // 256 % 256:02X}-{i % 256:02X}"
+            }, headers={"X-Forwarded-For": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"})
+            assert response.status_code == 200, response.text
+
+        latencies, elapsed = await storm(args.logins, args.concurrency, via_http)
+        report("POST /portal/login", latencies, elapsed)
+
+        async def rejected(i):
+            response = await client.post("/portal/login", json={
+                "username": "mallory", "password": "wrong", "terms_accepted": True, "mac": f"02-AA-00-00-{i // 256 % 256:02X}-{i % 256:02X}"
+            }, headers={"X-Forwarded-For": f"10.200.{i // 256 % 256}.{i % 256}"})
+            assert response.status_code in (401, 429), response.text
+
+        latencies, elapsed = await storm(args.logins, args.concurrency, rejected)
+        report("bad creds (throttled/cached)", latencies, elapsed)
+
+    PortalAuthService.close()
+    transport.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark captive-portal logins against a stub RADIUS server")
+    parser.add_argument("--logins", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.0, help="Simulated RADIUS server latency in seconds")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
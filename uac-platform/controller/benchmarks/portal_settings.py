@@ -0,0 +1,77 @@
+"""
+Load test for the public captive-portal settings endpoint.
+
+Compares the legacy handler (open + json.load of portal_settings.json on
+every request, served through a threadpool `def` route) with the cached,
+pre-compressed handler, in-process over ASGI (no network).
+
+Run from the controller directory:
+    python -m benchmarks.portal_settings --requests 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+async def hammer(client, path: str, total: int, concurrency: int, headers: dict) -> float:
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(path, headers=headers)
+            assert response.status_code in (200, 304), response.status_code
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="uac-bench-")
+    os.environ["UAC_CONFIG_DB"] = os.path.join(workdir, "config.db")
+
+    import httpx
+    from fastapi import FastAPI
+    from models.portal import PortalSettings
+    from routers import portal
+    from services.portal_settings import PortalSettingsService
+
+    settings = PortalSettings(brand_name="Stadium Wi-Fi")
+    PortalSettingsService.save_settings(settings)
+    legacy_file = os.path.join(workdir, "portal_settings.json")
+    with open(legacy_file, "w") as f:
+        json.dump(settings.model_dump(), f, indent=4)
+
+    app = FastAPI()
+    app.include_router(portal.router)
+
+    @app.get("/legacy/portal/settings")
+    def legacy_portal_settings():
+        with open(legacy_file, "r") as f:
+            return json.load(f)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        etag = (await client.get("/portal/settings")).headers["etag"]
+        scenarios = [
+            ("before: json.load per request", "/legacy/portal/settings", {}),
+            ("after: cached identity", "/portal/settings", {"Accept-Encoding": "identity"}),
+            ("after: cached gzip/br", "/portal/settings", {"Accept-Encoding": "gzip, br"}),
+            ("after: conditional 304", "/portal/settings", {"If-None-Match": etag}),
+        ]
+        for label, path, headers in scenarios:
+            await hammer(client, path, min(1000, args.requests), args.concurrency, headers)
+            rps = await hammer(client, path, args.requests, args.concurrency, headers)
+            print(f"{label:<34} {rps:>10.0f} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GET /portal/settings")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
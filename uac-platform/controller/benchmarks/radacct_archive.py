@@ -0,0 +1,120 @@
+"""
+radacct archival: hot table size and session queries before and after.
+
+Copies the benchmark suite's radius database, then on that copy:
+  1. times the session queries against the full radacct table;
+  2. archives closed sessions older than --retention-days (relative to
+     the dataset's last day) into segments;
+  3. times the same queries over the hot rows plus the archive, checks
+     they return the same sessions, and reports how many segments were
+     pruned.
+
+Run from the controller directory:
+    python -m benchmarks.radacct_archive --scale small --retention-days 14
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.datasets import SCALES, configure_environment, default_data_dir, prepare
+
+DATASET_END = datetime(2026, 3, 1)
+
+def queries(users: int) -> dict:
+    """ name -> search_sessions kwargs """
+    return {
+        "one user, all history": {"username": f"user{users // 3:06d}", "limit": 1000},
+        "one user, one week": {"username": f"user{users // 3:06d}", "since": DATASET_END - timedelta(days=60),
+                               "until": DATASET_END - timedelta(days=53)},
+        "one IP, one day": {"ip": "10.64.13.5", "since": DATASET_END - timedelta(days=40),
+                            "until": DATASET_END - timedelta(days=39)},
+        "all sessions, one hour": {"since": DATASET_END - timedelta(days=70), "until": DATASET_END - timedelta(days=70, hours=-1),
+                                   "limit": 1000},
+        "latest 100": {"limit": 100},
+    }
+
+async def time_queries(db, users: int, runs: int) -> dict:
+    from services.analytics import AnalyticsService
+
+    results = {}
+    for name, kwargs in queries(users).items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            found = await AnalyticsService.search_sessions(db, **kwargs)
+            timings.append(time.perf_counter() - start)
+        results[name] = (statistics.median(timings), found)
+    start = time.perf_counter()
+    summary = await AnalyticsService.summary(db)
+    results["analytics summary"] = (time.perf_counter() - start, {"sessions": [], "archive": {}, "summary": summary})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--data-dir")
+    parser.add_argument("--retention-days", type=int, default=14)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or default_data_dir(args.scale)
+    prepare(data_dir, args.scale)
+    workdir = tempfile.mkdtemp(prefix="uac-archive-bench-")
+    db_path = os.path.join(workdir, "radius.db")
+    shutil.copy(os.path.join(data_dir, "radius.db"), db_path)
+    configure_environment(data_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["RADACCT_ARCHIVE_DIR"] = os.path.join(workdir, "archive")
+    os.environ["RADACCT_ARCHIVE_INTERVAL_SEC"] = "0"
+
+    import database
+    from services.radacct_archive import RadAcctArchive, RadAcctArchiver
+    users = SCALES[args.scale]["radcheck"]
+
+    async def measure():
+        async with database.AsyncSessionLocal() as db:
+            return await time_queries(db, users, args.runs)
+
+    def hot_rows() -> int:
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM radacct").fetchone()[0]
+
+    rows_before = hot_rows()
+    before = asyncio.run(measure())
+
+    start = time.perf_counter()
+    run = RadAcctArchiver.run(retention_days=args.retention_days, now=DATASET_END)
+    archive_seconds = time.perf_counter() - start
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("VACUUM")
+    database.engine.dispose()
+    totals = RadAcctArchive.totals()
+    print(f"archived {run['archived_sessions']} of {rows_before} sessions into {run['segments_written']} segments "
+          f"in {archive_seconds:.1f}s; hot table now {hot_rows()} rows")
+    print(f"archive {totals['bytes_on_disk'] / 1e6:.1f} MB on disk "
+          f"({totals['bytes_on_disk'] / max(1, totals['sessions']):.1f} B/session), "
+          f"hot database {os.path.getsize(db_path) / 1e6:.1f} MB after VACUUM")
+
+    after = asyncio.run(measure())
+    print(f"\n{'query':<24} {'radacct only':>14} {'hot + archive':>14}  segments scanned  same result")
+    for name, (seconds, found) in after.items():
+        base_seconds, base_found = before[name]
+        if name == "analytics summary":
+            same = base_found["summary"]["total_bandwidth_mb"] == found["summary"]["total_bandwidth_mb"]
+            scanned = "-"
+        else:
+            same = [s["id"] for s in base_found["sessions"]] == [s["id"] for s in found["sessions"]]
+            stats = found["archive"]
+            scanned = f"{stats['scanned']:>4} / {stats['segments']}"
+        print(f"{name:<24} {base_seconds * 1000:11.2f} ms {seconds * 1000:11.2f} ms  {scanned:>16}  {same}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Endpoint benchmark suite.
+
+Generates (or reuses) a synthetic dataset, imports the real application
+from main.py against it and drives the routers in-process through an
+httpx ASGI client: no network, no MySQL, no RADIUS or WireGuard needed.
+Throughput and p50/p99 latency are recorded per endpoint and compared
+with a stored baseline; the exit status is 1 when anything regressed
+beyond the tolerance.
+
+Run from the controller directory:
+    python -m benchmarks.suite --scale small
+    python -m benchmarks.suite --scale small --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.datasets import SCALES, default_data_dir, prepare
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# name -> (path or path template, relative request budget). Heavy endpoints get a
+# smaller share so one run stays within a few minutes at the small scale.
+SCENARIOS = {
+    "GET /health": ("/health", 1.0),
+    "GET /portal/settings": ("/portal/settings", 1.0),
+    "GET /security/policy": ("/security/policy", 1.0),
+    "GET /system/network/profiles": ("/system/network/profiles", 0.5),
+    "GET /system/network/ports": ("/system/network/ports", 0.5),
+    "GET /system/network/interfaces": ("/system/network/interfaces", 0.5),
+    "GET /system/vpn/peers": ("/system/vpn/peers", 0.5),
+    "GET /radius/users/{username}": ("/radius/users/user{n:06d}", 1.0),
+    "GET /analytics/summary": ("/analytics/summary", 0.05),
+    "GET /system/ids/alerts": ("/system/ids/alerts", 0.02),
+    "GET /dashboard/overview": ("/dashboard/overview", 0.02),
+}
+
+def percentile(sorted_values, q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def run_scenario(client, template: str, total: int, concurrency: int, users: int) -> dict:
+    latencies = []
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < total:
+            n = issued
+            issued += 1
+            path = template.format(n=(n * 7919) % users) if "{n" in template else template
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}: {response.text[:200]}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+async def run_suite(args, scale_params: dict) -> dict:
+    import httpx
+    from main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, (template, share) in SCENARIOS.items():
+            if args.only and not any(f in name for f in args.only):
+                continue
+            total = max(5, int(args.requests * share))
+            # Warm caches, pools and lazy state first so the numbers are steady-state
+            await run_scenario(client, template, min(total, 3), 1, scale_params["radcheck"])
+            results[name] = await run_scenario(client, template, total, args.concurrency, scale_params["radcheck"])
+            r = results[name]
+            print(f"{name:<32} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:9.2f} ms  p99 {r['p99_ms']:9.2f} ms  (n={total})", flush=True)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """ Returns human-readable regressions: p99 up or throughput down by more than `tolerance` """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        if current["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {base['p99_ms']} -> {current['p99_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['rps']} -> {current['rps']} req/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--data-dir", help="Dataset location; reused across runs when the parameters match")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests for a full-share endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--only", nargs="*", help="Only run endpoints whose name contains one of these")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or default_data_dir(args.scale)
+    print(f"Preparing '{args.scale}' dataset in {data_dir} ...", flush=True)
+    start = time.perf_counter()
+    manifest = prepare(data_dir, args.scale)
+    print(f"Dataset ready in {time.perf_counter() - start:.1f}s: {json.dumps(manifest['params'])}", flush=True)
+
+    results = asyncio.run(run_suite(args, manifest["params"]))
+    run = {
+        "meta": {
+            "scale": args.scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --update-baseline)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("scale") != args.scale or baseline["meta"].get("concurrency") != args.concurrency:
+        print(f"Baseline was recorded with {baseline.get('meta')}; numbers are not comparable, skipping the check")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against the baseline (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
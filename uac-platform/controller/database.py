@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 import os
+from typing import List
+from services.metrics import instrument_engine
 
 # Database Configuration
 DB_USER = os.getenv("DB_USER", "uac_admin")
@@ -10,18 +16,87 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_NAME = os.getenv("DB_NAME", "uac_db")
 DB_PORT = os.getenv("DB_PORT", "3306")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Connection pool sizing, per worker process. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below MySQL's max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_recycle=3600,
-    pool_pre_ping=True
+# DATABASE_URL overrides the MySQL settings above (e.g. sqlite:///./test.db)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
+# Async driver used for each sync one
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(SQLALCHEMY_DATABASE_URL))
+
+def _engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database in (None, "", ":memory:"):
+            # One shared connection, otherwise every checkout sees an empty database
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {"connect_args": {"check_same_thread": False}, "pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True
+    }
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the routers: requests wait on the database without holding a threadpool slot
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def _dispose_in_child():
+    # A forked worker must not reuse the parent's pooled sockets; close=False
+    # leaves them open for the parent and just gives the child fresh pools
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_in_child)
+
+def missing_tables(metadata) -> List[str]:
+    """ One round trip: tables declared in `metadata` that the database lacks """
+    with engine.connect() as conn:
+        existing = set(inspect(conn).get_table_names())
+    return sorted(set(metadata.tables) - existing)
+
+# MySQL's ER_NO_SUCH_TABLE; SQLite only has the message
+_MYSQL_NO_SUCH_TABLE = 1146
+
+def is_missing_table(exc: DBAPIError) -> bool:
+    """ True when a statement failed because the schema hasn't been loaded """
+    orig = exc.orig
+    if orig is not None and orig.args and orig.args[0] == _MYSQL_NO_SUCH_TABLE:
+        return True
+    return "no such table" in str(orig)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -29,3 +104,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,17 +1,73 @@
-from fastapi import FastAPI
+import time
+_IMPORT_STARTED = time.perf_counter()
+_IMPORT_PID = None
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from routers import radius, network, firewall, analytics, vpn, ids, portal
-from database import engine
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError
+from routers import radius, network, firewall, analytics, vpn, ids, portal, jobs, metrics, dashboard, snapshots
+from database import engine, async_engine, missing_tables, is_missing_table
 from models.db import Base
+from services.apply_queue import ApplyQueue
+from services.metrics import MetricsMiddleware, MetricsRegistry, METRICS_SAMPLE_RATE, STARTUP_SECONDS
+from services.portal_auth import PortalAuthService
+from services.vpn_telemetry import VpnTelemetryService
+from services.radacct_archive import RadAcctArchiver
+
+# Dev convenience: issue CREATE TABLE for missing tables at startup. In
+# production the schema is provisioned separately and only verified.
+DB_AUTO_CREATE = os.getenv("DB_AUTO_CREATE", "false").lower() in ("1", "true", "yes")
+
+def prepare_database():
+    """
+    Runs once per deployment, not per worker: serve.py calls it in the
+    master before forking and marks it done for the workers it starts.
+    """
+    if os.getenv("UAC_SCHEMA_VERIFIED") == "1":
+        return
+    try:
+        if DB_AUTO_CREATE:
+            Base.metadata.create_all(bind=engine)
+        else:
+            missing = missing_tables(Base.metadata)
+            if missing:
+                print(f"Warning: database is missing tables {missing}; load the schema or set DB_AUTO_CREATE=1")
+    except Exception as e:
+        # The API still serves everything that doesn't need MySQL
+        print(f"Warning: database schema check failed: {e}")
+    os.environ["UAC_SCHEMA_VERIFIED"] = "1"
 
-# Create DB Tables if they don't exist (Quick init for dev)
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await asyncio.to_thread(prepare_database)
+    VpnTelemetryService.start()
+    RadAcctArchiver.start()
+    MetricsRegistry.start()
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="lifespan")
+    if os.getpid() == _IMPORT_PID:
+        origin = f"import {STARTUP_SECONDS.value(phase='import') * 1000:.1f} ms"
+    else:
+        # Forked from a preloaded master: the import was paid once, up there
+        STARTUP_SECONDS.set(0.0, phase="import")
+        origin = f"preloaded by pid {_IMPORT_PID}"
+    print(f"UAC controller ready in {(time.perf_counter() - started) * 1000:.1f} ms ({origin}, pid {os.getpid()})")
+    yield
+    # Don't drop debounced host changes when the worker stops
+    await asyncio.to_thread(ApplyQueue.flush, 30)
+    PortalAuthService.close()
+    await async_engine.dispose()
+    MetricsRegistry.flush()
 
 app = FastAPI(
     title="Universal Access Controller API",
     description="Backend API for the UAC Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(radius.router)
@@ -21,6 +77,18 @@ app.include_router(analytics.router)
 app.include_router(vpn.router)
 app.include_router(ids.router)
 app.include_router(portal.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
+app.include_router(dashboard.router)
+app.include_router(snapshots.router)
+
+@app.exception_handler(DBAPIError)
+async def database_error_handler(request: Request, exc: DBAPIError):
+    # A database without the schema is a deployment problem, not a bug in the request
+    if is_missing_table(exc):
+        print(f"Warning: {request.url.path} needs a table the database lacks; load the schema or set DB_AUTO_CREATE=1")
+        return JSONResponse(status_code=503, content={"detail": "Database schema is not initialized"})
+    raise exc
 
 # CORS Configuration
 origins = [
@@ -36,6 +104,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency; METRICS_SAMPLE_RATE < 1 records only a fraction of requests
+app.add_middleware(MetricsMiddleware, sample_rate=METRICS_SAMPLE_RATE)
+
 @app.get("/")
 async def root():
     return {"message": "Universal Access Controller API is running"}
@@ -44,5 +115,12 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "uac-controller"}
 
+STARTUP_SECONDS.set(time.perf_counter() - _IMPORT_STARTED, phase="import")
+_IMPORT_PID = os.getpid()
+
 if __name__ == "__main__":
+    # Development server: single process, auto-reload, tables created on demand.
+    # Production uses serve.py.
+    import uvicorn
+    os.environ.setdefault("DB_AUTO_CREATE", "1")
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
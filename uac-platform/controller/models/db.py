@@ -40,4 +40,4 @@ class RadAcct(Base):
     acctinputoctets = Column(BigInteger)
     acctoutputoctets = Column(BigInteger)
     callingstationid = Column(String(50))
-    framedipaddress = Column(String(15))
+    framedipaddress = Column(String(15), index=True)
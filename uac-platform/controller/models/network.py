@@ -37,3 +37,12 @@ class PhysicalPort(BaseModel):
     operstate: str = Field("unknown", description="Link status (up/down)")
     speed: int = Field(-1, description="Link speed in Mbps")
     assigned_profile_id: Optional[str] = Field(None, description="ID of the assigned NetworkProfile")
+
+class VlanBulkCreate(BaseModel):
+    parent_interface: str = Field(..., description="Parent interface (e.g., eth1)")
+    vlan_ids: Optional[List[int]] = Field(None, description="Explicit list of VLAN IDs")
+    vlan_start: Optional[int] = Field(None, ge=1, le=4094, description="First VLAN ID of the range (inclusive)")
+    vlan_end: Optional[int] = Field(None, ge=1, le=4094, description="Last VLAN ID of the range (inclusive)")
+    ip_cidr_template: str = Field(..., description="CIDR template; {vlan}, {vlan_hi} (id // 256) and {vlan_lo} (id % 256) are substituted (e.g., 10.{vlan}.0.1/24)")
+    dhcp_server_enabled: bool = Field(True, description="Enable DHCP Server (via CoovaChilli)")
+    description: Optional[str] = Field(None, description="Description applied to every generated network")
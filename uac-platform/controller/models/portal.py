@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import Optional
 
 class PortalSettings(BaseModel):
     brand_name: str = Field("Universal Access", description="Main Title on the splash page")
@@ -7,3 +8,10 @@ class PortalSettings(BaseModel):
     terms_text: str = Field("By connecting to this network, you agree to our Acceptable Use Policy.", description="Terms of Service text")
     background_image_url: str = Field("", description="Optional URL to splash background image")
     require_terms_acceptance: bool = Field(True, description="Require clicking an Agree checkbox before authenticating")
+
+class PortalLoginRequest(BaseModel):
+    username: str = Field(..., min_length=1, max_length=64)
+    password: str = Field(..., max_length=128)
+    mac: Optional[str] = Field(None, description="Client MAC address as reported by CoovaChilli")
+    ip: Optional[str] = Field(None, description="Client IP address on the captive network")
+    terms_accepted: bool = Field(False, description="Client ticked the Acceptable Use Policy checkbox")
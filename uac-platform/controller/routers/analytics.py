@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-from models.db import RadAcct # type: ignore
-from sqlalchemy import func
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from services.analytics import AnalyticsService
+from services.apply_queue import ApplyQueue
+from services.radacct_archive import RadAcctArchive, RadAcctArchiver
+from services.response_cache import cached
 
 router = APIRouter(
     prefix="/analytics",
@@ -10,31 +14,29 @@ router = APIRouter(
 )
 
 @router.get("/summary")
-def get_analytics_summary(db: Session = Depends(get_db)):
-    # Calculate total active sessions (acctstoptime is null for active sessions)
-    active_sessions = db.query(RadAcct).filter(RadAcct.acctstoptime == None).count()
-    
-    # Calculate total bandwidth consumed across all history
-    total_input = db.query(func.sum(RadAcct.acctinputoctets)).scalar() or 0
-    total_output = db.query(func.sum(RadAcct.acctoutputoctets)).scalar() or 0
-    
-    total_bytes = total_input + total_output
-    total_mb = round(total_bytes / (1024 * 1024), 2)
-    
-    # Get recent completed sessions
-    recent_sessions = db.query(RadAcct).filter(RadAcct.acctstoptime != None).order_by(RadAcct.acctstoptime.desc()).limit(10).all()
-    
-    return {
-        "active_users": active_sessions,
-        "total_bandwidth_mb": total_mb,
-        "recent_sessions": [
-            {
-                "username": s.username,
-                "mac": s.callingstationid,
-                "ip": s.framedipaddress,
-                "duration_sec": s.acctsessiontime,
-                "download_mb": round((s.acctoutputoctets or 0) / (1024 * 1024), 2),
-                "upload_mb": round((s.acctinputoctets or 0) / (1024 * 1024), 2)
-            } for s in recent_sessions
-        ]
-    }
+# Accounting rows are written by FreeRADIUS, not through this API, so there is no write path to purge from
+@cached("analytics.summary", ttl=10, tags=("analytics",))
+async def get_analytics_summary(db: AsyncSession = Depends(get_async_db)):
+    return await AnalyticsService.summary(db)
+
+@router.get("/sessions")
+async def search_sessions(
+    username: Optional[str] = None,
+    ip: Optional[str] = None,
+    mac: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Hot radacct rows and archived segments, merged newest first
+    return await AnalyticsService.search_sessions(db, username, ip, mac, since, until, limit)
+
+@router.get("/archive")
+def get_archive_status():
+    return RadAcctArchive.status()
+
+@router.post("/archive")
+def run_archive():
+    # Moves closed sessions past the retention window out of radacct
+    return ApplyQueue.submit("radacct-archive", RadAcctArchiver.run)
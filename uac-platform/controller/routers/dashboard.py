@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Response
+from typing import Optional
+from services.dashboard import DashboardService
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"]
+)
+
+@router.get("/overview")
+async def get_dashboard_overview(response: Response, fields: Optional[str] = None):
+    # fields: comma-separated sections or section.key pairs, e.g. "ports,vpn.online"
+    try:
+        overview, timings = await DashboardService.overview(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={sec * 1000:.1f}" for name, sec in timings.items())
+    return overview
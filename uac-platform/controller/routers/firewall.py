@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from typing import List
 from models.firewall import FirewallPolicy
 from services.firewall import FirewallService
+from services.apply_queue import ApplyQueue
+from services.response_cache import cached
 
 router = APIRouter(
     prefix="/security",
@@ -9,16 +11,21 @@ router = APIRouter(
 )
 
 @router.get("/apps")
+@cached("security.apps", ttl=300, tags=("security",))
 def list_apps():
     return FirewallService.get_supported_apps()
 
 @router.get("/policy")
+@cached("security.policy", ttl=60, tags=("security",))
 def get_policy():
     return FirewallService.get_policy()
 
 @router.post("/policy")
-def update_policy(policy: FirewallPolicy):
+def update_policy(policy: FirewallPolicy, response: Response):
     try:
-        return FirewallService.update_policy(policy)
+        res = FirewallService.update_policy(policy)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    job = ApplyQueue.submit("firewall", FirewallService.generate_rules)
+    response.headers["X-Apply-Job"] = job["id"]
+    return res
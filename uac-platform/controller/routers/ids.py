@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from database import get_async_db
 from models.security import IdsConfig # type: ignore
 from services.ids import IDSService
+from services.apply_queue import ApplyQueue
+from services.subscriber_index import SubscriberService
 
 router = APIRouter(
     prefix="/system/ids",
@@ -12,9 +18,21 @@ def get_ids_config():
     return IDSService.get_config()
 
 @router.post("/config")
-def update_ids_config(config: IdsConfig):
-    return IDSService.save_config(config)
+def update_ids_config(config: IdsConfig, response: Response):
+    res = IDSService.save_config(config)
+    job = ApplyQueue.submit("ids", IDSService.apply_saved_config)
+    response.headers["X-Apply-Job"] = job["id"]
+    return res
 
 @router.get("/alerts")
-def get_ids_alerts():
-    return IDSService.get_recent_alerts(limit=100)
+async def get_ids_alerts(enrich: bool = True, db: AsyncSession = Depends(get_async_db)):
+    # Log parsing is blocking file I/O; keep it off the event loop. Newest first.
+    alerts = await run_in_threadpool(IDSService.get_recent_alerts, 100)
+    if enrich:
+        try:
+            # Who held source_ip/dest_ip when the alert fired (from radacct sessions and the archive)
+            await SubscriberService.enrich_alerts(db, alerts)
+        except (SQLAlchemyError, OSError) as e:
+            # Alerts are still worth showing without the RADIUS database
+            print(f"Warning: IDS alert enrichment failed: {e}")
+    return alerts
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException
+from services.apply_queue import ApplyQueue
+
+router = APIRouter(
+    prefix="/system/jobs",
+    tags=["Apply Jobs"]
+)
+
+@router.get("")
+def list_apply_jobs(limit: int = 50):
+    return ApplyQueue.list_jobs(limit=limit)
+
+@router.get("/{job_id}")
+def get_apply_job(job_id: str):
+    job = ApplyQueue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.metrics import MetricsRegistry
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text exposition format 0.0.4
+    return PlainTextResponse(MetricsRegistry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
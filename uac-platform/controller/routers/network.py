@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from typing import List
-from models.network import InterfaceConfig, VlanCreate, NetworkProfile
+from models.network import InterfaceConfig, VlanCreate, VlanBulkCreate, NetworkProfile
 from services.netplan import NetplanService
 from services.hardware import HardwareService
+from services.ipam import IpamService, IpamConflictError
+from services.apply_queue import ApplyQueue
+from services.response_cache import cached
+from services.config_snapshots import ConfigSnapshotService
 
 router = APIRouter(
     prefix="/system/network",
@@ -10,28 +14,74 @@ router = APIRouter(
 )
 
 @router.get("/interfaces")
+@cached("network.interfaces", ttl=30, tags=("network",))
 def list_interfaces():
     return NetplanService.list_interfaces()
 
 @router.post("/vlan")
 def create_vlan(vlan: VlanCreate):
+    try:
+        IpamService.reserve_vlans(vlan.parent_interface, [(vlan.vlan_id, vlan.ip_cidr)])
+    except IpamConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     try:
         result = NetplanService.create_vlan(vlan)
-        return result
     except Exception as e:
+        IpamService.release_vlans(vlan.parent_interface, [vlan.vlan_id])
+        raise HTTPException(status_code=500, detail=str(e))
+    # Written in place rather than through the apply queue, so record the version here
+    ConfigSnapshotService.schedule("network:vlan")
+    return result
+
+@router.post("/vlans/bulk")
+def create_vlans_bulk(request: VlanBulkCreate):
+    try:
+        entries = NetplanService.expand_bulk_vlans(request)
+        IpamService.reserve_vlans(request.parent_interface, entries)
+    except IpamConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        result = NetplanService.create_vlans_bulk(request, entries)
+    except Exception as e:
+        IpamService.release_vlans(request.parent_interface, [vlan_id for vlan_id, _ in entries])
         raise HTTPException(status_code=500, detail=str(e))
+    ConfigSnapshotService.schedule("network:vlan")
+    return result
+
+@router.get("/ipam/next-free")
+def get_next_free_prefix(within: str = "10.0.0.0/8", prefix_len: int = 24):
+    try:
+        network = IpamService.next_free(within, prefix_len)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if network is None:
+        raise HTTPException(status_code=404, detail=f"No free /{prefix_len} left in {within}")
+    return {"network": network, "within": within, "prefix_len": prefix_len}
 
 @router.post("/interface")
 def modify_interface(config: InterfaceConfig):
     try:
-        return NetplanService.modify_interface(config)
+        result = NetplanService.modify_interface(config)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    ConfigSnapshotService.schedule("network:interface")
+    return result
 
 @router.post("/apply")
 def apply_network_changes():
     return NetplanService.apply_config()
 
+def _schedule_network_apply(response: Response):
+    # Bursts of port/profile edits collapse into a single regeneration
+    job = ApplyQueue.submit("network", NetplanService.generate_from_profiles)
+    response.headers["X-Apply-Job"] = job["id"]
+
 # --- Hardware Discovery & Port Orchestration ---
 
 @router.get("/ports")
@@ -39,30 +89,39 @@ def get_physical_ports():
     return HardwareService.get_physical_ports()
 
 @router.post("/ports/{port_name}/assign/{profile_id}")
-def assign_profile_to_port(port_name: str, profile_id: str):
+def assign_profile_to_port(port_name: str, profile_id: str, response: Response):
     # Pass 'none' to unassign
     if profile_id.lower() == "none":
         profile_id = None
     
     ports = HardwareService.assign_profile_to_port(port_name, profile_id)
     # Regenerate config for all ports
-    NetplanService.generate_from_profiles()
+    _schedule_network_apply(response)
     return ports
 
 @router.get("/profiles")
+@cached("network.profiles", ttl=60, tags=("network",))
 def get_network_profiles():
     return HardwareService.get_network_profiles()
 
 @router.post("/profiles")
-def save_network_profile(profile: NetworkProfile):
+def save_network_profile(profile: NetworkProfile, response: Response):
+    try:
+        IpamService.reserve_profile(profile.id, profile.ip_cidr)
+    except IpamConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     res = HardwareService.save_network_profile(profile.model_dump())
-    NetplanService.generate_from_profiles()
+    _schedule_network_apply(response)
     return res
 
 @router.delete("/profiles/{profile_id}")
-def remove_network_profile(profile_id: str):
+def remove_network_profile(profile_id: str, response: Response):
     res = HardwareService.delete_network_profile(profile_id)
-    NetplanService.generate_from_profiles()
+    IpamService.release_profile(profile_id)
+    _schedule_network_apply(response)
     return res
 
 # --- Hardware Discovery & Port Orchestration ---
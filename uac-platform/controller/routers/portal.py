@@ -1,21 +1,92 @@
-from fastapi import APIRouter
-from models.portal import PortalSettings # type: ignore
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from models.portal import PortalSettings, PortalLoginRequest # type: ignore
 from services.portal_settings import PortalSettingsService
+from services.config_snapshots import ConfigSnapshotService
+from services.portal_auth import PortalAuthService, LoginThrottledError
+from services.radius_client import RadiusError
+
+PORTAL_SETTINGS_MAX_AGE = int(os.getenv("PORTAL_SETTINGS_MAX_AGE", "30"))
 
 router = APIRouter(
     prefix="/portal",
     tags=["Captive Portal"]
 )
 
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
 @router.get("/settings")
-def get_portal_settings():
+async def get_portal_settings(request: Request):
     """ 
     Publicly accessible endpoint so the unauthenticated 
-    Next.js portal can fetch its branding 
+    Next.js portal can fetch its branding.
+    Served from pre-serialized, pre-compressed bytes with ETag revalidation.
     """
-    return PortalSettingsService.get_settings()
+    payload = PortalSettingsService.get_public_payload()
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    coding = "identity"
+    if "br" in payload.bodies and _accepts(accept_encoding, "br"):
+        coding = "br"
+    elif _accepts(accept_encoding, "gzip"):
+        coding = "gzip"
+    body, etag = payload.bodies[coding]
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={PORTAL_SETTINGS_MAX_AGE}",
+        "Vary": "Accept-Encoding"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if "*" in tags or tags.intersection(payload.etags()):
+            return Response(status_code=304, headers=headers)
+
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/settings")
 def update_portal_settings(settings: PortalSettings):
     """ Requires authentication in a real scenario """
-    return PortalSettingsService.save_settings(settings)
+    result = PortalSettingsService.save_settings(settings)
+    ConfigSnapshotService.schedule("portal")
+    return result
+
+@router.post("/login")
+async def portal_login(login: PortalLoginRequest, request: Request):
+    """
+    Public captive-portal login. Authenticates against FreeRADIUS through
+    the pooled async client; throttled per client address and per username.
+    """
+    if PortalSettingsService.get_public_payload().settings.get("require_terms_acceptance") and not login.terms_accepted:
+        raise HTTPException(status_code=400, detail="Terms of service must be accepted")
+
+    try:
+        client_address = PortalAuthService.client_address(
+            request.client.host if request.client else None, request.headers.get("x-forwarded-for")
+        )
+        result = await PortalAuthService.login(
+            login.username, login.password,
+            mac=login.mac, ip=login.ip or client_address, client_address=client_address
+        )
+    except LoginThrottledError as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+    except RadiusError as e:
+        raise HTTPException(status_code=503, detail=f"Authentication service unavailable: {e}")
+
+    if not result["accepted"]:
+        raise HTTPException(status_code=401, detail=result["message"])
+    return {"status": "accepted", "session_timeout": result["session_timeout"], "message": result["message"]}
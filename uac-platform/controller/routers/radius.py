@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models.db import RadCheck, RadReply # type: ignore
 from models.radius import RadiusUserCreate, RadiusUser
 
@@ -10,9 +11,9 @@ router = APIRouter(
 )
 
 @router.post("/users", response_model=dict)
-def create_radius_user(user: RadiusUserCreate, db: Session = Depends(get_db)):
+async def create_radius_user(user: RadiusUserCreate, db: AsyncSession = Depends(get_async_db)):
     # 1. Check if user already exists
-    existing_user = db.query(RadCheck).filter(RadCheck.username == user.username).first()
+    existing_user = await db.scalar(select(RadCheck.id).where(RadCheck.username == user.username).limit(1))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
@@ -44,19 +45,19 @@ def create_radius_user(user: RadiusUserCreate, db: Session = Depends(get_db)):
        db.add(RadReply(username=user.username, attribute="Tunnel-Medium-Type", op="=", value="6")) # IEEE-802
        db.add(RadReply(username=user.username, attribute="Tunnel-Private-Group-Id", op="=", value=user.vlan_id))
 
-    db.commit()
+    await db.commit()
     return {"message": f"User {user.username} created successfully"}
 
 @router.get("/users/{username}")
-def get_radius_user(username: str, db: Session = Depends(get_db)):
-    checks = db.query(RadCheck).filter(RadCheck.username == username).all()
-    replies = db.query(RadReply).filter(RadReply.username == username).all()
+async def get_radius_user(username: str, db: AsyncSession = Depends(get_async_db)):
+    checks = (await db.scalars(select(RadCheck.attribute).where(RadCheck.username == username))).all()
+    replies = (await db.scalars(select(RadReply.attribute).where(RadReply.username == username))).all()
     
     if not checks and not replies:
         raise HTTPException(status_code=404, detail="User not found")
 
     return {
         "username": username,
-        "checks": [c.attribute for c in checks],
-        "replies": [r.attribute for r in replies]
+        "checks": list(checks),
+        "replies": list(replies)
     }
@@ -0,0 +1,37 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from services.config_snapshots import ConfigSnapshotService, SnapshotNotFoundError
+
+router = APIRouter(
+    prefix="/system/snapshots",
+    tags=["Config Snapshots"]
+)
+
+@router.get("")
+def list_snapshots(limit: int = 50, before: Optional[int] = None):
+    return ConfigSnapshotService.list_versions(limit=limit, before=before)
+
+@router.post("")
+def create_snapshot(reason: str = "manual"):
+    return ConfigSnapshotService.record(reason)
+
+@router.get("/{version}")
+def get_snapshot(version: int):
+    try:
+        return ConfigSnapshotService.get_version(version)
+    except SnapshotNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{from_version}/diff/{to_version}")
+def diff_snapshots(from_version: int, to_version: int, content: bool = False):
+    try:
+        return ConfigSnapshotService.diff(from_version, to_version, content=content)
+    except SnapshotNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/{version}/rollback")
+def rollback_snapshot(version: int):
+    try:
+        return ConfigSnapshotService.rollback(version)
+    except SnapshotNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from typing import List
 from models.network import VpnPeer
-from services.vpn import VpnConfigService
+from services.vpn import VpnConfigService, PeerConflictError
+from services.apply_queue import ApplyQueue
+from services.vpn_telemetry import VpnTelemetryService
+from services.response_cache import cached
 
 router = APIRouter(
     prefix="/system/vpn",
@@ -9,19 +12,29 @@ router = APIRouter(
 )
 
 @router.get("/peers", response_model=List[dict])
-def get_vpn_peers():
-    return VpnConfigService.get_all_peers()
+# Short TTL: the live telemetry joined in moves on every `wg show` poll
+@cached("vpn.peers", ttl=5, tags=("vpn",))
+def get_vpn_peers(history: bool = False):
+    # Live handshake/traffic stats from the latest `wg show all dump`
+    return VpnTelemetryService.join(VpnConfigService.get_all_peers(), include_history=history)
 
 @router.post("/peers", response_model=dict)
-def add_vpn_peer(peer: VpnPeer):
-    # Ensure name uniqueness
-    existing_peers = VpnConfigService.get_all_peers()
-    if any(p["name"] == peer.name for p in existing_peers):
-        raise HTTPException(status_code=400, detail="Peer name already exists")
-    
-    return VpnConfigService.add_peer(peer)
+def add_vpn_peer(peer: VpnPeer, response: Response):
+    # Name, public key and routed prefixes must be unique (checked against the peer registry)
+    try:
+        res = VpnConfigService.add_peer(peer)
+    except PeerConflictError as e:
+        raise HTTPException(status_code=400 if e.field == "name" else 409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    job = ApplyQueue.submit("vpn", VpnConfigService.apply_configs)
+    response.headers["X-Apply-Job"] = job["id"]
+    return res
 
 @router.delete("/peers/{peer_name}")
-def remove_vpn_peer(peer_name: str):
+def remove_vpn_peer(peer_name: str, response: Response):
     VpnConfigService.delete_peer(peer_name)
+    job = ApplyQueue.submit("vpn", VpnConfigService.apply_configs)
+    response.headers["X-Apply-Job"] = job["id"]
     return {"message": f"Peer {peer_name} removed"}
@@ -0,0 +1,98 @@
+"""
+Production launcher for the controller API.
+
+The app is imported and the database schema verified once, in the master
+process. With gunicorn installed, workers are forked from that preloaded
+master (uvicorn worker class), so starting or replacing a worker costs a
+fork rather than an import plus a database handshake. Without gunicorn it
+falls back to uvicorn's own process manager.
+
+    python serve.py
+
+Settings (environment):
+    UAC_HOST / UAC_PORT          bind address (0.0.0.0:8000)
+    UAC_WORKERS                  worker processes (CPU count)
+    UAC_WORKER_TIMEOUT           seconds before a stuck worker is replaced (60)
+    UAC_GRACEFUL_TIMEOUT         seconds a worker gets to finish on shutdown (30)
+    UAC_MAX_REQUESTS             recycle a worker after this many requests (0 = never)
+    UAC_LOG_LEVEL                info
+    UAC_METRICS_DIR              where workers publish their metrics, so /metrics
+                                 reports the whole server whichever worker answers
+                                 (<tmp>/uac-metrics-<port>, emptied at startup)
+"""
+import os
+import glob
+import time
+import tempfile
+
+UAC_HOST = os.getenv("UAC_HOST", "0.0.0.0")
+UAC_PORT = int(os.getenv("UAC_PORT", "8000"))
+UAC_WORKERS = int(os.getenv("UAC_WORKERS", str(os.cpu_count() or 1)))
+UAC_WORKER_TIMEOUT = int(os.getenv("UAC_WORKER_TIMEOUT", "60"))
+UAC_GRACEFUL_TIMEOUT = int(os.getenv("UAC_GRACEFUL_TIMEOUT", "30"))
+UAC_MAX_REQUESTS = int(os.getenv("UAC_MAX_REQUESTS", "0"))
+UAC_LOG_LEVEL = os.getenv("UAC_LOG_LEVEL", "info")
+
+def _run_gunicorn(application):
+    from gunicorn.app.base import BaseApplication
+
+    class PreloadedApplication(BaseApplication):
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    PreloadedApplication(application, {
+        "bind": f"{UAC_HOST}:{UAC_PORT}",
+        "workers": UAC_WORKERS,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": UAC_WORKER_TIMEOUT,
+        "graceful_timeout": UAC_GRACEFUL_TIMEOUT,
+        "max_requests": UAC_MAX_REQUESTS,
+        "max_requests_jitter": UAC_MAX_REQUESTS // 10,
+        "loglevel": UAC_LOG_LEVEL,
+    }).run()
+
+def _prepare_metrics_dir():
+    # Must be set before the app is imported: services.metrics reads it at import time
+    metrics_dir = os.environ.setdefault("UAC_METRICS_DIR", os.path.join(tempfile.gettempdir(), f"uac-metrics-{UAC_PORT}"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Counters restart with the server, like prometheus_client's multiprocess directory
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(path)
+
+def main():
+    started = time.perf_counter()
+    _prepare_metrics_dir()
+    import main as controller
+    controller.prepare_database()
+    # The master's connections were only needed for the check
+    controller.engine.dispose()
+    print(f"Preloaded controller in {(time.perf_counter() - started) * 1000:.1f} ms, starting {UAC_WORKERS} worker(s)")
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        import uvicorn
+        if UAC_WORKERS > 1:
+            # uvicorn spawns fresh interpreters, so each worker imports the app again;
+            # UAC_SCHEMA_VERIFIED (set above) still spares them the schema check
+            uvicorn.run("main:app", host=UAC_HOST, port=UAC_PORT, workers=UAC_WORKERS, log_level=UAC_LOG_LEVEL,
+                        timeout_graceful_shutdown=UAC_GRACEFUL_TIMEOUT)
+        else:
+            uvicorn.run(controller.app, host=UAC_HOST, port=UAC_PORT, log_level=UAC_LOG_LEVEL,
+                        timeout_graceful_shutdown=UAC_GRACEFUL_TIMEOUT)
+        return
+
+    _run_gunicorn(controller.app)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.db import RadAcct # type: ignore
+from services.radacct_archive import COLUMNS, RadAcctArchive
+
+# The same column set as the archive, so hot and archived rows share one shape
+_SESSION_COLUMNS = [getattr(RadAcct, name) for name in COLUMNS]
+
+def _mb(octets: Optional[int]) -> float:
+    return round((octets or 0) / (1024 * 1024), 2)
+
+def _session(row: dict, archived: bool) -> dict:
+    return {
+        "id": row["radacctid"],
+        "session_id": row["acctsessionid"],
+        "username": row["username"],
+        "mac": row["callingstationid"],
+        "ip": row["framedipaddress"],
+        "start": row["acctstarttime"],
+        "stop": row["acctstoptime"],
+        "duration_sec": row["acctsessiontime"],
+        "download_mb": _mb(row["acctoutputoctets"]),
+        "upload_mb": _mb(row["acctinputoctets"]),
+        "archived": archived
+    }
+
+class AnalyticsService:
+    @staticmethod
+    async def summary(db: AsyncSession, recent_limit: int = 10) -> dict:
+        """ Active users, all-time bandwidth and the most recently completed sessions, hot and archived """
+        # Calculate total active sessions (acctstoptime is null for active sessions)
+        active_sessions = await db.scalar(select(func.count()).select_from(RadAcct).where(RadAcct.acctstoptime == None))
+
+        # Calculate total bandwidth consumed across all history (one scan for both directions)
+        totals = (await db.execute(
+            select(func.sum(RadAcct.acctinputoctets), func.sum(RadAcct.acctoutputoctets))
+        )).one()
+        # Archived segments carry their sums in the header, so this reads no row data
+        archive = await asyncio.to_thread(RadAcctArchive.totals)
+        total_input = (totals[0] or 0) + archive["input_octets"]
+        total_output = (totals[1] or 0) + archive["output_octets"]
+
+        total_bytes = total_input + total_output
+        total_mb = round(total_bytes / (1024 * 1024), 2)
+
+        # Get recent completed sessions; the archive only holds older ones, so it's read only to fill up
+        recent = [_session(r._asdict(), False) for r in (await db.execute(
+            select(*_SESSION_COLUMNS).where(RadAcct.acctstoptime != None).order_by(RadAcct.acctstoptime.desc()).limit(recent_limit)
+        )).all()]
+        if len(recent) < recent_limit and archive["segments"]:
+            archived = await asyncio.to_thread(RadAcctArchive.recent, recent_limit - len(recent))
+            recent.extend(_session(r, True) for r in archived)
+
+        return {
+            "active_users": active_sessions,
+            "total_bandwidth_mb": total_mb,
+            "archived_sessions": archive["sessions"],
+            "recent_sessions": [
+                {k: s[k] for k in ("username", "mac", "ip", "duration_sec", "download_mb", "upload_mb")}
+                for s in recent
+            ]
+        }
+
+    @staticmethod
+    async def search_sessions(db: AsyncSession, username: str = None, ip: str = None, mac: str = None,
+                              since: datetime = None, until: datetime = None, limit: int = 100) -> dict:
+        """
+        Sessions matching every given filter and overlapping [since, until],
+        newest first, from radacct and the archive alike.
+        """
+        query = select(*_SESSION_COLUMNS)
+        if username is not None:
+            query = query.where(RadAcct.username == username)
+        if ip is not None:
+            query = query.where(RadAcct.framedipaddress == ip)
+        if mac is not None:
+            query = query.where(RadAcct.callingstationid == mac)
+        if until is not None:
+            query = query.where(RadAcct.acctstarttime <= until)
+        if since is not None:
+            query = query.where(or_(RadAcct.acctstoptime == None, RadAcct.acctstoptime >= since))
+        hot = (await db.execute(query.order_by(RadAcct.acctstarttime.desc()).limit(limit))).all()
+
+        archived, stats = await asyncio.to_thread(RadAcctArchive.search, username, ip, mac, since, until, limit)
+
+        sessions: List[dict] = [_session(r._asdict(), False) for r in hot]
+        seen = {s["id"] for s in sessions}
+        sessions.extend(_session(r, True) for r in archived if r["radacctid"] not in seen)
+        sessions.sort(key=lambda s: s["start"] or datetime.min, reverse=True)
+        return {"sessions": sessions[:limit], "archive": stats}
@@ -0,0 +1,191 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# Quiet period after the last change before a subsystem is applied
+APPLY_DEBOUNCE_SEC = float(os.getenv("UAC_APPLY_DEBOUNCE", "0.5"))
+# Upper bound on how long a continuous burst of changes can postpone an apply
+APPLY_MAX_DELAY_SEC = float(os.getenv("UAC_APPLY_MAX_DELAY", "5"))
+APPLY_WORKERS = int(os.getenv("UAC_APPLY_WORKERS", "4"))
+JOB_HISTORY = 500
+
+class _Job:
+    __slots__ = ("id", "subsystem", "status", "submitted_at", "started_at", "finished_at", "error", "coalesced", "done")
+
+    def __init__(self, subsystem: str):
+        self.id = uuid.uuid4().hex
+        self.subsystem = subsystem
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.coalesced = 1
+        self.done = threading.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "subsystem": self.subsystem,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "coalesced": self.coalesced
+        }
+
+class _Lane:
+    __slots__ = ("func", "pending", "timer", "running", "first_submit")
+
+    def __init__(self):
+        self.func = None
+        self.pending = None
+        self.timer = None
+        self.running = False
+        self.first_submit = 0.0
+
+class ApplyQueue:
+    """
+    Background queue for host reconfiguration (netplan, firewall, VPN, IDS).
+    Submissions for the same subsystem are debounced and coalesced into one
+    pending job that runs the most recently submitted function, so a burst
+    of edits results in a single apply. Subsystems run in parallel, but a
+    subsystem never runs two applies at once.
+    """
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lanes: Dict[str, _Lane] = {}
+    _jobs: "OrderedDict[str, _Job]" = OrderedDict()
+    _listeners: List[Callable[[str], object]] = []
+
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor:
+        if ApplyQueue._executor is None:
+            ApplyQueue._executor = ThreadPoolExecutor(max_workers=APPLY_WORKERS, thread_name_prefix="uac-apply")
+        return ApplyQueue._executor
+
+    @staticmethod
+    def submit(subsystem: str, func: Callable[[], object]) -> dict:
+        """ Schedules `func` to apply `subsystem` and returns the (possibly shared) job """
+        now = time.monotonic()
+        with ApplyQueue._lock:
+            lane = ApplyQueue._lanes.setdefault(subsystem, _Lane())
+            # Latest state wins: the apply reads current config when it runs
+            lane.func = func
+
+            if lane.pending is not None:
+                job = lane.pending
+                job.coalesced += 1
+            else:
+                job = _Job(subsystem)
+                lane.pending = job
+                lane.first_submit = now
+                ApplyQueue._jobs[job.id] = job
+                while len(ApplyQueue._jobs) > JOB_HISTORY:
+                    ApplyQueue._jobs.popitem(last=False)
+
+            if lane.timer is not None:
+                lane.timer.cancel()
+            delay = min(APPLY_DEBOUNCE_SEC, max(0.0, lane.first_submit + APPLY_MAX_DELAY_SEC - now))
+            lane.timer = threading.Timer(delay, ApplyQueue._fire, args=(subsystem,))
+            lane.timer.daemon = True
+            lane.timer.start()
+            return job.to_dict()
+
+    @staticmethod
+    def _fire(subsystem: str):
+        with ApplyQueue._lock:
+            lane = ApplyQueue._lanes[subsystem]
+            lane.timer = None
+            if lane.running or lane.pending is None:
+                # The running apply picks the pending job up when it finishes
+                return
+            job, func = lane.pending, lane.func
+            lane.pending = None
+            lane.running = True
+            job.status = "running"
+            job.started_at = time.time()
+        ApplyQueue._get_executor().submit(ApplyQueue._run, subsystem, job, func)
+
+    @staticmethod
+    def _run(subsystem: str, job: _Job, func: Callable[[], object]):
+        try:
+            func()
+            job.status = "done"
+        except Exception as e:
+            print(f"Error applying {subsystem}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+            with ApplyQueue._lock:
+                lane = ApplyQueue._lanes[subsystem]
+                lane.running = False
+                fire_now = lane.pending is not None and lane.timer is None
+            if fire_now:
+                ApplyQueue._fire(subsystem)
+        if job.status == "done":
+            for callback in ApplyQueue._listeners:
+                try:
+                    callback(subsystem)
+                except Exception as e:
+                    print(f"Warning: post-apply hook for {subsystem} failed: {e}")
+
+    @staticmethod
+    def on_applied(callback: Callable[[str], object]):
+        """ Registers callback(subsystem), called after every successful apply """
+        if callback not in ApplyQueue._listeners:
+            ApplyQueue._listeners.append(callback)
+
+    @staticmethod
+    def get_job(job_id: str) -> Optional[dict]:
+        with ApplyQueue._lock:
+            job = ApplyQueue._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    @staticmethod
+    def list_jobs(limit: int = 50) -> List[dict]:
+        with ApplyQueue._lock:
+            jobs = list(ApplyQueue._jobs.values())[-limit:]
+            return [j.to_dict() for j in reversed(jobs)]
+
+    @staticmethod
+    def wait(job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """ Blocks until the job finished (or the timeout expired) and returns its state """
+        with ApplyQueue._lock:
+            job = ApplyQueue._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.to_dict()
+
+    @staticmethod
+    def flush(timeout: Optional[float] = None):
+        """ Runs every pending apply right away and waits for them (used on shutdown) """
+        with ApplyQueue._lock:
+            pending = []
+            for subsystem, lane in ApplyQueue._lanes.items():
+                if lane.pending is not None:
+                    pending.append((subsystem, lane.pending))
+                    if lane.timer is not None:
+                        lane.timer.cancel()
+                        lane.timer = None
+        for subsystem, _ in pending:
+            ApplyQueue._fire(subsystem)
+        for _, job in pending:
+            job.done.wait(timeout)
+
+def _reset_after_fork():
+    # Timers and executor threads don't survive fork(); a worker starts with an empty queue
+    ApplyQueue._lock = threading.Lock()
+    ApplyQueue._executor = None
+    ApplyQueue._lanes = {}
+    ApplyQueue._jobs = OrderedDict()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,416 @@
+import os
+import json
+import stat
+import time
+import zlib
+import difflib
+import fnmatch
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from services.apply_queue import ApplyQueue
+from services.config_store import ConfigStore
+from services.response_cache import ResponseCache
+from services.netplan import NETPLAN_DIR, CHILLI_DIR
+from services.firewall import FIREWALL_DIR, RULES_SCRIPT
+from services.vpn import HOST_WG_DIR, WG_INTERFACE, SOFTETHER_SCRIPT, WireGuardSync, VpnConfigService
+from services.ids import IDSService
+from services.ipam import IpamService
+from services.portal_settings import PortalSettingsService
+
+# Content-addressed blob store; the version history itself lives in the config store
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "/opt/uac-controller/snapshots")
+# Parsed manifests/trees kept in memory, so diffs against recent versions don't touch the disk
+SNAPSHOT_TREE_CACHE = int(os.getenv("SNAPSHOT_TREE_CACHE", "512"))
+
+# Collections making up the applied configuration -> response cache tags serving them
+COLLECTIONS = {
+    "network_profiles": ("network",),
+    "ports": ("network",),
+    "firewall_policy": ("security",),
+    "vpn_peers": ("vpn",),
+    "ids_config": (),
+    "portal_settings": (),
+}
+
+# Generated-file directories -> response cache tags serving what is read back from them
+DIRECTORY_TAGS = {
+    NETPLAN_DIR: ("network",),
+    CHILLI_DIR: ("network",),
+    FIREWALL_DIR: ("security",),
+}
+
+# Applies whose result is recorded as a new version
+SNAPSHOT_SUBSYSTEMS = ("network", "firewall", "vpn", "ids")
+
+class SnapshotNotFoundError(Exception):
+    pass
+
+# Files the controller generates in the host's /etc/netplan and chilli config.d (see NetplanService);
+# everything else there belongs to the host (cloud-init, the installer) and is never touched
+GENERATED_NETPLAN_FILES = ("10-uac-*.yaml", "20-profile-*.yaml")
+GENERATED_CHILLI_FILES = ("vlan*.conf", "profile-*.conf")
+
+def _tracked_dirs() -> Dict[str, Tuple[str, ...]]:
+    """ Directory -> fnmatch patterns of the file names tracked in it (plain names match only themselves) """
+    dirs: Dict[str, Tuple[str, ...]] = {NETPLAN_DIR: GENERATED_NETPLAN_FILES, CHILLI_DIR: GENERATED_CHILLI_FILES}
+    for path in (RULES_SCRIPT, os.path.join(HOST_WG_DIR, f"{WG_INTERFACE}.conf"), WireGuardSync.STATE_FILE, SOFTETHER_SCRIPT):
+        directory = os.path.dirname(path)
+        dirs[directory] = dirs.get(directory, ()) + (os.path.basename(path),)
+    return dirs
+
+_WILDCARDS = frozenset("*?[")
+
+def _is_tracked(patterns: Tuple[str, ...], name: str) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, "objects", digest[:2], digest[2:])
+
+class ConfigSnapshotService:
+    """
+    Versioned history of the applied configuration. A version's manifest
+    points at one tree per collection ([key, blob] in listing order) and
+    one per generated-file directory ({name: [blob, mode]}); trees and
+    blobs are stored once by their SHA-256, so an unchanged collection or
+    directory costs nothing in a new version, and comparing two versions
+    only opens the trees whose digests differ.
+    """
+    _lock = threading.RLock()
+    _known_blobs: set = set()
+    _trees: "OrderedDict[str, object]" = OrderedDict()
+    # path -> ((mtime_ns, size, inode), digest, mode): unchanged files aren't re-read
+    _file_digests: Dict[str, Tuple[Tuple[int, int, int], str, int]] = {}
+    # collection -> (collection version, tree digest)
+    _collection_trees: Dict[str, Tuple[int, str]] = {}
+
+    # --- Blob store ---
+
+    @staticmethod
+    def _put_blob(data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in ConfigSnapshotService._known_blobs:
+            return digest
+        path = _blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(zlib.compress(data))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        ConfigSnapshotService._known_blobs.add(digest)
+        return digest
+
+    @staticmethod
+    def _get_blob(digest: str) -> bytes:
+        with open(_blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    @staticmethod
+    def _put_json(value) -> str:
+        return ConfigSnapshotService._put_blob(json.dumps(value, sort_keys=True, separators=(",", ":")).encode())
+
+    @staticmethod
+    def _get_json(digest: str):
+        cache = ConfigSnapshotService._trees
+        with ConfigSnapshotService._lock:
+            if digest in cache:
+                cache.move_to_end(digest)
+                return cache[digest]
+        value = json.loads(ConfigSnapshotService._get_blob(digest))
+        with ConfigSnapshotService._lock:
+            cache[digest] = value
+            while len(cache) > SNAPSHOT_TREE_CACHE:
+                cache.popitem(last=False)
+        return value
+
+    # --- Capturing the current state ---
+
+    @staticmethod
+    def _collection_tree(collection: str) -> str:
+        version = ConfigStore.collection_version(collection)
+        cached = ConfigSnapshotService._collection_trees.get(collection)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = ConfigStore.documents(collection)
+        tree = [[key, ConfigSnapshotService._put_blob(value.encode())] for key, value in rows]
+        digest = ConfigSnapshotService._put_json(tree)
+        # A write racing this read bumps the version again, so the next capture re-reads
+        ConfigSnapshotService._collection_trees[collection] = (version, digest)
+        return digest
+
+    @staticmethod
+    def _file_entry(path: str) -> Optional[Tuple[str, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = ConfigSnapshotService._file_digests.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        digest = ConfigSnapshotService._put_blob(data)
+        mode = stat.S_IMODE(st.st_mode)
+        ConfigSnapshotService._file_digests[path] = (key, digest, mode)
+        return digest, mode
+
+    @staticmethod
+    def _directory_tree(directory: str, patterns: Tuple[str, ...]) -> str:
+        candidates = {p for p in patterns if not _WILDCARDS.intersection(p)}
+        if len(candidates) < len(patterns):
+            try:
+                with os.scandir(directory) as it:
+                    # In-flight temp files (".uac-*.tmp") never match a generated name
+                    candidates.update(e.name for e in it if _is_tracked(patterns, e.name))
+            except OSError:
+                pass
+        tree = {}
+        for name in candidates:
+            entry = ConfigSnapshotService._file_entry(os.path.join(directory, name))
+            if entry is not None:
+                tree[name] = list(entry)
+        return ConfigSnapshotService._put_json(tree)
+
+    @staticmethod
+    def capture() -> dict:
+        """ Manifest of the current state; every blob it references is stored """
+        return {
+            "documents": {c: ConfigSnapshotService._collection_tree(c) for c in COLLECTIONS},
+            "files": {d: ConfigSnapshotService._directory_tree(d, patterns) for d, patterns in _tracked_dirs().items()}
+        }
+
+    # --- Versions ---
+
+    @staticmethod
+    def _row(version: int) -> tuple:
+        rows = ConfigStore.query("SELECT version, created_at, reason, manifest FROM snapshots WHERE version = ?", (version,))
+        if not rows:
+            raise SnapshotNotFoundError(f"Snapshot {version} not found")
+        return rows[0]
+
+    @staticmethod
+    def _to_dict(row: tuple) -> dict:
+        return {"version": row[0], "created_at": row[1], "reason": row[2], "manifest": row[3]}
+
+    @staticmethod
+    def record(reason: str = "manual") -> dict:
+        """ Stores the current state as a new version, unless it's identical to the latest one """
+        with ConfigSnapshotService._lock:
+            os.makedirs(SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+            manifest = ConfigSnapshotService._put_json(ConfigSnapshotService.capture())
+            with ConfigStore.transaction() as conn:
+                latest = conn.execute("SELECT version, created_at, reason, manifest FROM snapshots ORDER BY version DESC LIMIT 1").fetchone()
+                if latest is not None and latest[3] == manifest:
+                    return dict(ConfigSnapshotService._to_dict(latest), created=False)
+                created_at = time.time()
+                cur = conn.execute(
+                    "INSERT INTO snapshots (created_at, reason, manifest) VALUES (?, ?, ?)", (created_at, reason, manifest)
+                )
+            return {"version": cur.lastrowid, "created_at": created_at, "reason": reason, "manifest": manifest, "created": True}
+
+    @staticmethod
+    def schedule(reason: str) -> dict:
+        """ Records a version in the background; bursts of changes collapse into one """
+        return ApplyQueue.submit("snapshot", lambda: ConfigSnapshotService.record(reason))
+
+    @staticmethod
+    def _applied(subsystem: str):
+        if subsystem in SNAPSHOT_SUBSYSTEMS:
+            ConfigSnapshotService.schedule(f"apply:{subsystem}")
+
+    @staticmethod
+    def list_versions(limit: int = 50, before: Optional[int] = None) -> List[dict]:
+        rows = ConfigStore.query(
+            "SELECT version, created_at, reason, manifest FROM snapshots WHERE version < ? ORDER BY version DESC LIMIT ?",
+            (before if before is not None else 2 ** 62, limit)
+        )
+        return [ConfigSnapshotService._to_dict(r) for r in rows]
+
+    @staticmethod
+    def get_version(version: int) -> dict:
+        """ The version with its collections' keys and files' digests """
+        row = ConfigSnapshotService._row(version)
+        manifest = ConfigSnapshotService._get_json(row[3])
+        result = ConfigSnapshotService._to_dict(row)
+        result["documents"] = {c: [k for k, _ in ConfigSnapshotService._get_json(t)] for c, t in manifest["documents"].items()}
+        result["files"] = {
+            os.path.join(d, name): digest
+            for d, t in manifest["files"].items() for name, (digest, _) in ConfigSnapshotService._get_json(t).items()
+        }
+        return result
+
+    @staticmethod
+    def _manifest(version: int) -> dict:
+        return ConfigSnapshotService._get_json(ConfigSnapshotService._row(version)[3])
+
+    @staticmethod
+    def _diff_manifests(old: dict, new: dict, content: bool = False) -> dict:
+        documents = {}
+        for collection in sorted(old["documents"].keys() | new["documents"].keys()):
+            old_tree, new_tree = old["documents"].get(collection), new["documents"].get(collection)
+            if old_tree == new_tree:
+                continue
+            before = dict(ConfigSnapshotService._get_json(old_tree)) if old_tree else {}
+            after = dict(ConfigSnapshotService._get_json(new_tree)) if new_tree else {}
+            documents[collection] = {
+                "added": sorted(after.keys() - before.keys()),
+                "removed": sorted(before.keys() - after.keys()),
+                "changed": sorted(k for k in before.keys() & after.keys() if before[k] != after[k])
+            }
+
+        files = {"added": [], "removed": [], "changed": []}
+        patches = {}
+        for directory in sorted(old["files"].keys() | new["files"].keys()):
+            old_tree, new_tree = old["files"].get(directory), new["files"].get(directory)
+            if old_tree == new_tree:
+                continue
+            before = ConfigSnapshotService._get_json(old_tree) if old_tree else {}
+            after = ConfigSnapshotService._get_json(new_tree) if new_tree else {}
+            for name in sorted(before.keys() | after.keys()):
+                if before.get(name) == after.get(name):
+                    continue
+                path = os.path.join(directory, name)
+                kind = "added" if name not in before else "removed" if name not in after else "changed"
+                files[kind].append(path)
+                if content:
+                    old_text = ConfigSnapshotService._get_blob(before[name][0]).decode(errors="replace") if name in before else ""
+                    new_text = ConfigSnapshotService._get_blob(after[name][0]).decode(errors="replace") if name in after else ""
+                    patches[path] = "".join(difflib.unified_diff(
+                        old_text.splitlines(keepends=True), new_text.splitlines(keepends=True), fromfile=path, tofile=path
+                    ))
+
+        result = {"documents": documents, "files": files}
+        if content:
+            result["patches"] = patches
+        return result
+
+    @staticmethod
+    def diff(from_version: int, to_version: int, content: bool = False) -> dict:
+        """ What changed going from one version to the other; `content` adds unified diffs of the files """
+        result = ConfigSnapshotService._diff_manifests(
+            ConfigSnapshotService._manifest(from_version), ConfigSnapshotService._manifest(to_version), content
+        )
+        return dict(result, from_version=from_version, to_version=to_version)
+
+    # --- Rollback ---
+
+    @staticmethod
+    def _restore_file(path: str, data: bytes, mode: int):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".uac-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _restore_collection(collection: str, tree: List[list]):
+        # Documents that are unchanged are taken from the store as they are; only the rest come from blobs
+        current = dict(ConfigStore.documents(collection))
+        rows = []
+        for key, digest in tree:
+            value = current.get(key)
+            if value is None or hashlib.sha256(value.encode()).hexdigest() != digest:
+                value = ConfigSnapshotService._get_blob(digest).decode()
+            rows.append((key, value))
+        ConfigStore.restore_documents(collection, rows)
+
+    @staticmethod
+    def rollback(version: int) -> dict:
+        """
+        Makes `version` the current state again. The state being replaced is
+        recorded first, so a rollback can itself be rolled back. Only the
+        collections and files that differ are written.
+        """
+        target = ConfigSnapshotService._manifest(version)
+        started = time.perf_counter()
+        with ConfigSnapshotService._lock:
+            before = ConfigSnapshotService.record(f"before rollback to {version}")
+            current = ConfigSnapshotService._manifest(before["version"])
+            changes = ConfigSnapshotService._diff_manifests(current, target)
+
+            restored, removed, directories = [], [], set()
+            tracked = _tracked_dirs()
+            for directory, tree_digest in target["files"].items():
+                if current["files"].get(directory) == tree_digest or directory not in tracked:
+                    continue
+                # Only generated files are written or removed, even if an older version captured more
+                patterns = tracked[directory]
+                tree = {n: e for n, e in ConfigSnapshotService._get_json(tree_digest).items() if _is_tracked(patterns, n)}
+                current_tree = ConfigSnapshotService._get_json(current["files"][directory]) if directory in current["files"] else {}
+                current_tree = {n: e for n, e in current_tree.items() if _is_tracked(patterns, n)}
+                for name, (digest, mode) in tree.items():
+                    if current_tree.get(name) != [digest, mode]:
+                        ConfigSnapshotService._restore_file(os.path.join(directory, name), ConfigSnapshotService._get_blob(digest), mode)
+                        restored.append(os.path.join(directory, name))
+                        directories.add(directory)
+                for name in current_tree.keys() - tree.keys():
+                    try:
+                        os.remove(os.path.join(directory, name))
+                        removed.append(os.path.join(directory, name))
+                        directories.add(directory)
+                    except FileNotFoundError:
+                        pass
+
+            collections = [c for c in COLLECTIONS if current["documents"].get(c) != target["documents"].get(c)]
+            if collections:
+                with ConfigStore.transaction():
+                    for collection in collections:
+                        tree_digest = target["documents"].get(collection)
+                        ConfigSnapshotService._restore_collection(
+                            collection, ConfigSnapshotService._get_json(tree_digest) if tree_digest else []
+                        )
+            after = ConfigSnapshotService.record(f"rollback to {version}")
+
+        tags = {tag for c in collections for tag in COLLECTIONS[c]}
+        tags.update(tag for d in directories for tag in DIRECTORY_TAGS.get(d, ()))
+        ResponseCache.invalidate(*sorted(tags))
+        # Reservations come from both the profiles and the netplan files
+        if "network_profiles" in collections or NETPLAN_DIR in directories:
+            IpamService.reload()
+        if "portal_settings" in collections:
+            PortalSettingsService.invalidate()
+        # The files are back, but the running tunnel and IDS engines only follow an apply
+        jobs = []
+        if "vpn_peers" in collections:
+            jobs.append(ApplyQueue.submit("vpn", VpnConfigService.apply_configs))
+        if "ids_config" in collections:
+            jobs.append(ApplyQueue.submit("ids", IDSService.apply_saved_config))
+
+        return {
+            "rolled_back_to": version,
+            "previous_version": before["version"],
+            "version": after["version"],
+            "collections": collections,
+            "files_restored": restored,
+            "files_removed": removed,
+            "changes": changes,
+            "jobs": jobs,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+def _reset_after_fork():
+    ConfigSnapshotService._lock = threading.RLock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+ApplyQueue.on_applied(ConfigSnapshotService._applied)
@@ -0,0 +1,283 @@
+import os
+import copy
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from services.metrics import store_timer
+
+# Single embedded database replacing the per-service JSON files
+CONFIG_DB = os.getenv("UAC_CONFIG_DB", "/opt/uac-controller/config.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS snapshots (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    reason TEXT NOT NULL,
+    manifest TEXT NOT NULL
+);
+"""
+
+class ConfigStore:
+    """
+    SQLite (WAL mode) backed document store shared by every worker process.
+    Each write transaction bumps a global version counter; the in-process
+    read cache is dropped whenever the version it was filled at is stale.
+    """
+    _local = threading.local()
+    _init_lock = threading.Lock()
+    _initialized_path: Optional[str] = None
+
+    _cache_lock = threading.Lock()
+    _cache_version = -1
+    _cache: Dict[str, List[Tuple[str, Any]]] = {}
+
+    @staticmethod
+    def _connection() -> sqlite3.Connection:
+        conn = getattr(ConfigStore._local, "conn", None)
+        if conn is not None and ConfigStore._local.path == CONFIG_DB:
+            return conn
+
+        with ConfigStore._init_lock:
+            if ConfigStore._initialized_path != CONFIG_DB:
+                os.makedirs(os.path.dirname(CONFIG_DB) or ".", exist_ok=True)
+                init = sqlite3.connect(CONFIG_DB, timeout=30)
+                init.execute("PRAGMA journal_mode=WAL")
+                init.executescript(_SCHEMA)
+                init.commit()
+                init.close()
+                ConfigStore._initialized_path = CONFIG_DB
+
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(CONFIG_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        ConfigStore._local.conn = conn
+        ConfigStore._local.path = CONFIG_DB
+        ConfigStore._local.depth = 0
+        ConfigStore._local.touched = set()
+        return conn
+
+    @staticmethod
+    def version() -> int:
+        row = ConfigStore._connection().execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def collection_version(collection: str) -> int:
+        """ Counter bumped only by commits that wrote to `collection` """
+        row = ConfigStore._connection().execute("SELECT value FROM meta WHERE name = ?", (f"version:{collection}",)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _touch(collection: str):
+        ConfigStore._local.touched.add(collection)
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Atomic multi-key write. Nested calls on the same thread join the
+        outermost transaction, which takes the database write lock up front
+        so concurrent read-modify-write cycles are serialized across workers.
+        """
+        conn = ConfigStore._connection()
+        if ConfigStore._local.depth:
+            ConfigStore._local.depth += 1
+            try:
+                yield conn
+            finally:
+                ConfigStore._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        ConfigStore._local.depth = 1
+        try:
+            yield conn
+            conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'version'")
+            for collection in ConfigStore._local.touched:
+                conn.execute(
+                    "INSERT INTO meta (name, value) VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET value = value + 1",
+                    (f"version:{collection}",)
+                )
+            with store_timer("config_store", "commit"):
+                conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            ConfigStore._local.depth = 0
+            ConfigStore._local.touched = set()
+            # Our own write invalidates the cache immediately
+            with ConfigStore._cache_lock:
+                ConfigStore._cache_version = -1
+                ConfigStore._cache = {}
+
+    @staticmethod
+    def _load(collection: str) -> List[Tuple[str, Any]]:
+        conn = ConfigStore._connection()
+        if ConfigStore._local.depth:
+            # Inside a transaction: read through so we see our own uncommitted writes
+            rows = conn.execute("SELECT key, value FROM documents WHERE collection = ? ORDER BY rowid", (collection,)).fetchall()
+            return [(k, json.loads(v)) for k, v in rows]
+
+        version = ConfigStore.version()
+        with ConfigStore._cache_lock:
+            if ConfigStore._cache_version == version and collection in ConfigStore._cache:
+                return ConfigStore._cache[collection]
+
+        with store_timer("config_store", "read"):
+            rows = conn.execute("SELECT key, value FROM documents WHERE collection = ? ORDER BY rowid", (collection,)).fetchall()
+        with store_timer("config_store", "parse"):
+            items = [(k, json.loads(v)) for k, v in rows]
+        with ConfigStore._cache_lock:
+            if ConfigStore._cache_version != version:
+                ConfigStore._cache = {}
+                ConfigStore._cache_version = version
+            ConfigStore._cache[collection] = items
+        return items
+
+    @staticmethod
+    def documents(collection: str) -> List[Tuple[str, str]]:
+        """ (key, serialized value) rows in listing order, read past the cache """
+        return ConfigStore._connection().execute(
+            "SELECT key, value FROM documents WHERE collection = ? ORDER BY rowid", (collection,)
+        ).fetchall()
+
+    @staticmethod
+    def restore_documents(collection: str, rows: List[Tuple[str, str]]):
+        """ Replaces the whole collection with already serialized (key, value) rows """
+        with ConfigStore.transaction() as conn:
+            ConfigStore._touch(collection)
+            conn.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            conn.executemany(
+                "INSERT INTO documents (collection, key, value) VALUES (?, ?, ?)",
+                [(collection, key, value) for key, value in rows]
+            )
+
+    @staticmethod
+    def query(sql: str, params: tuple = ()) -> List[tuple]:
+        """ Read-only query against the store's other tables (e.g. snapshots) """
+        return ConfigStore._connection().execute(sql, params).fetchall()
+
+    @staticmethod
+    def reset_cache():
+        with ConfigStore._cache_lock:
+            ConfigStore._cache_version = -1
+            ConfigStore._cache = {}
+
+def _reset_after_fork():
+    # The child inherits the parent's thread-local SQLite handle, which must not be shared
+    ConfigStore._local = threading.local()
+    ConfigStore.reset_cache()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+class Collection:
+    """
+    Typed view over one collection of the config store. Values are validated
+    against `model` (a Pydantic model) on write when one is given. Reads
+    return copies, so callers are free to mutate what they get back.
+    `legacy_file` is imported once if the collection has never been written.
+    """
+
+    def __init__(self, name: str, model=None, legacy_file: Optional[str] = None, legacy_key=None):
+        self.name = name
+        self.model = model
+        self.legacy_file = legacy_file
+        self.legacy_key = legacy_key
+        self._migrated = False
+
+    def _serialize(self, value: Any) -> str:
+        if self.model is not None:
+            if isinstance(value, self.model):
+                value = value.model_dump()
+            else:
+                value = self.model(**value).model_dump()
+        return json.dumps(value)
+
+    def _migrate(self):
+        if self._migrated:
+            return
+        self._migrated = True
+        if not self.legacy_file:
+            return
+
+        marker = f"migrated:{self.name}"
+        conn = ConfigStore._connection()
+        if conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+            return
+
+        with ConfigStore.transaction():
+            if conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                return
+            if os.path.exists(self.legacy_file):
+                try:
+                    with open(self.legacy_file, "r") as f:
+                        data = json.load(f)
+                    items = data if isinstance(data, list) else [data]
+                    for item in items:
+                        key = self.legacy_key(item)
+                        conn.execute(
+                            "INSERT OR IGNORE INTO documents (collection, key, value) VALUES (?, ?, ?)",
+                            (self.name, key, json.dumps(item))
+                        )
+                except Exception as e:
+                    print(f"Warning: could not import {self.legacy_file} into '{self.name}': {e}")
+            conn.execute("INSERT INTO meta (name, value) VALUES (?, 1)", (marker,))
+            ConfigStore._touch(self.name)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        self._migrate()
+        return copy.deepcopy(ConfigStore._load(self.name))
+
+    def all(self) -> List[Any]:
+        return [value for _, value in self.items()]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._migrate()
+        for k, value in ConfigStore._load(self.name):
+            if k == key:
+                return copy.deepcopy(value)
+        return default
+
+    def put(self, key: str, value: Any):
+        self._migrate()
+        with ConfigStore.transaction() as conn:
+            ConfigStore._touch(self.name)
+            # Upsert keeps the rowid, so listing order is insertion order
+            conn.execute(
+                "INSERT INTO documents (collection, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection, key) DO UPDATE SET value = excluded.value",
+                (self.name, key, self._serialize(value))
+            )
+
+    def delete(self, key: str) -> bool:
+        self._migrate()
+        with ConfigStore.transaction() as conn:
+            ConfigStore._touch(self.name)
+            cur = conn.execute("DELETE FROM documents WHERE collection = ? AND key = ?", (self.name, key))
+            return cur.rowcount > 0
+
+    def replace_all(self, items: List[Tuple[str, Any]]):
+        """ Atomically replaces the whole collection, preserving the given order """
+        self._migrate()
+        with ConfigStore.transaction() as conn:
+            ConfigStore._touch(self.name)
+            conn.execute("DELETE FROM documents WHERE collection = ?", (self.name,))
+            conn.executemany(
+                "INSERT INTO documents (collection, key, value) VALUES (?, ?, ?)",
+                [(self.name, key, self._serialize(value)) for key, value in items]
+            )
@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+from collections import Counter
+from typing import Dict, Optional, Set, Tuple
+from starlette.concurrency import run_in_threadpool
+from database import AsyncSessionLocal
+from services.analytics import AnalyticsService
+from services.hardware import HardwareService
+from services.ids import IDSService
+from services.vpn import VpnConfigService
+from services.vpn_telemetry import VpnTelemetryService
+from services.firewall import FirewallService
+
+# Rows kept per list section; the full lists stay on their own endpoints
+DASHBOARD_ITEMS = int(os.getenv("DASHBOARD_ITEMS", "10"))
+# A source slower than this is reported as an error instead of holding up the page
+DASHBOARD_SOURCE_TIMEOUT_SEC = float(os.getenv("DASHBOARD_SOURCE_TIMEOUT_SEC", "5"))
+
+async def _analytics_section() -> dict:
+    # Own session: the other sections don't touch the database
+    async with AsyncSessionLocal() as db:
+        return await AnalyticsService.summary(db, recent_limit=DASHBOARD_ITEMS)
+
+def _ports_section() -> dict:
+    ports = HardwareService.get_physical_ports()
+    return {
+        "total": len(ports),
+        "up": sum(1 for p in ports if p.get("operstate") == "up"),
+        "assigned": sum(1 for p in ports if p.get("assigned_profile_id")),
+        "items": [
+            {"name": p["name"], "operstate": p.get("operstate"), "assigned_profile_id": p.get("assigned_profile_id")}
+            for p in ports[:DASHBOARD_ITEMS]
+        ]
+    }
+
+def _profiles_section() -> dict:
+    profiles = HardwareService.get_network_profiles()
+    return {
+        "total": len(profiles),
+        "items": [{"id": p["id"], "name": p.get("name"), "vlan_id": p.get("vlan_id")} for p in profiles[:DASHBOARD_ITEMS]]
+    }
+
+def _ids_section() -> dict:
+    # The newest alerts only: the IDS logs have no cheap total, so counts cover this window
+    alerts = IDSService.get_recent_alerts(limit=100)
+    return {
+        "recent_count": len(alerts),
+        "by_severity": dict(Counter(str(a.get("severity")) for a in alerts)),
+        "recent": [
+            {k: a.get(k) for k in ("timestamp", "severity", "signature", "source_ip")}
+            for a in alerts[:DASHBOARD_ITEMS]
+        ]
+    }
+
+def _vpn_section() -> dict:
+    peers = VpnTelemetryService.join(VpnConfigService.get_all_peers())
+    items = []
+    for p in peers:
+        telemetry = p.get("telemetry") or {}
+        items.append({
+            "name": p["name"],
+            "mode": p.get("mode"),
+            "is_active": p.get("is_active", True),
+            "online": telemetry.get("online"),
+            "rx_bps": telemetry.get("rx_bps"),
+            "tx_bps": telemetry.get("tx_bps")
+        })
+    # Busiest tunnels first
+    top = sorted(items, key=lambda i: (not i["online"], -((i["rx_bps"] or 0) + (i["tx_bps"] or 0))))
+    return {
+        "total": len(items),
+        "active": sum(1 for i in items if i["is_active"]),
+        "online": sum(1 for i in items if i["online"]),
+        "items": top[:DASHBOARD_ITEMS]
+    }
+
+def _firewall_section() -> dict:
+    rules = FirewallService.get_policy().rules
+    enabled = [r for r in rules if r.enabled]
+    return {
+        "rules": len(rules),
+        "enabled": len(enabled),
+        "blocked_apps": [r.app_id for r in enabled if r.action != "ACCEPT"]
+    }
+
+# name -> (loader, blocking); blocking loaders run in the threadpool
+SECTIONS = {
+    "analytics": (_analytics_section, False),
+    "ports": (_ports_section, True),
+    "profiles": (_profiles_section, True),
+    "ids": (_ids_section, True),
+    "vpn": (_vpn_section, True),
+    "firewall": (_firewall_section, True),
+}
+
+class DashboardService:
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Dict[str, Optional[Set[str]]]:
+        """
+        "ports,vpn.online,vpn.total" -> {"ports": None, "vpn": {"online", "total"}}
+        (None keeps the whole section). Empty selects every section.
+        """
+        if not fields or not fields.strip():
+            return {name: None for name in SECTIONS}
+        selected: Dict[str, Optional[Set[str]]] = {}
+        for field in fields.split(","):
+            field = field.strip()
+            if not field:
+                continue
+            section, _, key = field.partition(".")
+            if section not in SECTIONS:
+                raise ValueError(f"Unknown dashboard section '{section}' (expected one of {', '.join(SECTIONS)})")
+            if not key:
+                selected[section] = None
+            elif section not in selected or selected[section] is not None:
+                selected.setdefault(section, set()).add(key)
+        return selected
+
+    @staticmethod
+    async def _load(name: str) -> Tuple[dict, float]:
+        loader, blocking = SECTIONS[name]
+        started = time.perf_counter()
+        try:
+            pending = run_in_threadpool(loader) if blocking else loader()
+            section = await asyncio.wait_for(pending, DASHBOARD_SOURCE_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            section = {"error": f"timed out after {DASHBOARD_SOURCE_TIMEOUT_SEC:g}s"}
+        except Exception as e:
+            # One broken source shouldn't blank the whole dashboard
+            print(f"Warning: dashboard section '{name}' failed: {e}")
+            section = {"error": str(e)}
+        return section, time.perf_counter() - started
+
+    @staticmethod
+    async def overview(fields: Optional[str] = None) -> Tuple[dict, Dict[str, float]]:
+        """
+        Loads the selected sections concurrently, so the response takes as
+        long as the slowest source rather than the sum of all of them.
+        Returns (overview, seconds spent per section).
+        """
+        selected = DashboardService.parse_fields(fields)
+        names = list(selected)
+        results = await asyncio.gather(*(DashboardService._load(name) for name in names))
+
+        overview, timings = {}, {}
+        for name, (section, elapsed) in zip(names, results):
+            keys = selected[name]
+            if keys is not None and "error" not in section:
+                section = {k: section[k] for k in keys if k in section}
+            overview[name] = section
+            timings[name] = elapsed
+        return overview, timings
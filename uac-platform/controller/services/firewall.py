@@ -1,11 +1,13 @@
 import os
-import json
 from typing import List
 from models.firewall import ApplicationProtocol, FirewallPolicy, FirewallRule
+from services.config_store import Collection
+from services.response_cache import ResponseCache
 
 HOST_FS_ROOT = os.getenv("HOST_FS_ROOT", "/host-fs")
 FIREWALL_DIR = os.path.join(HOST_FS_ROOT, "etc/firewall")
 RULES_SCRIPT = os.path.join(FIREWALL_DIR, "rules.sh")
+# Legacy JSON state, imported into the config store on first use
 STATE_FILE = os.path.join(FIREWALL_DIR, "state.json")
 
 SUPPORTED_APPS = [
@@ -21,6 +23,8 @@ SUPPORTED_APPS = [
     ApplicationProtocol(id="tor", name="Tor", category="Anonymizer"),
 ]
 
+policy_collection = Collection("firewall_policy", model=FirewallPolicy, legacy_file=STATE_FILE, legacy_key=lambda _: "policy")
+
 class FirewallService:
     @staticmethod
     def _ensure_dir():
@@ -32,24 +36,27 @@ class FirewallService:
 
     @staticmethod
     def get_policy() -> FirewallPolicy:
-        FirewallService._ensure_dir()
-        if not os.path.exists(STATE_FILE):
+        data = policy_collection.get("policy")
+        if data is None:
             return FirewallPolicy(rules=[])
         
         try:
-            with open(STATE_FILE, 'r') as f:
-                data = json.load(f)
             return FirewallPolicy(**data)
         except:
             return FirewallPolicy(rules=[])
 
     @staticmethod
     def update_policy(policy: FirewallPolicy):
+        # 1. Save State (the script is generated by the apply queue)
+        policy_collection.put("policy", policy)
+        ResponseCache.invalidate("security")
+        return {"status": "updated", "script_path": RULES_SCRIPT}
+
+    @staticmethod
+    def generate_rules():
+        """ Renders the iptables script for the currently saved policy """
         FirewallService._ensure_dir()
-        
-        # 1. Save State
-        with open(STATE_FILE, 'w') as f:
-            f.write(policy.model_dump_json(indent=2))
+        policy = FirewallService.get_policy()
 
         # 2. Generate Shell Script
         with open(RULES_SCRIPT, 'w') as f:
@@ -69,5 +76,3 @@ class FirewallService:
 
         # Make executable
         os.chmod(RULES_SCRIPT, 0o755)
-        
-        return {"status": "updated", "script_path": RULES_SCRIPT}
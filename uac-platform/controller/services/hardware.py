@@ -1,11 +1,18 @@
 import os
 import glob
-import json
 from typing import List, Dict
+from models.network import PhysicalPort, NetworkProfile
+from services.config_store import Collection, ConfigStore
+from services.response_cache import ResponseCache
 
-# Mock hardware storage for MVP
+# Legacy JSON stores, imported into the config store on first use
 PORTS_STORE = "/opt/uac-controller/ports.json"
 PROFILES_STORE = "/opt/uac-controller/network_profiles.json"
+# Overridable so discovery can run against a synthetic sysfs tree
+SYS_CLASS_NET = os.getenv("SYS_CLASS_NET", "/sys/class/net")
+
+ports_collection = Collection("ports", model=PhysicalPort, legacy_file=PORTS_STORE, legacy_key=lambda p: p["name"])
+profiles_collection = Collection("network_profiles", model=NetworkProfile, legacy_file=PROFILES_STORE, legacy_key=lambda p: p["id"])
 
 class HardwareService:
     @staticmethod
@@ -14,20 +21,13 @@ class HardwareService:
         In production, reads from /sys/class/net/
         Simulating dynamic hardware discovery for development.
         """
-        # Read saved state if exists (for assigned profiles)
-        saved_ports_map = {}
-        if os.path.exists(PORTS_STORE):
-            try:
-                with open(PORTS_STORE, "r") as f:
-                    saved_ports = json.load(f)
-                    saved_ports_map = {p["name"]: p for p in saved_ports}
-            except Exception:
-                pass
+        # Read saved state (for assigned profiles)
+        saved_ports_map = dict(ports_collection.items())
 
         discovered_ports = []
         try:
             # Read from Linux sysfs
-            interfaces = [os.path.basename(p) for p in glob.glob('/sys/class/net/*')]
+            interfaces = [os.path.basename(p) for p in glob.glob(os.path.join(SYS_CLASS_NET, '*'))]
             # Filter out virtual interfaces
             interfaces = [i for i in interfaces if i != 'lo' and not i.startswith('veth') and not i.startswith('wg') and not i.startswith('bridge') and not i.startswith('docker') and not i.startswith('br-') and '.' not in i]
             
@@ -36,11 +36,11 @@ class HardwareService:
                 operstate = "down"
                 speed = -1
                 try:
-                    with open(f"/sys/class/net/{iface}/address", "r") as f:
+                    with open(os.path.join(SYS_CLASS_NET, iface, "address"), "r") as f:
                         mac = f.read().strip()
-                    with open(f"/sys/class/net/{iface}/operstate", "r") as f:
+                    with open(os.path.join(SYS_CLASS_NET, iface, "operstate"), "r") as f:
                         operstate = f.read().strip()
-                    with open(f"/sys/class/net/{iface}/speed", "r") as f:
+                    with open(os.path.join(SYS_CLASS_NET, iface, "speed"), "r") as f:
                         speed = int(f.read().strip())
                 except Exception:
                     pass
@@ -58,64 +58,60 @@ class HardwareService:
             print(f"Warning: Hardware discovery failed: {e}")
             discovered_ports = []
 
-        # Sync store
-        with open(PORTS_STORE, "w") as f:
-            json.dump(discovered_ports, f, indent=4)
-            
+        # Sync store, only writing when discovery actually changed something
+        unchanged = len(saved_ports_map) == len(discovered_ports) and all(saved_ports_map.get(p["name"]) == p for p in discovered_ports)
+        if not unchanged:
+            HardwareService._sync_ports(discovered_ports)
+
         return discovered_ports
 
+    @staticmethod
+    def _sync_ports(discovered_ports: List[Dict]):
+        with ConfigStore.transaction():
+            # Re-read under the write lock so a concurrent assignment isn't lost
+            saved = dict(ports_collection.items())
+            for p in discovered_ports:
+                if p["name"] in saved:
+                    p["assigned_profile_id"] = saved[p["name"]].get("assigned_profile_id")
+            ports_collection.replace_all([(p["name"], p) for p in discovered_ports])
+        ResponseCache.invalidate("network")
+
     @staticmethod
     def assign_profile_to_port(port_name: str, profile_id: str):
         ports = HardwareService.get_physical_ports()
+        with ConfigStore.transaction():
+            port = ports_collection.get(port_name)
+            if port is not None:
+                port["assigned_profile_id"] = profile_id if profile_id else None
+                ports_collection.put(port_name, port)
+        ResponseCache.invalidate("network")
+
         for p in ports:
             if p["name"] == port_name:
                 p["assigned_profile_id"] = profile_id if profile_id else None
                 break
-        
-        with open(PORTS_STORE, "w") as f:
-            json.dump(ports, f, indent=4)
-            
+
         # Here we would normally trigger `NetplanService` and `ChilliConfigService`
         return ports
 
     @staticmethod
     def get_network_profiles() -> List[Dict]:
-        if not os.path.exists(PROFILES_STORE):
-            return []
-        with open(PROFILES_STORE, "r") as f:
-            return json.load(f)
+        return profiles_collection.all()
 
     @staticmethod
     def save_network_profile(profile_data: dict):
-        profiles = HardwareService.get_network_profiles()
-        # Update or append
-        updated = False
-        for i, p in enumerate(profiles):
-            if p["id"] == profile_data["id"]:
-                profiles[i] = profile_data
-                updated = True
-                break
-        if not updated:
-            profiles.append(profile_data)
-            
-        with open(PROFILES_STORE, "w") as f:
-            json.dump(profiles, f, indent=4)
+        # Upsert: existing profiles are updated in place, new ones appended
+        profiles_collection.put(profile_data["id"], profile_data)
+        ResponseCache.invalidate("network")
         return profile_data
         
     @staticmethod
     def delete_network_profile(profile_id: str):
-        profiles = HardwareService.get_network_profiles()
-        profiles = [p for p in profiles if p["id"] != profile_id]
-        with open(PROFILES_STORE, "w") as f:
-            json.dump(profiles, f, indent=4)
-            
-        # Remove from any mapped ports
-        ports = HardwareService.get_physical_ports()
-        modified = False
-        for p in ports:
-            if p.get("assigned_profile_id") == profile_id:
-                p["assigned_profile_id"] = None
-                modified = True
-        if modified:
-            with open(PORTS_STORE, "w") as f:
-                json.dump(ports, f, indent=4)
+        # Profile removal and port unmapping commit together
+        with ConfigStore.transaction():
+            profiles_collection.delete(profile_id)
+            for name, port in ports_collection.items():
+                if port.get("assigned_profile_id") == profile_id:
+                    port["assigned_profile_id"] = None
+                    ports_collection.put(name, port)
+        ResponseCache.invalidate("network")
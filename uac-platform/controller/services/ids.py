@@ -1,33 +1,41 @@
 import os
 import json
+from typing import Iterator, Optional
 from models.security import IdsConfig # type: ignore
+from services.config_store import Collection
+from services.metrics import IDS_LOG_LINES, store_timer
 
-# Simulated storage paths
+# Simulated storage paths (CONFIG_STORE is the legacy JSON file, imported on first use)
 CONFIG_STORE = "/opt/uac-controller/ids_config.json"
-SURICATA_LOG = "/var/log/suricata/eve.json"
-SNORT_LOG = "/var/log/snort/alert_json.txt"
+SURICATA_LOG = os.getenv("SURICATA_LOG", "/var/log/suricata/eve.json")
+SNORT_LOG = os.getenv("SNORT_LOG", "/var/log/snort/alert_json.txt")
+# Logs are read backwards in blocks of this size, so only their tail is touched
+IDS_TAIL_BLOCK_BYTES = int(os.getenv("IDS_TAIL_BLOCK_BYTES", "65536"))
+
+ids_collection = Collection("ids_config", model=IdsConfig, legacy_file=CONFIG_STORE, legacy_key=lambda _: "config")
 
 class IDSService:
     @staticmethod
     def get_config() -> dict:
-        if not os.path.exists(CONFIG_STORE):
+        config = ids_collection.get("config")
+        if config is None:
             return {
                 "enabled": False,
                 "engine": "suricata",
                 "mode": "detection",
                 "interfaces": ["eth0"]
             }
-        with open(CONFIG_STORE, "r") as f:
-            return json.load(f)
+        return config
 
     @staticmethod
     def save_config(config: IdsConfig):
-        with open(CONFIG_STORE, "w") as f:
-            json.dump(config.model_dump(), f, indent=4)
-        
-        IDSService.apply_config(config)
+        ids_collection.put("config", config)
         return config.model_dump()
 
+    @staticmethod
+    def apply_saved_config():
+        IDSService.apply_config(IdsConfig(**IDSService.get_config()))
+
     @staticmethod
     def apply_config(config: IdsConfig):
         """
@@ -44,8 +52,8 @@ class IDSService:
     @staticmethod
     def generate_mock_logs():
         """ Helper function to seed mock logs for testing the UI """
-        os.makedirs("/var/log/suricata", exist_ok=True)
-        os.makedirs("/var/log/snort", exist_ok=True)
+        os.makedirs(os.path.dirname(SURICATA_LOG), exist_ok=True)
+        os.makedirs(os.path.dirname(SNORT_LOG), exist_ok=True)
         
         suricata_mock = '{"timestamp":"2026-02-23T10:15:30.000000+0000","event_type":"alert","src_ip":"192.168.1.100","dest_ip":"8.8.8.8","alert":{"action":"allowed","signature":"ET MALWARE Suspicious User-Agent","category":"A Network Trojan was detected","severity":1}}\n'
         with open(SURICATA_LOG, "w") as f:
@@ -57,45 +65,72 @@ class IDSService:
 
     @staticmethod
     def get_recent_alerts(limit=50):
+        """ The `limit` newest alerts, newest first, read from the end of the engine's log """
         config = IDSService.get_config()
         alerts = []
-        
+
         # In a real environment, you'd parse logs dynamically.
         # For this MVP, we will read the mock logs to demonstrate the parser wrapper.
         if not os.path.exists(SURICATA_LOG) or not os.path.exists(SNORT_LOG):
             IDSService.generate_mock_logs()
 
+        engine = "suricata" if config.get("engine") == "suricata" else "snort"
+        path, parse = (SURICATA_LOG, _parse_suricata) if engine == "suricata" else (SNORT_LOG, _parse_snort)
+        lines = 0
         try:
-            if config.get("engine") == "suricata":
-                with open(SURICATA_LOG, "r") as f:
-                    for line in f.readlines():
-                        if not line.strip(): continue
-                        data = json.loads(line)
-                        if data.get("event_type") == "alert":
-                            alerts.append({
-                                "timestamp": data.get("timestamp"),
-                                "source_ip": data.get("src_ip"),
-                                "dest_ip": data.get("dest_ip"),
-                                "signature": data.get("alert", {}).get("signature", "Unknown"),
-                                "severity": data.get("alert", {}).get("severity", 3),
-                                "category": data.get("alert", {}).get("category", "Generic"),
-                                "engine": "Suricata"
-                            })
-            else: # Snort 3 logic
-                with open(SNORT_LOG, "r") as f:
-                    for line in f.readlines():
-                        if not line.strip(): continue
-                        data = json.loads(line)
-                        alerts.append({
-                            "timestamp": data.get("timestamp"),
-                            "source_ip": data.get("src_addr"),
-                            "dest_ip": data.get("dst_addr"),
-                            "signature": data.get("msg", "Unknown"),
-                            "severity": data.get("priority", 3),
-                            "category": data.get("class_desc", "Generic"),
-                            "engine": "Snort"
-                        })
-        except Exception as e:
-            print(f"Error parsing logs: {e}")
-            
-        return alerts[:limit]
+            with store_timer("ids_log", "read"), open(path, "rb") as f:
+                for line in _reverse_lines(f):
+                    if len(alerts) >= limit:
+                        break
+                    if not line.strip():
+                        continue
+                    lines += 1
+                    try:
+                        alert = parse(json.loads(line))
+                    except ValueError:
+                        # Typically the line the engine is still writing
+                        continue
+                    if alert is not None:
+                        alerts.append(alert)
+        except OSError as e:
+            print(f"Error reading IDS log {path}: {e}")
+        IDS_LOG_LINES.inc(lines, engine=engine)
+        return alerts
+
+def _reverse_lines(f) -> Iterator[bytes]:
+    """ Lines of an open binary file from the last to the first, reading IDS_TAIL_BLOCK_BYTES at a time """
+    position = f.seek(0, os.SEEK_END)
+    partial = b""
+    while position > 0:
+        size = min(IDS_TAIL_BLOCK_BYTES, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + partial).split(b"\n")
+        # The first piece may continue in the previous block
+        partial = lines.pop(0)
+        yield from reversed(lines)
+    yield partial
+
+def _parse_suricata(data: dict) -> Optional[dict]:
+    if data.get("event_type") != "alert":
+        return None
+    return {
+        "timestamp": data.get("timestamp"),
+        "source_ip": data.get("src_ip"),
+        "dest_ip": data.get("dest_ip"),
+        "signature": data.get("alert", {}).get("signature", "Unknown"),
+        "severity": data.get("alert", {}).get("severity", 3),
+        "category": data.get("alert", {}).get("category", "Generic"),
+        "engine": "Suricata"
+    }
+
+def _parse_snort(data: dict) -> Optional[dict]:
+    return {
+        "timestamp": data.get("timestamp"),
+        "source_ip": data.get("src_addr"),
+        "dest_ip": data.get("dst_addr"),
+        "signature": data.get("msg", "Unknown"),
+        "severity": data.get("priority", 3),
+        "category": data.get("class_desc", "Generic"),
+        "engine": "Snort"
+    }
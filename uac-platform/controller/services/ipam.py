@@ -0,0 +1,314 @@
+import os
+import ipaddress
+import threading
+import yaml
+from typing import Dict, List, Optional, Tuple
+from services.config_store import ConfigStore
+from services.hardware import HardwareService, profiles_collection
+from services.netplan import NETPLAN_DIR, YamlLoader
+
+class IpamConflictError(ValueError):
+    """ Raised when a prefix or VLAN ID is already assigned to someone else """
+
+class _Node:
+    __slots__ = ("children", "owners", "count", "full")
+
+    def __init__(self):
+        self.children = [None, None]
+        self.owners = set()
+        self.count = 0      # Number of assignments in this subtree
+        self.full = False   # Whole subtree is covered by assignments
+
+class PrefixTrie:
+    """
+    Binary radix trie for one address family. Every assigned prefix lives on
+    the node reached by walking its network bits, so overlap checks and
+    inserts only touch prefix-length nodes.
+    """
+
+    def __init__(self, max_len: int):
+        self.max_len = max_len
+        self.root = _Node()
+
+    def _bit(self, value: int, depth: int) -> int:
+        return (value >> (self.max_len - 1 - depth)) & 1
+
+    def _path(self, network, create=False) -> List[_Node]:
+        value = int(network.network_address)
+        node = self.root
+        path = [node]
+        for depth in range(network.prefixlen):
+            bit = self._bit(value, depth)
+            child = node.children[bit]
+            if child is None:
+                if not create:
+                    return path
+                child = node.children[bit] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    @staticmethod
+    def _refresh(path: List[_Node]):
+        for node in reversed(path):
+            left, right = node.children
+            node.count = len(node.owners) + (left.count if left else 0) + (right.count if right else 0)
+            node.full = bool(node.owners) or bool(left and right and left.full and right.full)
+
+    def insert(self, network, owner: str):
+        path = self._path(network, create=True)
+        path[-1].owners.add(owner)
+        self._refresh(path)
+
+    def remove(self, network, owner: str):
+        path = self._path(network)
+        if len(path) != network.prefixlen + 1:
+            return
+        path[-1].owners.discard(owner)
+        # Prune empty branches so the trie does not grow with churn
+        value = int(network.network_address)
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+            if node.owners or node.children[0] or node.children[1]:
+                break
+            path[depth - 1].children[self._bit(value, depth - 1)] = None
+            path.pop()
+        self._refresh(path)
+
+    def find_exact(self, network) -> Optional[str]:
+        """ Returns an owner of exactly `network` """
+        path = self._path(network)
+        if len(path) != network.prefixlen + 1 or not path[-1].owners:
+            return None
+        return next(iter(path[-1].owners))
+
+    def longest_match(self, network) -> Optional[str]:
+        """ Returns an owner of the most specific prefix containing `network`, as a router would pick """
+        owner = None
+        for node in self._path(network):
+            if node.owners:
+                owner = next(iter(node.owners))
+        return owner
+
+    def find_overlap(self, network) -> Optional[str]:
+        """ Returns an owner whose prefix contains or is contained in `network` """
+        path = self._path(network)
+        for node in path:
+            if node.owners:
+                return next(iter(node.owners))
+        if len(path) != network.prefixlen + 1:
+            return None
+
+        # Reached the exact node: anything below it is a more specific overlap
+        node = path[-1]
+        while node and node.count:
+            if node.owners:
+                return next(iter(node.owners))
+            left, right = node.children
+            node = left if left and left.count else right
+        return None
+
+    def next_free(self, within, prefix_len: int) -> Optional[int]:
+        """ Returns the lowest network address of a free `prefix_len` block inside `within` """
+        path = self._path(within)
+        if any(node.owners for node in path):
+            return None
+        if len(path) != within.prefixlen + 1:
+            return int(within.network_address)
+
+        base = int(within.network_address)
+
+        def walk(node: _Node, depth: int, value: int) -> Optional[int]:
+            if depth == prefix_len:
+                # A node at the target depth means the block is at least partially used
+                return None
+            for bit in (0, 1):
+                child = node.children[bit]
+                child_value = value | (bit << (self.max_len - 1 - depth))
+                if child is None:
+                    return child_value
+                if not child.full:
+                    found = walk(child, depth + 1, child_value)
+                    if found is not None:
+                        return found
+            return None
+
+        if path[-1].full:
+            return None
+        return walk(path[-1], within.prefixlen, base)
+
+class IpamService:
+    """
+    In-process index of every assigned prefix (network profiles and manually
+    created VLANs) plus the VLAN IDs in use per parent interface.
+    Built lazily from the profile store and the UAC netplan files, and
+    rebuilt whenever the profile collection's version or the netplan
+    directory's mtime moved, so writes made by other workers (or a config
+    rollback) are seen on the next call.
+    """
+    _lock = threading.RLock()
+    _signature: Optional[Tuple[int, int]] = None
+    _tries: Dict[int, PrefixTrie] = {}
+    _prefixes: Dict[str, object] = {}
+    _vlans: Dict[Tuple[str, int], str] = {}
+
+    @staticmethod
+    def _network(ip_cidr: str):
+        try:
+            return ipaddress.ip_interface(ip_cidr).network
+        except ValueError as e:
+            raise ValueError(f"Invalid CIDR '{ip_cidr}': {e}")
+
+    @staticmethod
+    def _trie(network) -> PrefixTrie:
+        return IpamService._tries[network.version]
+
+    @staticmethod
+    def _current_signature() -> Tuple[int, int]:
+        try:
+            # Files are created, renamed into place or removed, all of which bump the directory
+            mtime = os.stat(NETPLAN_DIR).st_mtime_ns
+        except OSError:
+            mtime = 0
+        return (ConfigStore.collection_version(profiles_collection.name), mtime)
+
+    @staticmethod
+    def _ensure_loaded():
+        signature = IpamService._current_signature()
+        if signature == IpamService._signature:
+            return
+        with IpamService._lock:
+            if signature == IpamService._signature:
+                return
+            # Taken before the build: a write racing it moves the signature again
+            IpamService._build()
+            IpamService._signature = signature
+
+    @staticmethod
+    def _build():
+        IpamService._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        IpamService._prefixes = {}
+        IpamService._vlans = {}
+
+        for profile in HardwareService.get_network_profiles():
+            if profile.get("ip_cidr"):
+                try:
+                    IpamService._assign(f"profile:{profile['id']}", IpamService._network(profile["ip_cidr"]))
+                except ValueError as e:
+                    print(f"Warning: IPAM skipped profile {profile.get('id')}: {e}")
+
+        if not os.path.isdir(NETPLAN_DIR):
+            return
+        for filename in os.listdir(NETPLAN_DIR):
+            if not (filename.startswith("10-uac-vlan") and filename.endswith(".yaml")):
+                continue
+            try:
+                with open(os.path.join(NETPLAN_DIR, filename), 'r') as f:
+                    config = yaml.load(f, Loader=YamlLoader) or {}
+                for vlan_name, vlan_data in config.get("network", {}).get("vlans", {}).items():
+                    owner = f"vlan:{vlan_name}"
+                    IpamService._vlans[(vlan_data.get("link"), vlan_data.get("id"))] = owner
+                    for address in vlan_data.get("addresses") or []:
+                        IpamService._assign(owner, IpamService._network(address))
+            except Exception as e:
+                print(f"Warning: IPAM failed to index {filename}: {e}")
+
+    @staticmethod
+    def _assign(owner: str, network):
+        IpamService._trie(network).insert(network, owner)
+        IpamService._prefixes[owner] = network
+
+    @staticmethod
+    def _unassign(owner: str):
+        network = IpamService._prefixes.pop(owner, None)
+        if network is not None:
+            IpamService._trie(network).remove(network, owner)
+
+    @staticmethod
+    def _check(owner: str, network):
+        conflict = IpamService._trie(network).find_overlap(network)
+        if conflict and conflict != owner:
+            raise IpamConflictError(f"{network} overlaps {IpamService._prefixes.get(conflict, '')} assigned to {conflict}")
+
+    @staticmethod
+    def reload():
+        with IpamService._lock:
+            signature = IpamService._current_signature()
+            IpamService._build()
+            IpamService._signature = signature
+
+    @staticmethod
+    def reserve_profile(profile_id: str, ip_cidr: Optional[str]):
+        """ Reserves (or moves) the prefix of a network profile """
+        IpamService._ensure_loaded()
+        owner = f"profile:{profile_id}"
+        with IpamService._lock:
+            if not ip_cidr:
+                IpamService._unassign(owner)
+                return
+            network = IpamService._network(ip_cidr)
+            previous = IpamService._prefixes.get(owner)
+            IpamService._unassign(owner)
+            try:
+                IpamService._check(owner, network)
+            except IpamConflictError:
+                if previous is not None:
+                    IpamService._assign(owner, previous)
+                raise
+            IpamService._assign(owner, network)
+
+    @staticmethod
+    def release_profile(profile_id: str):
+        IpamService._ensure_loaded()
+        with IpamService._lock:
+            IpamService._unassign(f"profile:{profile_id}")
+
+    @staticmethod
+    def reserve_vlans(parent_interface: str, entries: List[Tuple[int, str]]):
+        """
+        Reserves VLAN IDs on a parent interface together with their prefixes.
+        All-or-nothing: a single conflict leaves the index untouched.
+        """
+        IpamService._ensure_loaded()
+        with IpamService._lock:
+            reserved = []
+            try:
+                for vlan_id, ip_cidr in entries:
+                    owner = f"vlan:{parent_interface}.{vlan_id}"
+                    if (parent_interface, vlan_id) in IpamService._vlans:
+                        raise IpamConflictError(f"VLAN {vlan_id} already exists on {parent_interface}")
+                    network = IpamService._network(ip_cidr)
+                    IpamService._check(owner, network)
+                    IpamService._assign(owner, network)
+                    IpamService._vlans[(parent_interface, vlan_id)] = owner
+                    reserved.append(vlan_id)
+            except ValueError:
+                for vlan_id in reserved:
+                    IpamService._release_vlan(parent_interface, vlan_id)
+                raise
+
+    @staticmethod
+    def _release_vlan(parent_interface: str, vlan_id: int):
+        owner = IpamService._vlans.pop((parent_interface, vlan_id), None)
+        if owner:
+            IpamService._unassign(owner)
+
+    @staticmethod
+    def release_vlans(parent_interface: str, vlan_ids: List[int]):
+        IpamService._ensure_loaded()
+        with IpamService._lock:
+            for vlan_id in vlan_ids:
+                IpamService._release_vlan(parent_interface, vlan_id)
+
+    @staticmethod
+    def next_free(within: str = "10.0.0.0/8", prefix_len: int = 24) -> Optional[str]:
+        """ Finds the lowest unassigned `prefix_len` block inside `within` """
+        IpamService._ensure_loaded()
+        parent = ipaddress.ip_network(within, strict=False)
+        if not parent.prefixlen <= prefix_len <= parent.max_prefixlen:
+            raise ValueError(f"Prefix length must be between {parent.prefixlen} and {parent.max_prefixlen}")
+        with IpamService._lock:
+            value = IpamService._trie(parent).next_free(parent, prefix_len)
+        if value is None:
+            return None
+        return str(ipaddress.ip_network((value, prefix_len)))
@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import random
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Fraction of HTTP requests whose latency is recorded; request counts are always exact
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+# Shared by the worker processes of one server (serve.py sets it): each worker writes its
+# values here and /metrics adds them up, whichever worker answers. Unset: this process only.
+METRICS_DIR = os.getenv("UAC_METRICS_DIR", "")
+METRICS_FLUSH_SEC = float(os.getenv("UAC_METRICS_FLUSH_SEC", "1"))
+
+# Prometheus client defaults, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        MetricsRegistry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(values))
+        return lines
+
+    def snapshot(self) -> list:
+        """ [[label values, value], ...], JSON-serializable, for the other workers to aggregate """
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    def merge(self, snapshots: List[Tuple[int, bool, list]]) -> dict:
+        """
+        Adds up the (pid, alive, snapshot) of every worker. Counts of workers
+        that exited are kept, so totals never go backwards when one is replaced.
+        """
+        values: Dict[Tuple[str, ...], float] = {}
+        for _, _, snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def _current(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self, values: Optional[dict] = None) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, values: Optional[dict] = None) -> List[str]:
+        items = (self._current() if values is None else values).items()
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+class Gauge(_Metric):
+    """
+    Across workers, a "sum" gauge adds up the live workers' values; an
+    "all" gauge reports each live worker separately under a `pid` label.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), multiprocess_mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def merge(self, snapshots: List[Tuple[int, bool, list]]) -> dict:
+        # A gauge describes the present: exited workers don't count
+        live = [s for s in snapshots if s[1]]
+        if self.multiprocess_mode != "all":
+            return super().merge(live)
+        return {tuple(key) + (str(pid),): value for pid, _, snapshot in live for key, value in snapshot}
+
+    def _samples(self, values: Optional[dict] = None) -> List[str]:
+        if values is None:
+            values = self._current()
+            labelnames = self.labelnames
+        else:
+            labelnames = self.labelnames + (("pid",) if self.multiprocess_mode == "all" else ())
+        return [f"{self.name}{_format_labels(labelnames, k)} {_format_value(v)}" for k, v in values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(k), [list(v[0]), v[1], v[2]]] for k, v in self._values.items()]
+
+    def merge(self, snapshots: List[Tuple[int, bool, list]]) -> dict:
+        values: Dict[Tuple[str, ...], list] = {}
+        for _, _, snapshot in snapshots:
+            for key, (counts, total, count) in snapshot:
+                entry = values.get(tuple(key))
+                if entry is None or len(entry[0]) != len(counts):
+                    values[tuple(key)] = [list(counts), total, count]
+                    continue
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+        return values
+
+    def _samples(self, values: Optional[dict] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = {k: [list(v[0]), v[1], v[2]] for k, v in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MetricsRegistry:
+    """
+    Registry rendered by GET /metrics. With METRICS_DIR set, every worker
+    writes its values to <pid>.json there every METRICS_FLUSH_SEC (and the
+    answering worker right before rendering), and the response adds them
+    all up, the way prometheus_client's multiprocess mode does.
+    """
+    _metrics: List[_Metric] = []
+    _thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def register(metric: _Metric):
+        MetricsRegistry._metrics.append(metric)
+
+    @staticmethod
+    def flush():
+        """ Publishes this process's values for the other workers' /metrics """
+        if not METRICS_DIR:
+            return
+        data = {metric.name: metric.snapshot() for metric in MetricsRegistry._metrics}
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _worker_snapshots() -> List[Tuple[int, bool, dict]]:
+        snapshots = []
+        for filename in os.listdir(METRICS_DIR):
+            stem, ext = os.path.splitext(filename)
+            if ext != ".json" or not stem.isdigit():
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((int(stem), _alive(int(stem)), data))
+        return snapshots
+
+    @staticmethod
+    def render() -> str:
+        lines = []
+        if not METRICS_DIR:
+            for metric in MetricsRegistry._metrics:
+                lines.extend(metric.render())
+            return "\n".join(lines) + "\n"
+
+        MetricsRegistry.flush()
+        snapshots = MetricsRegistry._worker_snapshots()
+        for metric in MetricsRegistry._metrics:
+            values = metric.merge([(pid, alive, data.get(metric.name, [])) for pid, alive, data in snapshots])
+            lines.extend(metric.render(values))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _loop():
+        while True:
+            time.sleep(METRICS_FLUSH_SEC)
+            try:
+                MetricsRegistry.flush()
+            except Exception as e:
+                print(f"Warning: could not publish worker metrics: {e}")
+
+    @staticmethod
+    def start():
+        """ Starts publishing this worker's values (no-op without METRICS_DIR) """
+        if not METRICS_DIR or MetricsRegistry._thread is not None:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        MetricsRegistry._thread = threading.Thread(target=MetricsRegistry._loop, name="uac-metrics-flush", daemon=True)
+        MetricsRegistry._thread.start()
+
+def _reset_after_fork():
+    # The flush thread doesn't survive fork(); each worker starts its own in start()
+    MetricsRegistry._thread = None
+    for metric in MetricsRegistry._metrics:
+        metric._lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+HTTP_REQUESTS = Counter("uac_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("uac_http_request_duration_seconds", "Sampled HTTP request latency", ("method", "route"))
+HTTP_IN_PROGRESS = Gauge("uac_http_requests_in_progress", "HTTP requests currently being handled")
+
+DB_QUERIES = Counter("uac_db_queries_total", "SQL statements executed", ("engine", "operation"))
+DB_QUERY_ERRORS = Counter("uac_db_query_errors_total", "SQL statements that raised", ("engine",))
+DB_QUERY_LATENCY = Histogram("uac_db_query_duration_seconds", "SQL statement execution time", ("engine", "operation"), FAST_BUCKETS)
+DB_POOL_WAIT = Histogram("uac_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",), FAST_BUCKETS)
+DB_POOL_IN_USE = Gauge("uac_db_pool_connections_in_use", "Connections currently checked out of the pool", ("engine",))
+
+STORE_LATENCY = Histogram("uac_store_operation_duration_seconds", "File and config store I/O and parse time", ("store", "operation"), FAST_BUCKETS)
+IDS_LOG_LINES = Counter("uac_ids_log_lines_total", "IDS log lines parsed", ("engine",))
+
+STARTUP_SECONDS = Gauge("uac_startup_seconds", "Time this worker spent starting up, by phase", ("phase",), multiprocess_mode="all")
+
+def store_timer(store: str, operation: str):
+    """ Context manager timing one read/parse/write of a config store or host file """
+    return STORE_LATENCY.time(store=store, operation=operation)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task overhead). Every
+    request is counted; latency is recorded for a `sample_rate` fraction.
+    Routes are labelled by their path template to keep cardinality bounded.
+    """
+
+    def __init__(self, app, sample_rate: float = METRICS_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._routes: Dict[int, str] = {}
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        label = self._routes.get(id(endpoint))
+        if label is None:
+            label = "unmatched"
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    label = candidate.path
+                    break
+            self._routes[id(endpoint)] = label
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = self._route_label(scope)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status)
+            if sampled:
+                HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route)
+
+def instrument_engine(engine, name: str):
+    """
+    Hooks SQLAlchemy engine events for statement counts and timings, and
+    times pool checkout. Accepts a sync Engine or an AsyncEngine.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("uac_query_start", []).append(time.perf_counter())
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("uac_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERIES.inc(engine=name, operation=operation)
+        DB_QUERY_LATENCY.observe(elapsed, engine=name, operation=operation)
+
+    def handle_error(context):
+        DB_QUERY_ERRORS.inc(engine=name)
+        conn = context.connection
+        if conn is not None and conn.info.get("uac_query_start"):
+            conn.info["uac_query_start"].pop()
+
+    event.listen(sync_engine, "before_cursor_execute", before_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+    pool = sync_engine.pool
+    event.listen(pool, "checkout", lambda *_: DB_POOL_IN_USE.inc(engine=name))
+    event.listen(pool, "checkin", lambda *_: DB_POOL_IN_USE.dec(engine=name))
+
+    # No pool event fires before the wait starts, so time the acquisition itself.
+    # Wrapped on the engine, not the pool: dispose() replaces the pool object.
+    raw_connection = sync_engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start, engine=name)
+
+    sync_engine.raw_connection = timed_raw_connection
@@ -1,14 +1,113 @@
 import yaml
 import os
-from typing import List, Dict, Any
-from models.network import VlanCreate, InterfaceConfig
+import ipaddress
+import tempfile
+import threading
+from typing import List, Dict, Any, Tuple
+from models.network import VlanCreate, VlanBulkCreate, InterfaceConfig
 from services.hardware import HardwareService
+from services.metrics import store_timer
+from services.response_cache import ResponseCache
 
 # Simulated Host Paths
 HOST_FS_ROOT = os.getenv("HOST_FS_ROOT", "/host-fs") # Mounted in Docker
 NETPLAN_DIR = os.path.join(HOST_FS_ROOT, "etc/netplan")
 CHILLI_DIR = os.path.join(HOST_FS_ROOT, "etc/chilli/config.d")
 
+# LibYAML bindings are an order of magnitude faster than the pure-Python parser/emitter
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def _write_files_atomically(files: Dict[str, str]):
+    """
+    Writes every file to a temp sibling first and only renames them into place
+    once all writes succeeded, so a failed batch leaves no partial config behind.
+    """
+    with store_timer("netplan", "write"):
+        staged = []
+        try:
+            for path, content in files.items():
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".uac-", suffix=".tmp")
+                staged.append((tmp_path, path))
+                with os.fdopen(fd, 'w') as f:
+                    f.write(content)
+                os.chmod(tmp_path, 0o644)
+        except Exception:
+            for tmp_path, _ in staged:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+
+class NetplanIndex:
+    """
+    Cache of the interface model parsed out of each Netplan file.
+    Entries are keyed by (mtime, size, inode) so only files that changed
+    since the last listing are parsed again.
+    """
+    _lock = threading.Lock()
+    _entries: Dict[str, Tuple[Tuple[int, int, int], List[Dict[str, Any]]]] = {}
+
+    @staticmethod
+    def _parse(path: str) -> List[Dict[str, Any]]:
+        with store_timer("netplan", "read"):
+            with open(path, 'r') as f:
+                text = f.read()
+        with store_timer("netplan", "parse"):
+            config = yaml.load(text, Loader=YamlLoader) or {}
+
+        network = config.get('network') or {}
+        interfaces = []
+        for vlan_name, vlan_data in (network.get('vlans') or {}).items():
+            interfaces.append({
+                "name": vlan_name,
+                "type": "vlan",
+                "status": "configured",
+                "ip": (vlan_data.get('addresses') or [''])[0],
+                "vlan_id": vlan_data.get('id'),
+                "parent": vlan_data.get('link')
+            })
+        for iface_name, iface_data in (network.get('ethernets') or {}).items():
+            interfaces.append({
+                "name": iface_name,
+                "type": "ethernet",
+                "status": "configured",
+                "ip": (iface_data.get('addresses') or [''])[0]
+            })
+        return interfaces
+
+    @staticmethod
+    def interfaces() -> List[Dict[str, Any]]:
+        with NetplanIndex._lock:
+            seen = set()
+            result = []
+            with os.scandir(NETPLAN_DIR) as it:
+                entries = sorted((e for e in it if e.name.endswith(".yaml") and e.is_file()), key=lambda e: e.name)
+
+            for entry in entries:
+                seen.add(entry.path)
+                try:
+                    st = entry.stat()
+                    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+                    cached = NetplanIndex._entries.get(entry.path)
+                    if cached is None or cached[0] != key:
+                        cached = (key, NetplanIndex._parse(entry.path))
+                        NetplanIndex._entries[entry.path] = cached
+                    result.extend(cached[1])
+                except Exception as e:
+                    print(f"Error reading {entry.name}: {e}")
+
+            for path in list(NetplanIndex._entries):
+                if path not in seen:
+                    del NetplanIndex._entries[path]
+
+        # Callers get copies so they can't corrupt the cache
+        return [dict(i) for i in result]
+
 class NetplanService:
     @staticmethod
     def _ensure_dirs():
@@ -18,35 +117,26 @@ class NetplanService:
     @staticmethod
     def list_interfaces() -> List[Dict[str, Any]]:
         """
-        In a real scenario, we'd use 'netifaces' or parse 'ip addr'.
-        For now, we return a mock list + any generated config files.
+        Physical ports come from hardware discovery, logical interfaces
+        from the (cached) generated Netplan files.
         """
-        # Mock Physical Interfaces
-        interfaces = [
-            {"name": "eth0", "type": "physical", "status": "up", "ip": "192.168.1.100/24"},
-            {"name": "eth1", "type": "physical", "status": "up", "ip": "10.0.0.1/24"}
-        ]
-        
-        # Scan generated Netplan files for VLANs
         NetplanService._ensure_dirs()
-        for filename in os.listdir(NETPLAN_DIR):
-            if filename.endswith(".yaml"):
-                try:
-                    with open(os.path.join(NETPLAN_DIR, filename), 'r') as f:
-                        config = yaml.safe_load(f)
-                        if 'network' in config and 'vlans' in config['network']:
-                            for vlan_name, vlan_data in config['network']['vlans'].items():
-                                interfaces.append({
-                                    "name": vlan_name,
-                                    "type": "vlan",
-                                    "status": "configured", 
-                                    "ip": vlan_data.get('addresses', [''])[0],
-                                    "vlan_id": vlan_data.get('id'),
-                                    "parent": vlan_data.get('link')
-                                })
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
+        parsed = NetplanIndex.interfaces()
+
+        # Static addresses configured on physical ports via modify_interface/profiles
+        port_ips = {i["name"]: i["ip"] for i in parsed if i["type"] == "ethernet" and i["ip"]}
+
+        interfaces = []
+        for port in HardwareService.get_physical_ports():
+            interfaces.append({
+                "name": port["name"],
+                "type": "physical",
+                "status": port.get("operstate", "unknown"),
+                "ip": port_ips.get(port["name"], ""),
+                "mac_address": port.get("mac_address")
+            })
 
+        interfaces.extend(i for i in parsed if i["type"] == "vlan")
         return interfaces
 
     @staticmethod
@@ -71,7 +161,7 @@ class NetplanService:
             }
         }
 
-        with open(filepath, 'w') as f:
+        with store_timer("netplan", "write"), open(filepath, 'w') as f:
             yaml.dump(netplan_config, f, default_flow_style=False)
 
         # 2. Generate Chilli Mock Config (Placeholder)
@@ -83,12 +173,123 @@ class NetplanService:
                 f.write(f"hs_lanif={vlan_interface_name}\n")
                 f.write(f"hs_network={vlan.ip_cidr}\n") # Simplified
 
+        ResponseCache.invalidate("network")
         return {
             "status": "created", 
             "interface": vlan_interface_name,
             "netplan_file": filepath
         }
 
+    @staticmethod
+    def expand_bulk_vlans(request: VlanBulkCreate) -> List[Tuple[int, str]]:
+        """
+        Expands a bulk request into (vlan_id, ip_cidr) pairs and validates
+        all of them in a single pass. Raises ValueError listing every problem.
+        """
+        if request.vlan_ids is not None and (request.vlan_start is not None or request.vlan_end is not None):
+            raise ValueError("Provide either vlan_ids or vlan_start/vlan_end, not both")
+
+        if request.vlan_ids is not None:
+            vlan_ids = request.vlan_ids
+        elif request.vlan_start is not None and request.vlan_end is not None:
+            if request.vlan_start > request.vlan_end:
+                raise ValueError("vlan_start must be lower than or equal to vlan_end")
+            vlan_ids = list(range(request.vlan_start, request.vlan_end + 1))
+        else:
+            raise ValueError("Either vlan_ids or vlan_start/vlan_end is required")
+
+        if not vlan_ids:
+            raise ValueError("No VLAN IDs requested")
+
+        errors = []
+        seen = set()
+        entries = []
+        networks = []
+        for vlan_id in vlan_ids:
+            if not 1 <= vlan_id <= 4094:
+                errors.append(f"VLAN {vlan_id}: ID must be between 1 and 4094")
+                continue
+            if vlan_id in seen:
+                errors.append(f"VLAN {vlan_id}: duplicate ID")
+                continue
+            seen.add(vlan_id)
+
+            try:
+                ip_cidr = request.ip_cidr_template.format(vlan=vlan_id, vlan_hi=vlan_id // 256, vlan_lo=vlan_id % 256)
+                iface = ipaddress.ip_interface(ip_cidr)
+            except (KeyError, IndexError, ValueError) as e:
+                errors.append(f"VLAN {vlan_id}: invalid CIDR from template ({e})")
+                continue
+
+            entries.append((vlan_id, ip_cidr))
+            networks.append((iface.version, int(iface.network.network_address), int(iface.network.broadcast_address), vlan_id))
+
+        # Sorted sweep: any network starting before the previous one ended overlaps it
+        networks.sort()
+        prev = None
+        for net in networks:
+            if prev and net[0] == prev[0] and net[1] <= prev[2]:
+                errors.append(f"VLAN {net[3]}: subnet overlaps VLAN {prev[3]}")
+            if not prev or net[0] != prev[0] or net[2] > prev[2]:
+                prev = net
+
+        if errors:
+            more = f" (+{len(errors) - 20} more)" if len(errors) > 20 else ""
+            raise ValueError("; ".join(errors[:20]) + more)
+
+        return entries
+
+    @staticmethod
+    def create_vlans_bulk(request: VlanBulkCreate, entries: List[Tuple[int, str]] = None):
+        """
+        Provisions many VLANs at once: one consolidated Netplan document
+        for the whole batch plus the per-VLAN CoovaChilli configs.
+        Pass `entries` when the request was already expanded by the caller.
+        """
+        if entries is None:
+            entries = NetplanService.expand_bulk_vlans(request)
+        NetplanService._ensure_dirs()
+
+        parent = request.parent_interface
+        first_id, last_id = min(v for v, _ in entries), max(v for v, _ in entries)
+        filename = f"10-uac-vlans-{parent}-{first_id}-{last_id}.yaml"
+        filepath = os.path.join(NETPLAN_DIR, filename)
+
+        vlans = {}
+        files = {}
+        for vlan_id, ip_cidr in entries:
+            vlan_interface_name = f"{parent}.{vlan_id}"
+            vlans[vlan_interface_name] = {
+                "id": vlan_id,
+                "link": parent,
+                "addresses": [ip_cidr]
+            }
+            if request.dhcp_server_enabled:
+                files[os.path.join(CHILLI_DIR, f"vlan{vlan_id}.conf")] = (
+                    f"# CoovaChilli Config for {vlan_interface_name}\n"
+                    f"hs_wanif={vlan_interface_name}\n"
+                    f"hs_lanif={vlan_interface_name}\n"
+                    f"hs_network={ip_cidr}\n"
+                )
+
+        netplan_config = {
+            "network": {
+                "version": 2,
+                "vlans": vlans
+            }
+        }
+        files[filepath] = yaml.dump(netplan_config, Dumper=YamlDumper, default_flow_style=False)
+
+        _write_files_atomically(files)
+        ResponseCache.invalidate("network")
+
+        return {
+            "status": "created",
+            "count": len(entries),
+            "interfaces": list(vlans.keys()),
+            "netplan_file": filepath
+        }
+
     @staticmethod
     def modify_interface(config: InterfaceConfig):
         NetplanService._ensure_dirs()
@@ -116,9 +317,10 @@ class NetplanService:
             }
         }
 
-        with open(filepath, 'w') as f:
+        with store_timer("netplan", "write"), open(filepath, 'w') as f:
             yaml.dump(netplan_config, f, default_flow_style=False)
 
+        ResponseCache.invalidate("network")
         return {
             "status": "modified",
             "interface": config.name,
@@ -156,7 +358,8 @@ class NetplanService:
             if profile_id and profile_id in profiles:
                 prof = profiles[profile_id]
                 NetplanService._apply_profile_to_port(prof, port["name"])
-                
+        ResponseCache.invalidate("network")
+
     @staticmethod
     def _apply_profile_to_port(profile: dict, port_name: str):
         vlan_id = profile.get("vlan_id")
@@ -193,7 +396,7 @@ class NetplanService:
                 }
             }
             
-        with open(filepath, 'w') as f:
+        with store_timer("netplan", "write"), open(filepath, 'w') as f:
             yaml.dump(netplan_config, f, default_flow_style=False)
             
         # Write CoovaChilli Config
@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+import asyncio
+import ipaddress
+from collections import OrderedDict
+from typing import Optional
+from services.radius_client import ACCESS_CHALLENGE, RadiusClientPool
+
+# Token buckets per client address and per username: sustained attempts per second and burst size
+LOGIN_RATE_PER_SEC = float(os.getenv("PORTAL_LOGIN_RATE", "0.5"))
+LOGIN_BURST = float(os.getenv("PORTAL_LOGIN_BURST", "5"))
+# Rejected credentials are answered locally for this long
+NEGATIVE_CACHE_TTL_SEC = float(os.getenv("PORTAL_NEGATIVE_CACHE_TTL", "30"))
+MAX_TRACKED_CLIENTS = 100_000
+# Reverse proxies (addresses or CIDRs, comma-separated) whose X-Forwarded-For is believed
+PORTAL_TRUSTED_PROXIES = [
+    ipaddress.ip_network(p.strip(), strict=False) for p in os.getenv("PORTAL_TRUSTED_PROXIES", "").split(",") if p.strip()
+]
+
+class LoginThrottledError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too many login attempts")
+        self.retry_after = retry_after
+
+class TokenBucketLimiter:
+    """ One token bucket per key, LRU-bounded so an address or username flood can't exhaust memory """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """ Takes a token; returns 0 on success or the seconds to wait for the next one """
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+class NegativeCache:
+    """ Short-lived set of credential digests the RADIUS server rejected """
+
+    def __init__(self, ttl: float, max_keys: int = MAX_TRACKED_CLIENTS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+
+    @staticmethod
+    def key(username: str, password: str) -> bytes:
+        # Only a digest is kept so plaintext passwords never sit in memory
+        return hashlib.sha256(f"{username}\0{password}".encode()).digest()
+
+    def contains(self, key: bytes, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        expires = self._entries.get(key)
+        if expires is None:
+            return False
+        if expires < now:
+            del self._entries[key]
+            return False
+        return True
+
+    def add(self, key: bytes, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._entries[key] = now + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: bytes):
+        self._entries.pop(key, None)
+
+class PortalAuthService:
+    """
+    Captive-portal login: throttles per client address and per username
+    (never on anything the client merely claims, like its MAC), answers
+    known-bad credentials from the negative cache and sends the rest to
+    FreeRADIUS through the shared pooled client of this worker. Everything
+    here runs on the event loop, so the limiter and cache need no locking.
+    """
+    _pool: Optional[RadiusClientPool] = None
+    _pool_loop = None
+    limiter = TokenBucketLimiter(LOGIN_RATE_PER_SEC, LOGIN_BURST)
+    negative_cache = NegativeCache(NEGATIVE_CACHE_TTL_SEC)
+
+    @staticmethod
+    def get_pool() -> RadiusClientPool:
+        loop = asyncio.get_running_loop()
+        if PortalAuthService._pool is None or PortalAuthService._pool_loop is not loop:
+            PortalAuthService._pool = RadiusClientPool()
+            PortalAuthService._pool_loop = loop
+        return PortalAuthService._pool
+
+    @staticmethod
+    def close():
+        if PortalAuthService._pool is not None:
+            PortalAuthService._pool.close()
+            PortalAuthService._pool = None
+            PortalAuthService._pool_loop = None
+
+    @staticmethod
+    def client_address(peer: Optional[str], forwarded_for: Optional[str] = None) -> Optional[str]:
+        """
+        The address the request came from: the TCP peer, or when that is a
+        trusted proxy, the nearest X-Forwarded-For hop that isn't one.
+        """
+        hops = [h.strip() for h in (forwarded_for or "").split(",") if h.strip()]
+        address = peer
+        while address is not None and hops and _is_trusted_proxy(address):
+            address = hops.pop()
+        return address
+
+    @staticmethod
+    async def login(username: str, password: str, mac: Optional[str] = None, ip: Optional[str] = None,
+                    client_address: Optional[str] = None) -> dict:
+        """
+        Returns {"accepted": bool, ...}; raises LoginThrottledError or RadiusError.
+        `mac` and `ip` are passed on to RADIUS; throttling uses `client_address`
+        (from PortalAuthService.client_address) and the username.
+        """
+        keys = [f"user:{username.lower()}"]
+        if client_address:
+            keys.insert(0, f"addr:{client_address}")
+        for key in keys:
+            retry_after = PortalAuthService.limiter.acquire(key)
+            if retry_after:
+                raise LoginThrottledError(retry_after)
+
+        cache_key = NegativeCache.key(username, password)
+        if PortalAuthService.negative_cache.contains(cache_key):
+            return {"accepted": False, "cached": True, "message": "Invalid credentials"}
+
+        result = await PortalAuthService.get_pool().authenticate(username, password, calling_station_id=mac, framed_ip=ip)
+        if result.code == ACCESS_CHALLENGE:
+            # Not a rejection (the server wants another round, e.g. an OTP): the password may well be right
+            return {"accepted": False, "cached": False, "challenge": True,
+                    "message": result.reply_message or "Additional authentication required"}
+        if not result.accepted:
+            PortalAuthService.negative_cache.add(cache_key)
+            return {"accepted": False, "cached": False, "message": result.reply_message or "Invalid credentials"}
+
+        PortalAuthService.negative_cache.discard(cache_key)
+        return {
+            "accepted": True,
+            "session_timeout": result.session_timeout,
+            "message": result.reply_message
+        }
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        parsed = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(parsed in network for network in PORTAL_TRUSTED_PROXIES)
@@ -1,26 +1,88 @@
 import os
+import gzip
 import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
 from models.portal import PortalSettings # type: ignore
+from services.config_store import Collection, ConfigStore
 
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+# Legacy JSON store, imported into the config store on first use
 CONFIG_STORE = "/opt/uac-controller/portal_settings.json"
+# How often a worker checks whether another worker saved new settings
+PORTAL_CACHE_CHECK_SEC = float(os.getenv("PORTAL_CACHE_CHECK_SEC", "1"))
+
+portal_collection = Collection("portal_settings", model=PortalSettings, legacy_file=CONFIG_STORE, legacy_key=lambda _: "settings")
+
+class PortalPayload:
+    """ Pre-serialized public settings in every encoding we serve """
+    __slots__ = ("version", "settings", "etag", "bodies")
+
+    def __init__(self, version: int, settings: dict):
+        self.version = version
+        self.settings = settings
+        body = json.dumps(settings, separators=(",", ":")).encode()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong validators must differ per content-coding
+        self.bodies: Dict[str, tuple] = {"identity": (body, f'"{digest}"')}
+        self.bodies["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.bodies["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self.etag = self.bodies["identity"][1]
+
+    def etags(self):
+        return [etag for _, etag in self.bodies.values()]
 
 class PortalSettingsService:
+    _lock = threading.Lock()
+    _payload: Optional[PortalPayload] = None
+    _checked_at = 0.0
+
     @staticmethod
     def get_settings() -> dict:
-        if not os.path.exists(CONFIG_STORE):
+        settings = portal_collection.get("settings")
+        if settings is None:
             # Return defaults matching the Pydantic model
             return PortalSettings().model_dump()
-        
-        try:
-            with open(CONFIG_STORE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return PortalSettings().model_dump()
+        return settings
 
     @staticmethod
     def save_settings(settings: PortalSettings) -> dict:
-        os.makedirs(os.path.dirname(CONFIG_STORE), exist_ok=True)
         data = settings.model_dump()
-        with open(CONFIG_STORE, "w") as f:
-            json.dump(data, f, indent=4)
+        portal_collection.put("settings", data)
+        PortalSettingsService.invalidate()
         return data
+
+    @staticmethod
+    def invalidate():
+        with PortalSettingsService._lock:
+            PortalSettingsService._payload = None
+
+    @staticmethod
+    def get_public_payload() -> PortalPayload:
+        """
+        Serves the splash-page settings from memory. The store version is
+        polled at most every PORTAL_CACHE_CHECK_SEC, and the settings are only
+        re-read and re-compressed when that version changed.
+        """
+        payload = PortalSettingsService._payload
+        now = time.monotonic()
+        if payload is not None and now - PortalSettingsService._checked_at < PORTAL_CACHE_CHECK_SEC:
+            return payload
+
+        with PortalSettingsService._lock:
+            payload = PortalSettingsService._payload
+            if payload is not None and now - PortalSettingsService._checked_at < PORTAL_CACHE_CHECK_SEC:
+                return payload
+            version = ConfigStore.collection_version(portal_collection.name)
+            if payload is None or payload.version != version:
+                payload = PortalPayload(version, PortalSettingsService.get_settings())
+                PortalSettingsService._payload = payload
+            PortalSettingsService._checked_at = now
+            return payload
@@ -0,0 +1,552 @@
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from database import SessionLocal
+from models.db import RadAcct # type: ignore
+from services.response_cache import ResponseCache
+
+RADACCT_ARCHIVE_DIR = os.getenv("RADACCT_ARCHIVE_DIR", "/opt/uac-controller/radacct-archive")
+# Closed sessions that stopped more than this many days ago move out of MySQL
+RADACCT_RETENTION_DAYS = int(os.getenv("RADACCT_RETENTION_DAYS", "30"))
+# Seconds between archival runs (0 disables the schedule; POST /analytics/archive still works)
+RADACCT_ARCHIVE_INTERVAL_SEC = float(os.getenv("RADACCT_ARCHIVE_INTERVAL_SEC", "3600"))
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("RADACCT_ARCHIVE_SEGMENT_ROWS", "100000"))
+# Memory for decoded columns kept across queries
+ARCHIVE_COLUMN_CACHE_MB = float(os.getenv("RADACCT_ARCHIVE_COLUMN_CACHE_MB", "64"))
+DELETE_BATCH = 1000
+# Bloom filter over each string column: ~1% false positives at 10 bits per distinct value
+BLOOM_BITS_PER_VALUE = 10
+BLOOM_HASHES = 7
+
+MAGIC = b"UACSEG1\n"
+CATALOG_FILE = "CATALOG.json"
+LOCK_FILE = ".archive.lock"
+NULL_INT = -(1 << 63)
+_EPOCH = datetime(1970, 1, 1)
+
+# Archived radacct columns. i: int64, t: timestamp (int64 epoch seconds), s: dictionary-encoded string
+COLUMNS = OrderedDict([
+    ("radacctid", "i"), ("acctsessionid", "s"), ("username", "s"),
+    ("acctstarttime", "t"), ("acctupdatetime", "t"), ("acctstoptime", "t"),
+    ("acctsessiontime", "i"), ("acctinputoctets", "i"), ("acctoutputoctets", "i"),
+    ("callingstationid", "s"), ("framedipaddress", "s"),
+])
+
+def to_epoch(value: Optional[datetime]) -> Optional[int]:
+    """ radacct timestamps are naive; they are stored and compared as-is """
+    return None if value is None else int((value - _EPOCH).total_seconds())
+
+def from_epoch(value: int) -> Optional[datetime]:
+    return None if value == NULL_INT else _EPOCH + timedelta(seconds=value)
+
+def _encode_ints(values: List[Optional[int]]) -> Tuple[List[bytes], dict]:
+    present = [v for v in values if v is not None]
+    meta = {
+        "nulls": len(values) - len(present),
+        "min": min(present) if present else None,
+        "max": max(present) if present else None,
+        "sum": sum(present),
+    }
+    data = array("q", (NULL_INT if v is None else v for v in values))
+    # Sorted columns (ids, stop times within a day) shrink to small deltas
+    if not meta["nulls"] and all(a <= b for a, b in zip(data, data[1:])):
+        data = array("q", [data[0]] + [b - a for a, b in zip(data, data[1:])]) if data else data
+        meta["delta"] = True
+    return [zlib.compress(data.tobytes(), 6)], meta
+
+def _bloom_positions(value: str, bits: int) -> List[int]:
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    h1, h2 = struct.unpack("<II", digest)
+    return [(h1 + i * h2) % bits for i in range(BLOOM_HASHES)]
+
+def _bloom(values: List[str]) -> bytes:
+    bits = max(64, len(values) * BLOOM_BITS_PER_VALUE)
+    bloom = bytearray((bits + 7) // 8)
+    for value in values:
+        for p in _bloom_positions(value, len(bloom) * 8):
+            bloom[p >> 3] |= 1 << (p & 7)
+    return bytes(bloom)
+
+def _encode_strings(values: List[Optional[str]]) -> Tuple[List[bytes], dict]:
+    dictionary = sorted({v for v in values if v is not None})
+    codes = {v: i for i, v in enumerate(dictionary)}
+    data = array("i", (-1 if v is None else codes[v] for v in values))
+    meta = {
+        "nulls": data.count(-1),
+        "min": dictionary[0] if dictionary else None,
+        "max": dictionary[-1] if dictionary else None,
+        "distinct": len(dictionary),
+    }
+    # Blobs: dictionary, codes, bloom filter (stored raw: random bits don't compress)
+    return [zlib.compress(json.dumps(dictionary).encode(), 6), zlib.compress(data.tobytes(), 6), _bloom(dictionary)], meta
+
+def write_segment(path: str, rows: List[dict]) -> dict:
+    """
+    Writes rows (dicts keyed by COLUMNS) as one segment file and returns its
+    header. Layout: MAGIC, uint32 header length, JSON header (row count,
+    per-column zone map and blob offsets), then the zlib-compressed blobs.
+    """
+    columns, blobs, offset = {}, [], 0
+    for name, kind in COLUMNS.items():
+        values = [row[name] for row in rows]
+        if kind == "t":
+            values = [to_epoch(v) for v in values]
+        parts, meta = _encode_strings(values) if kind == "s" else _encode_ints(values)
+        meta["kind"] = kind
+        meta["blobs"] = []
+        for blob in parts:
+            meta["blobs"].append([offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        columns[name] = meta
+
+    header = {"version": 1, "rows": len(rows), "byteorder": sys.byteorder, "columns": columns}
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(encoded)))
+        f.write(encoded)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    return header
+
+class _ColumnCache:
+    """ LRU of decoded columns shared by all segments, keyed by (path, column), bounded in bytes """
+    _lock = threading.Lock()
+    _entries: "OrderedDict[Tuple[str, str], Tuple[object, int]]" = OrderedDict()
+    _bytes = 0
+
+    @staticmethod
+    def get(key):
+        with _ColumnCache._lock:
+            entry = _ColumnCache._entries.get(key)
+            if entry is None:
+                return None
+            _ColumnCache._entries.move_to_end(key)
+            return entry[0]
+
+    @staticmethod
+    def put(key, value, size: int):
+        with _ColumnCache._lock:
+            previous = _ColumnCache._entries.pop(key, None)
+            if previous is not None:
+                _ColumnCache._bytes -= previous[1]
+            _ColumnCache._entries[key] = (value, size)
+            _ColumnCache._bytes += size
+            while _ColumnCache._bytes > ARCHIVE_COLUMN_CACHE_MB * 1024 * 1024 and len(_ColumnCache._entries) > 1:
+                _, (_, evicted) = _ColumnCache._entries.popitem(last=False)
+                _ColumnCache._bytes -= evicted
+
+class Segment:
+    """
+    Read-only view of one segment file. The file is memory-mapped; only
+    the header is parsed up front, and a column is decompressed the first
+    time a query needs it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a radacct segment")
+        (length,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._map[start:start + length])
+        self._data = start + length
+        self.rows = self.header["rows"]
+        self.columns = self.header["columns"]
+        self.size = len(self._map)
+
+    def _blob(self, span) -> bytes:
+        offset, length = span
+        start = self._data + offset
+        with memoryview(self._map) as view, view[start:start + length] as chunk:
+            return zlib.decompress(chunk)
+
+    def column(self, name: str):
+        """ array of int64 for i/t columns; (dictionary, codes) for strings """
+        key = (self.path, name)
+        cached = _ColumnCache.get(key)
+        if cached is not None:
+            return cached
+        meta = self.columns[name]
+        if meta["kind"] == "s":
+            dictionary = json.loads(self._blob(meta["blobs"][0]))
+            codes = array("i")
+            codes.frombytes(self._blob(meta["blobs"][1]))
+            if self.header["byteorder"] != sys.byteorder:
+                codes.byteswap()
+            value = (dictionary, codes)
+            # Rough: the code array plus ~64 bytes per dictionary string object
+            size = len(codes) * codes.itemsize + 64 * len(dictionary)
+        else:
+            value = array("q")
+            value.frombytes(self._blob(meta["blobs"][0]))
+            if self.header["byteorder"] != sys.byteorder:
+                value.byteswap()
+            if meta.get("delta"):
+                value = array("q", accumulate(value))
+            size = len(value) * value.itemsize
+        _ColumnCache.put(key, value, size)
+        return value
+
+    def zone(self, name: str) -> Tuple[object, object]:
+        meta = self.columns[name]
+        return meta["min"], meta["max"]
+
+    def may_contain(self, name: str, value) -> bool:
+        """ Zone map, then for strings the bloom filter: False means no row has `value` """
+        low, high = self.zone(name)
+        if low is None or not low <= value <= high:
+            return False
+        blobs = self.columns[name]["blobs"]
+        if len(blobs) < 3:
+            return True
+        offset, length = blobs[2]
+        start = self._data + offset
+        for p in _bloom_positions(value, length * 8):
+            if not self._map[start + (p >> 3)] & (1 << (p & 7)):
+                return False
+        return True
+
+    def code_of(self, name: str, value: str) -> Optional[int]:
+        """ Dictionary code of `value`, or None if no row in the segment has it """
+        dictionary = self.column(name)[0]
+        i = bisect_left(dictionary, value)
+        return i if i < len(dictionary) and dictionary[i] == value else None
+
+    def row(self, i: int) -> dict:
+        row = {}
+        for name, kind in COLUMNS.items():
+            data = self.column(name)
+            if kind == "s":
+                dictionary, codes = data
+                row[name] = None if codes[i] < 0 else dictionary[codes[i]]
+            elif kind == "t":
+                row[name] = from_epoch(data[i])
+            else:
+                row[name] = None if data[i] == NULL_INT else data[i]
+        return row
+
+class RadAcctArchive:
+    """
+    Catalog of the segment files under RADACCT_ARCHIVE_DIR, laid out as
+    day=YYYY-MM-DD/<first id>-<last id>.seg by session stop day. The zone
+    maps in each header (min/max per column) let queries skip segments
+    without touching their data; string filters then check the segment's
+    dictionary before any row is decoded.
+    """
+    _lock = threading.Lock()
+    _segments: Dict[str, Segment] = {}
+    _version = None
+
+    @staticmethod
+    def segments() -> List[Segment]:
+        try:
+            st = os.stat(os.path.join(RADACCT_ARCHIVE_DIR, CATALOG_FILE))
+            version = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            return []
+        with RadAcctArchive._lock:
+            if version != RadAcctArchive._version:
+                RadAcctArchive._scan()
+                RadAcctArchive._version = version
+            return list(RadAcctArchive._segments.values())
+
+    @staticmethod
+    def _scan():
+        found = {}
+        for path in sorted(glob.glob(os.path.join(RADACCT_ARCHIVE_DIR, "day=*", "*.seg"))):
+            segment = RadAcctArchive._segments.get(path)
+            if segment is None:
+                try:
+                    segment = Segment(path)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: skipping unreadable radacct segment {path}: {e}")
+                    continue
+            found[path] = segment
+        RadAcctArchive._segments = found
+
+    @staticmethod
+    def totals() -> dict:
+        """ From the headers alone: no column is decoded """
+        segments = RadAcctArchive.segments()
+        return {
+            "segments": len(segments),
+            "sessions": sum(s.rows for s in segments),
+            "input_octets": sum(s.columns["acctinputoctets"]["sum"] for s in segments),
+            "output_octets": sum(s.columns["acctoutputoctets"]["sum"] for s in segments),
+            "bytes_on_disk": sum(s.size for s in segments),
+            "oldest_stop": from_epoch(min((s.zone("acctstoptime")[0] for s in segments), default=NULL_INT)),
+            "newest_stop": from_epoch(max((s.zone("acctstoptime")[1] for s in segments), default=NULL_INT)),
+        }
+
+    @staticmethod
+    def status() -> dict:
+        """ Totals plus the outcome of the last archival run """
+        status = RadAcctArchive.totals()
+        try:
+            with open(os.path.join(RADACCT_ARCHIVE_DIR, CATALOG_FILE)) as f:
+                status["last_run"] = json.load(f)
+        except (OSError, ValueError):
+            status["last_run"] = None
+        return status
+
+    @staticmethod
+    def search(username: str = None, ip: str = None, mac: str = None,
+               since: datetime = None, until: datetime = None, limit: int = 100) -> Tuple[List[dict], dict]:
+        """
+        Archived sessions matching every given filter and overlapping
+        [since, until], newest start first. Segments are visited newest
+        first and the scan stops once no remaining segment can beat the
+        `limit`-th result. Returns (rows, pruning stats).
+        """
+        low, high = to_epoch(since), to_epoch(until)
+        filters = [(name, value) for name, value in
+                   (("username", username), ("framedipaddress", ip), ("callingstationid", mac)) if value is not None]
+
+        segments = RadAcctArchive.segments()
+        candidates = []
+        for segment in segments:
+            start_min, start_max = segment.zone("acctstarttime")
+            if high is not None and (start_min is None or start_min > high):
+                continue
+            if low is not None and segment.zone("acctstoptime")[1] < low:
+                continue
+            if all(segment.may_contain(name, value) for name, value in filters):
+                candidates.append(segment)
+        candidates.sort(key=lambda s: s.zone("acctstarttime")[1], reverse=True)
+
+        results: List[Tuple[int, dict]] = []
+        scanned = 0
+        for segment in candidates:
+            if len(results) >= limit and segment.zone("acctstarttime")[1] < results[-1][0]:
+                break
+            codes = [(name, segment.code_of(name, value)) for name, value in filters]
+            if any(code is None for _, code in codes):
+                continue
+            scanned += 1
+            starts = segment.column("acctstarttime")
+            stops = segment.column("acctstoptime")
+
+            if codes:
+                name, code = codes[0]
+                matches = [i for i, c in enumerate(segment.column(name)[1]) if c == code]
+                for name, code in codes[1:]:
+                    column = segment.column(name)[1]
+                    matches = [i for i in matches if column[i] == code]
+            else:
+                matches = range(segment.rows)
+            if high is not None:
+                matches = [i for i in matches if starts[i] != NULL_INT and starts[i] <= high]
+            if low is not None:
+                matches = [i for i in matches if stops[i] >= low]
+
+            # Only the rows that can still make the cut are materialized
+            best = sorted(matches, key=lambda i: starts[i], reverse=True)[:limit]
+            results.extend((starts[i], segment.row(i)) for i in best)
+            results.sort(key=lambda r: r[0], reverse=True)
+            del results[limit:]
+
+        stats = {"segments": len(segments), "candidates": len(candidates), "scanned": scanned}
+        return [row for _, row in results], stats
+
+    @staticmethod
+    def sessions_on(ips: List[str], since: datetime, until: datetime) -> List[Tuple]:
+        """
+        (ip, start, stop, username, mac, session_id) of the archived sessions
+        on any of `ips` overlapping [since, until], as SubscriberIndex takes
+        them. A few addresses are checked against each segment's bloom
+        filter, so segments holding none of them are never decoded; for
+        many, walking the segment's address dictionary once is cheaper.
+        """
+        low, high = to_epoch(since), to_epoch(until)
+        wanted = set(ips)
+        rows = []
+        for segment in RadAcctArchive.segments():
+            start_min = segment.zone("acctstarttime")[0]
+            if start_min is None or start_min > high or segment.zone("acctstoptime")[1] < low:
+                continue
+            if len(wanted) * BLOOM_HASHES < segment.columns["framedipaddress"]["distinct"]:
+                codes = {segment.code_of("framedipaddress", ip) for ip in wanted if segment.may_contain("framedipaddress", ip)}
+                codes.discard(None)
+            else:
+                codes = {i for i, ip in enumerate(segment.column("framedipaddress")[0]) if ip in wanted}
+            if not codes:
+                continue
+            addresses, ip_codes = segment.column("framedipaddress")
+            starts = segment.column("acctstarttime")
+            stops = segment.column("acctstoptime")
+            strings = [segment.column(name) for name in ("username", "callingstationid", "acctsessionid")]
+            for i, code in enumerate(ip_codes):
+                if code in codes and starts[i] != NULL_INT and starts[i] <= high and stops[i] >= low:
+                    rows.append((addresses[code], from_epoch(starts[i]), from_epoch(stops[i]),
+                                 *(None if c[i] < 0 else d[c[i]] for d, c in strings)))
+        return rows
+
+    @staticmethod
+    def recent(limit: int) -> List[dict]:
+        """ The `limit` most recently stopped archived sessions """
+        results: List[Tuple[int, dict]] = []
+        for segment in sorted(RadAcctArchive.segments(), key=lambda s: s.zone("acctstoptime")[1], reverse=True):
+            if len(results) >= limit and segment.zone("acctstoptime")[1] < results[-1][0]:
+                break
+            stops = segment.column("acctstoptime")
+            best = sorted(range(segment.rows), key=lambda i: stops[i], reverse=True)[:limit]
+            results.extend((stops[i], segment.row(i)) for i in best)
+            results.sort(key=lambda r: r[0], reverse=True)
+            del results[limit:]
+        return [row for _, row in results]
+
+@contextmanager
+def _archive_lock():
+    """ Non-blocking exclusive lock so only one worker archives at a time """
+    os.makedirs(RADACCT_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(RADACCT_ARCHIVE_DIR, LOCK_FILE), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _touch_catalog(stats: dict):
+    # Readers reload the segment list when this file changes
+    path = os.path.join(RADACCT_ARCHIVE_DIR, CATALOG_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(stats, f, default=str)
+    os.replace(tmp, path)
+
+class RadAcctArchiver:
+    """
+    Moves closed sessions whose stop day is older than the retention window
+    from radacct into segments, one stop day at a time. Each segment is
+    written as .pending, the rows are deleted in one transaction, and only
+    then is the file renamed into place; a crash in between is resolved on
+    the next run by checking whether the rows are still in the table.
+    """
+    _thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _recover_pending(db):
+        for pending in glob.glob(os.path.join(RADACCT_ARCHIVE_DIR, "day=*", "*.seg.pending")):
+            try:
+                ids = list(Segment(pending).column("radacctid")[:DELETE_BATCH])
+            except (OSError, ValueError):
+                os.remove(pending)
+                continue
+            still_hot = db.scalar(select(func.count()).select_from(RadAcct).where(RadAcct.radacctid.in_(ids)))
+            if still_hot:
+                os.remove(pending)
+            else:
+                os.replace(pending, pending[:-len(".pending")])
+                _touch_catalog({"status": "recovered", "segment": pending[:-len(".pending")], "finished_at": datetime.now()})
+
+    @staticmethod
+    def run(retention_days: int = RADACCT_RETENTION_DAYS, now: Optional[datetime] = None) -> dict:
+        with _archive_lock() as acquired:
+            if not acquired:
+                return {"status": "busy"}
+            started = time.perf_counter()
+            # Whole days only, so each stop day is archived once
+            today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+            cutoff = today - timedelta(days=retention_days)
+            archived = segments = 0
+            with SessionLocal() as db:
+                RadAcctArchiver._recover_pending(db)
+                while True:
+                    first = db.scalar(select(func.min(RadAcct.acctstoptime)).where(RadAcct.acctstoptime < cutoff))
+                    if first is None:
+                        break
+                    day_start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+                    day_end = min(day_start + timedelta(days=1), cutoff)
+                    while True:
+                        rows = db.execute(
+                            select(*(getattr(RadAcct, name) for name in COLUMNS))
+                            .where(RadAcct.acctstoptime >= day_start, RadAcct.acctstoptime < day_end)
+                            .order_by(RadAcct.radacctid).limit(ARCHIVE_SEGMENT_ROWS)
+                        ).all()
+                        if not rows:
+                            break
+                        RadAcctArchiver._archive_rows(db, day_start, [r._asdict() for r in rows])
+                        archived += len(rows)
+                        segments += 1
+                        # The rows just left radacct: readers must see the segment now,
+                        # not when the run ends (or never, if a later day fails)
+                        _touch_catalog({"status": "running", "archived_sessions": archived, "segments_written": segments,
+                                        "cutoff": cutoff, "updated_at": datetime.now()})
+            stats = {
+                "status": "ok",
+                "archived_sessions": archived,
+                "segments_written": segments,
+                "cutoff": cutoff,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            _touch_catalog(dict(stats, finished_at=datetime.now()))
+        if archived:
+            ResponseCache.invalidate("analytics")
+        return stats
+
+    @staticmethod
+    def _archive_rows(db, day: datetime, rows: List[dict]):
+        directory = os.path.join(RADACCT_ARCHIVE_DIR, f"day={day:%Y-%m-%d}")
+        os.makedirs(directory, exist_ok=True)
+        ids = [row["radacctid"] for row in rows]
+        path = os.path.join(directory, f"{ids[0]:020d}-{ids[-1]:020d}.seg")
+        write_segment(path + ".pending", rows)
+        try:
+            for offset in range(0, len(ids), DELETE_BATCH):
+                db.execute(delete(RadAcct).where(RadAcct.radacctid.in_(ids[offset:offset + DELETE_BATCH])))
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.remove(path + ".pending")
+            raise
+        os.replace(path + ".pending", path)
+
+    @staticmethod
+    def _loop():
+        while True:
+            time.sleep(RADACCT_ARCHIVE_INTERVAL_SEC)
+            try:
+                RadAcctArchiver.run()
+            except Exception as e:
+                print(f"Warning: radacct archival failed: {e}")
+
+    @staticmethod
+    def start():
+        """ Schedules archival runs in the background; workers that find the lock taken skip their turn """
+        if RadAcctArchiver._thread is not None or RADACCT_ARCHIVE_INTERVAL_SEC <= 0:
+            return
+        RadAcctArchiver._thread = threading.Thread(target=RadAcctArchiver._loop, name="uac-radacct-archiver", daemon=True)
+        RadAcctArchiver._thread.start()
+
+def _reset_after_fork():
+    RadAcctArchive._lock = threading.Lock()
+    _ColumnCache._lock = threading.Lock()
+    RadAcctArchiver._thread = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
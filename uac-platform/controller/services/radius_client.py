@@ -0,0 +1,252 @@
+import os
+import hmac
+import socket
+import struct
+import ipaddress
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+RADIUS_HOST = os.getenv("RADIUS_HOST", "localhost")
+RADIUS_AUTH_PORT = int(os.getenv("RADIUS_AUTH_PORT", "1812"))
+RADIUS_SECRET = os.getenv("RADIUS_SECRET", "testing123")
+RADIUS_NAS_IDENTIFIER = os.getenv("RADIUS_NAS_IDENTIFIER", "uac-controller")
+RADIUS_TIMEOUT_SEC = float(os.getenv("RADIUS_TIMEOUT_SEC", "2"))
+RADIUS_RETRIES = int(os.getenv("RADIUS_RETRIES", "2"))
+# Each socket multiplexes up to 256 outstanding requests (the RADIUS ID is one byte)
+RADIUS_SOCKETS = int(os.getenv("RADIUS_SOCKETS", "4"))
+RADIUS_MAX_INFLIGHT = int(os.getenv("RADIUS_MAX_INFLIGHT", "512"))
+# Replies to a burst arrive back-to-back; the default UDP receive buffer drops them
+RADIUS_SOCKET_BUFFER = int(os.getenv("RADIUS_SOCKET_BUFFER", str(1024 * 1024)))
+
+ACCESS_REQUEST = 1
+ACCESS_ACCEPT = 2
+ACCESS_REJECT = 3
+ACCESS_CHALLENGE = 11
+
+ATTR_USER_NAME = 1
+ATTR_USER_PASSWORD = 2
+ATTR_NAS_IP_ADDRESS = 4
+ATTR_REPLY_MESSAGE = 18
+ATTR_SESSION_TIMEOUT = 27
+ATTR_CALLING_STATION_ID = 31
+ATTR_NAS_IDENTIFIER = 32
+ATTR_FRAMED_IP_ADDRESS = 8
+ATTR_MESSAGE_AUTHENTICATOR = 80
+
+class RadiusError(Exception):
+    """ Base class for RADIUS transport failures """
+
+class RadiusTimeout(RadiusError):
+    """ The server didn't answer after all retries """
+
+def encode_attribute(attr_type: int, value: bytes) -> bytes:
+    if len(value) > 253:
+        raise ValueError(f"RADIUS attribute {attr_type} too long")
+    return struct.pack("!BB", attr_type, len(value) + 2) + value
+
+def decode_attributes(data: bytes) -> List[Tuple[int, bytes]]:
+    attrs = []
+    pos = 0
+    while pos + 2 <= len(data):
+        attr_type, length = data[pos], data[pos + 1]
+        if length < 2 or pos + length > len(data):
+            raise ValueError("Malformed RADIUS attribute")
+        attrs.append((attr_type, data[pos + 2:pos + length]))
+        pos += length
+    return attrs
+
+def hide_password(password: bytes, secret: bytes, authenticator: bytes) -> bytes:
+    """ User-Password hiding from RFC 2865 section 5.2 """
+    if len(password) > 128:
+        raise ValueError("Password too long")
+    padded = password.ljust(max(16, (len(password) + 15) // 16 * 16), b"\x00")
+    result = b""
+    last = authenticator
+    for i in range(0, len(padded), 16):
+        digest = hashlib.md5(secret + last).digest()
+        block = bytes(a ^ b for a, b in zip(padded[i:i + 16], digest))
+        result += block
+        last = block
+    return result
+
+def reveal_password(hidden: bytes, secret: bytes, authenticator: bytes) -> bytes:
+    result = b""
+    last = authenticator
+    for i in range(0, len(hidden), 16):
+        digest = hashlib.md5(secret + last).digest()
+        block = hidden[i:i + 16]
+        result += bytes(a ^ b for a, b in zip(block, digest))
+        last = block
+    return result.rstrip(b"\x00")
+
+def build_packet(code: int, identifier: int, authenticator: bytes, attributes: bytes, secret: Optional[bytes] = None) -> bytes:
+    """
+    Assembles a packet. With `secret`, a Message-Authenticator (HMAC-MD5 over
+    the packet with the field zeroed) is appended, as FreeRADIUS expects.
+    """
+    if secret is not None:
+        attributes += encode_attribute(ATTR_MESSAGE_AUTHENTICATOR, b"\x00" * 16)
+    header = struct.pack("!BBH", code, identifier, 20 + len(attributes))
+    packet = header + authenticator + attributes
+    if secret is not None:
+        mac = hmac.new(secret, packet, hashlib.md5).digest()
+        packet = packet[:-16] + mac
+    return packet
+
+def response_authenticator(packet: bytes, request_authenticator: bytes, secret: bytes) -> bytes:
+    return hashlib.md5(packet[:4] + request_authenticator + packet[20:] + secret).digest()
+
+def _ipv4_packed(address: Optional[str]) -> Optional[bytes]:
+    try:
+        ip = ipaddress.ip_address(address) if address else None
+    except ValueError:
+        return None
+    return ip.packed if ip and ip.version == 4 else None
+
+class AuthResult:
+    __slots__ = ("accepted", "code", "attributes")
+
+    def __init__(self, code: int, attributes: List[Tuple[int, bytes]]):
+        self.code = code
+        self.accepted = code == ACCESS_ACCEPT
+        self.attributes = attributes
+
+    def first(self, attr_type: int) -> Optional[bytes]:
+        for t, value in self.attributes:
+            if t == attr_type:
+                return value
+        return None
+
+    @property
+    def session_timeout(self) -> Optional[int]:
+        value = self.first(ATTR_SESSION_TIMEOUT)
+        return struct.unpack("!I", value)[0] if value and len(value) == 4 else None
+
+    @property
+    def reply_message(self) -> Optional[str]:
+        value = self.first(ATTR_REPLY_MESSAGE)
+        return value.decode(errors="replace") if value else None
+
+class _RadiusSocket(asyncio.DatagramProtocol):
+    """ One UDP socket with up to 256 requests in flight, matched by packet ID """
+
+    def __init__(self, secret: bytes):
+        self.secret = secret
+        self.transport = None
+        self.pending: Dict[int, Tuple[asyncio.Future, bytes]] = {}
+        self.free_ids = list(range(256))
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RADIUS_SOCKET_BUFFER)
+            except OSError:
+                pass
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 20:
+            return
+        entry = self.pending.get(data[1])
+        if entry is None:
+            return  # Late reply for a request that already timed out
+        future, request_auth = entry
+        if data[4:20] != response_authenticator(data, request_auth, self.secret):
+            return  # Spoofed or corrupted: keep waiting for the genuine reply
+        if not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(RadiusError(str(exc)))
+
+    def connection_lost(self, exc):
+        for future, _ in self.pending.values():
+            if not future.done():
+                future.set_exception(RadiusError("RADIUS socket closed"))
+
+class RadiusClientPool:
+    """
+    Asyncio RADIUS authentication client shared by all requests of a worker.
+    A few UDP sockets are opened once and requests are multiplexed over them
+    by RADIUS identifier; a semaphore bounds the total number in flight.
+    """
+
+    def __init__(self, host: str = RADIUS_HOST, port: int = RADIUS_AUTH_PORT, secret: str = RADIUS_SECRET,
+                 sockets: int = RADIUS_SOCKETS, max_inflight: int = RADIUS_MAX_INFLIGHT,
+                 timeout: float = RADIUS_TIMEOUT_SEC, retries: int = RADIUS_RETRIES):
+        self.address = (host, port)
+        self.secret = secret.encode()
+        self.socket_count = max(1, sockets)
+        self.timeout = timeout
+        self.retries = retries
+        # Never allow more in flight than there are IDs to hand out
+        self._semaphore = asyncio.Semaphore(min(max_inflight, self.socket_count * 256))
+        self._sockets: List[_RadiusSocket] = []
+        self._next = 0
+        self._open_lock = asyncio.Lock()
+
+    async def _ensure_open(self):
+        if self._sockets:
+            return
+        async with self._open_lock:
+            if self._sockets:
+                return
+            loop = asyncio.get_running_loop()
+            sockets = []
+            for _ in range(self.socket_count):
+                _, protocol = await loop.create_datagram_endpoint(
+                    lambda: _RadiusSocket(self.secret), remote_addr=self.address
+                )
+                sockets.append(protocol)
+            self._sockets = sockets
+
+    def _acquire_id(self) -> Tuple[_RadiusSocket, int]:
+        for _ in range(self.socket_count):
+            sock = self._sockets[self._next]
+            self._next = (self._next + 1) % self.socket_count
+            if sock.free_ids:
+                return sock, sock.free_ids.pop()
+        # Unreachable while the semaphore caps in-flight requests
+        raise RadiusError("No free RADIUS identifiers")
+
+    async def authenticate(self, username: str, password: str, calling_station_id: Optional[str] = None,
+                           framed_ip: Optional[str] = None) -> AuthResult:
+        await self._ensure_open()
+        async with self._semaphore:
+            sock, identifier = self._acquire_id()
+            try:
+                authenticator = os.urandom(16)
+                attrs = encode_attribute(ATTR_USER_NAME, username.encode())
+                attrs += encode_attribute(ATTR_USER_PASSWORD, hide_password(password.encode(), self.secret, authenticator))
+                attrs += encode_attribute(ATTR_NAS_IDENTIFIER, RADIUS_NAS_IDENTIFIER.encode())
+                if calling_station_id:
+                    attrs += encode_attribute(ATTR_CALLING_STATION_ID, calling_station_id.encode())
+                framed = _ipv4_packed(framed_ip)
+                if framed:
+                    attrs += encode_attribute(ATTR_FRAMED_IP_ADDRESS, framed)
+                packet = build_packet(ACCESS_REQUEST, identifier, authenticator, attrs, self.secret)
+
+                future = asyncio.get_running_loop().create_future()
+                sock.pending[identifier] = (future, authenticator)
+                # Retransmissions reuse the same ID and authenticator (RFC 2865 section 2.5)
+                for _ in range(self.retries + 1):
+                    sock.transport.sendto(packet)
+                    try:
+                        reply = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                        return AuthResult(reply[0], decode_attributes(reply[20:]))
+                    except asyncio.TimeoutError:
+                        continue
+                raise RadiusTimeout(f"No response from RADIUS server {self.address[0]}:{self.address[1]}")
+            finally:
+                sock.pending.pop(identifier, None)
+                sock.free_ids.append(identifier)
+
+    def close(self):
+        for sock in self._sockets:
+            if sock.transport is not None:
+                sock.transport.close()
+        self._sockets = []
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import threading
+import functools
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic_core import PydanticSerializationError, to_json
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_URL = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}")
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_PREFIX = os.getenv("RESPONSE_CACHE_PREFIX", "uac:")
+# A cache that is slower than the backend is useless: fail fast and bypass
+REDIS_TIMEOUT_SEC = float(os.getenv("REDIS_TIMEOUT_SEC", "0.1"))
+# After a Redis error, requests go straight to the backend for this long
+REDIS_RETRY_SEC = float(os.getenv("REDIS_RETRY_SEC", "5"))
+# Single flight: how long the worker computing a miss holds the fill lock,
+# and how long the others wait for its result before computing themselves
+FILL_LOCK_TTL_SEC = float(os.getenv("RESPONSE_CACHE_FILL_LOCK_TTL", "10"))
+FILL_WAIT_SEC = float(os.getenv("RESPONSE_CACHE_FILL_WAIT", "2"))
+FILL_POLL_SEC = 0.02
+
+class ResponseCache:
+    """
+    Response cache shared by every worker through Redis.
+
+    Entries are stored as the serialized JSON body together with the
+    version of each tag they depend on. A write path bumps a tag (INCR),
+    which makes every entry that recorded an older version a miss; the
+    stale entries simply age out with their TTL. A hit is one pipelined
+    round trip (GET entry + MGET tag versions).
+
+    Misses are single-flight: within a worker through a local lock, across
+    workers through a short SET NX lock in Redis. If Redis is unreachable
+    the cache is bypassed for REDIS_RETRY_SEC instead of failing requests.
+    """
+    _client = None
+    _async_client = None
+    _async_loop = None
+    _async_injected = False
+    _down_until = 0.0
+    _locks_guard = threading.Lock()
+    _thread_locks: Dict[str, threading.Lock] = {}
+    _async_locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+    @staticmethod
+    def configure(client=None, async_client=None):
+        """ Injects clients (e.g. fakeredis sharing one FakeServer); None resets to REDIS_URL """
+        ResponseCache._client = client
+        ResponseCache._async_client = async_client
+        ResponseCache._async_loop = None
+        ResponseCache._async_injected = async_client is not None
+        ResponseCache._down_until = 0.0
+
+    @staticmethod
+    def get_client():
+        if ResponseCache._client is None:
+            import redis
+            ResponseCache._client = redis.Redis.from_url(
+                REDIS_URL, socket_timeout=REDIS_TIMEOUT_SEC, socket_connect_timeout=REDIS_TIMEOUT_SEC
+            )
+        return ResponseCache._client
+
+    @staticmethod
+    def get_async_client():
+        # redis.asyncio connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if ResponseCache._async_client is None or (not ResponseCache._async_injected and ResponseCache._async_loop is not loop):
+            import redis.asyncio
+            ResponseCache._async_client = redis.asyncio.Redis.from_url(
+                REDIS_URL, socket_timeout=REDIS_TIMEOUT_SEC, socket_connect_timeout=REDIS_TIMEOUT_SEC
+            )
+            ResponseCache._async_loop = loop
+        return ResponseCache._async_client
+
+    @staticmethod
+    def available() -> bool:
+        return RESPONSE_CACHE_ENABLED and time.monotonic() >= ResponseCache._down_until
+
+    @staticmethod
+    def _mark_down(e: Exception):
+        if time.monotonic() >= ResponseCache._down_until:
+            print(f"Warning: response cache bypassed for {REDIS_RETRY_SEC:g}s, Redis error: {e}")
+        ResponseCache._down_until = time.monotonic() + REDIS_RETRY_SEC
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"{RESPONSE_CACHE_PREFIX}tag:{tag}"
+
+    @staticmethod
+    def entry_key(name: str, params: dict) -> str:
+        if not params:
+            return f"{RESPONSE_CACHE_PREFIX}cache:{name}"
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return f"{RESPONSE_CACHE_PREFIX}cache:{name}:{digest}"
+
+    @staticmethod
+    def _encode(versions: List[int], body: bytes) -> bytes:
+        return json.dumps(versions).encode() + b"\n" + body
+
+    @staticmethod
+    def _decode(raw: Optional[bytes], versions: List[int]) -> Optional[bytes]:
+        """ Returns the body if the entry exists and no tag moved since it was stored """
+        if raw is None:
+            return None
+        header, _, body = raw.partition(b"\n")
+        return body if json.loads(header) == versions else None
+
+    @staticmethod
+    def _versions(raw_versions) -> List[int]:
+        return [int(v or 0) for v in raw_versions]
+
+    @staticmethod
+    def invalidate(*tags: str):
+        """ Called by write paths after they committed; every entry tagged with one of `tags` misses from now on """
+        # Not skipped while bypassing: a lost bump would leave other workers serving stale entries until their TTL
+        if not tags or not RESPONSE_CACHE_ENABLED:
+            return
+        try:
+            pipe = ResponseCache.get_client().pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(ResponseCache._tag_key(tag))
+            pipe.execute()
+        except Exception as e:
+            ResponseCache._mark_down(e)
+
+    # --- sync endpoints (run in the threadpool) ---
+
+    @staticmethod
+    def _thread_lock(key: str) -> threading.Lock:
+        with ResponseCache._locks_guard:
+            lock = ResponseCache._thread_locks.get(key)
+            if lock is None:
+                lock = ResponseCache._thread_locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _lookup(client, key: str, tag_keys: List[str]) -> Tuple[Optional[bytes], List[int]]:
+        pipe = client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.mget(tag_keys)
+        raw, raw_versions = pipe.execute()
+        versions = ResponseCache._versions(raw_versions)
+        return ResponseCache._decode(raw, versions), versions
+
+    @staticmethod
+    def get_or_compute(key: str, tags: Iterable[str], ttl: float, compute) -> Tuple[bytes, str]:
+        """ Returns (json_body, "HIT" | "MISS" | "BYPASS"); errors raised by `compute` propagate """
+        if not ResponseCache.available():
+            return _serialize(compute()), "BYPASS"
+        tag_keys = [ResponseCache._tag_key(t) for t in tags]
+        lock_key = key + ":fill"
+        try:
+            client = ResponseCache.get_client()
+            body, versions = ResponseCache._lookup(client, key, tag_keys)
+        except _RedisErrors as e:
+            ResponseCache._mark_down(e)
+            return _serialize(compute()), "BYPASS"
+        if body is not None:
+            return body, "HIT"
+
+        with ResponseCache._thread_lock(key):
+            try:
+                # Another thread of this worker may have filled it meanwhile
+                body, versions = ResponseCache._lookup(client, key, tag_keys)
+                if body is not None:
+                    return body, "HIT"
+                owner = client.set(lock_key, b"1", nx=True, px=int(FILL_LOCK_TTL_SEC * 1000))
+                if not owner:
+                    deadline = time.monotonic() + FILL_WAIT_SEC
+                    while time.monotonic() < deadline:
+                        time.sleep(FILL_POLL_SEC)
+                        body, versions = ResponseCache._lookup(client, key, tag_keys)
+                        if body is not None:
+                            return body, "HIT"
+            except _RedisErrors as e:
+                ResponseCache._mark_down(e)
+                return _serialize(compute()), "BYPASS"
+
+            try:
+                body = _serialize(compute())
+                # Versions were read before computing: a write racing with us makes this entry stale, never wrong
+                client.set(key, ResponseCache._encode(versions, body), px=int(ttl * 1000))
+            except _RedisErrors as e:
+                ResponseCache._mark_down(e)
+            finally:
+                if owner:
+                    try:
+                        client.delete(lock_key)
+                    except _RedisErrors:
+                        pass
+            return body, "MISS"
+
+    # --- async endpoints (run on the event loop) ---
+
+    @staticmethod
+    def _async_lock(key: str) -> asyncio.Lock:
+        loop_key = (id(asyncio.get_running_loop()), key)
+        lock = ResponseCache._async_locks.get(loop_key)
+        if lock is None:
+            lock = ResponseCache._async_locks[loop_key] = asyncio.Lock()
+        return lock
+
+    @staticmethod
+    async def _lookup_async(client, key: str, tag_keys: List[str]) -> Tuple[Optional[bytes], List[int]]:
+        pipe = client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.mget(tag_keys)
+        raw, raw_versions = await pipe.execute()
+        versions = ResponseCache._versions(raw_versions)
+        return ResponseCache._decode(raw, versions), versions
+
+    @staticmethod
+    async def get_or_compute_async(key: str, tags: Iterable[str], ttl: float, compute) -> Tuple[bytes, str]:
+        """ Same as get_or_compute for `async def` endpoints; `compute` returns an awaitable """
+        if not ResponseCache.available():
+            return _serialize(await compute()), "BYPASS"
+        tag_keys = [ResponseCache._tag_key(t) for t in tags]
+        lock_key = key + ":fill"
+        try:
+            client = ResponseCache.get_async_client()
+            body, versions = await ResponseCache._lookup_async(client, key, tag_keys)
+        except _RedisErrors as e:
+            ResponseCache._mark_down(e)
+            return _serialize(await compute()), "BYPASS"
+        if body is not None:
+            return body, "HIT"
+
+        async with ResponseCache._async_lock(key):
+            try:
+                body, versions = await ResponseCache._lookup_async(client, key, tag_keys)
+                if body is not None:
+                    return body, "HIT"
+                owner = await client.set(lock_key, b"1", nx=True, px=int(FILL_LOCK_TTL_SEC * 1000))
+                if not owner:
+                    deadline = time.monotonic() + FILL_WAIT_SEC
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(FILL_POLL_SEC)
+                        body, versions = await ResponseCache._lookup_async(client, key, tag_keys)
+                        if body is not None:
+                            return body, "HIT"
+            except _RedisErrors as e:
+                ResponseCache._mark_down(e)
+                return _serialize(await compute()), "BYPASS"
+
+            try:
+                body = _serialize(await compute())
+                await client.set(key, ResponseCache._encode(versions, body), px=int(ttl * 1000))
+            except _RedisErrors as e:
+                ResponseCache._mark_down(e)
+            finally:
+                if owner:
+                    try:
+                        await client.delete(lock_key)
+                    except _RedisErrors:
+                        pass
+            return body, "MISS"
+
+def _redis_errors() -> tuple:
+    try:
+        import redis
+    except ImportError:
+        return (OSError,)
+    return (redis.RedisError, OSError)
+
+_RedisErrors = _redis_errors()
+
+def _serialize(value) -> bytes:
+    # pydantic-core's encoder handles models, dicts and datetimes natively; jsonable_encoder walks them in Python
+    try:
+        return to_json(value)
+    except PydanticSerializationError:
+        return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+
+def _cache_params(kwargs: dict) -> dict:
+    # Query/path parameters only; injected dependencies (sessions, requests) are not part of the key
+    return {k: v for k, v in kwargs.items() if v is None or isinstance(v, (str, int, float, bool))}
+
+def cached(name: str, ttl: float, tags: Tuple[str, ...]):
+    """
+    Caches a GET endpoint's JSON response for `ttl` seconds under `tags`.
+    Works on both `def` and `async def` endpoints; the signature is kept,
+    so FastAPI still sees the original parameters.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = ResponseCache.entry_key(name, _cache_params(kwargs))
+                body, status = await ResponseCache.get_or_compute_async(key, tags, ttl, lambda: func(*args, **kwargs))
+                return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = ResponseCache.entry_key(name, _cache_params(kwargs))
+            body, status = ResponseCache.get_or_compute(key, tags, ttl, lambda: func(*args, **kwargs))
+            return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+        return wrapper
+    return decorator
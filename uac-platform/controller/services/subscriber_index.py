@@ -0,0 +1,153 @@
+import os
+import time
+import heapq
+import asyncio
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.db import RadAcct # type: ignore
+from services.radacct_archive import RadAcctArchive
+
+# A built index is reused for this long when it covers the requested IPs and time range
+SUBSCRIBER_INDEX_TTL_SEC = float(os.getenv("SUBSCRIBER_INDEX_TTL_SEC", "30"))
+# IPs per `framedipaddress IN (...)` query
+IP_QUERY_BATCH = 1000
+
+def parse_alert_time(value) -> Optional[datetime]:
+    """
+    Suricata (ISO 8601 with offset) or Snort (yy/mm/dd-HH:MM:SS.ffffff)
+    timestamps, as naive UTC to compare with the naive radacct columns.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value, "%y/%m/%d-%H:%M:%S.%f")
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+class SubscriberIndex:
+    """
+    IP -> disjoint time segments, each with the session that held the IP
+    (or None), so owner_at() is a single bisect. Where sessions overlap,
+    the one that started last owns the address; a session that was never
+    stopped (NAS reboot, lost Accounting-Stop) ends when the IP's next
+    session starts.
+    """
+
+    def __init__(self, rows: Iterable[Tuple]):
+        """ rows: (ip, start, stop, username, mac, session_id) """
+        sessions: Dict[str, List[Tuple]] = {}
+        for ip, start, stop, username, mac, session_id in rows:
+            if ip and start is not None:
+                sessions.setdefault(ip, []).append((start, stop, username, mac, session_id))
+
+        self._bounds: Dict[str, List[datetime]] = {}
+        self._owners: Dict[str, List[Optional[dict]]] = {}
+        for ip, entries in sessions.items():
+            self._bounds[ip], self._owners[ip] = SubscriberIndex._segments(entries)
+        self.sessions = sum(len(e) for e in sessions.values())
+
+    @staticmethod
+    def _segments(entries: List[Tuple]) -> Tuple[List[datetime], List[Optional[dict]]]:
+        entries.sort(key=lambda e: e[0])
+        ends = []
+        for i, (start, stop, *_) in enumerate(entries):
+            if stop is None and i + 1 < len(entries):
+                stop = entries[i + 1][0]
+            ends.append(stop)
+
+        # Sweep over every start/stop: the owner of [bound, next bound) is the
+        # latest-started session still running (max-heap on start, lazy removal)
+        bounds, owners = [], []
+        active = []
+        next_entry = 0
+        for t in sorted({e[0] for e in entries} | {end for end in ends if end is not None}):
+            while next_entry < len(entries) and entries[next_entry][0] <= t:
+                heapq.heappush(active, (-next_entry, next_entry))
+                next_entry += 1
+            while active and ends[active[0][1]] is not None and ends[active[0][1]] <= t:
+                heapq.heappop(active)
+            owner = active[0][1] if active else None
+            if owners and owners[-1] == owner:
+                continue
+            bounds.append(t)
+            owners.append(owner)
+
+        info = {}
+        for i in set(o for o in owners if o is not None):
+            start, stop, username, mac, session_id = entries[i]
+            info[i] = {"username": username, "mac": mac, "session_id": session_id, "session_start": start, "session_stop": stop}
+        return bounds, [None if o is None else info[o] for o in owners]
+
+    def owner_at(self, ip: Optional[str], when: Optional[datetime]) -> Optional[dict]:
+        bounds = self._bounds.get(ip)
+        if not bounds or when is None:
+            return None
+        i = bisect_right(bounds, when) - 1
+        return self._owners[ip][i] if i >= 0 else None
+
+class SubscriberService:
+    # (index, ips, since, until, built_at) of the last build
+    _cached: Optional[Tuple[SubscriberIndex, frozenset, datetime, datetime, float]] = None
+
+    @staticmethod
+    async def load_index(db: AsyncSession, ips: Iterable[str], since: datetime, until: datetime) -> SubscriberIndex:
+        """
+        Sessions on `ips` overlapping [since, until]: one query per
+        IP_QUERY_BATCH addresses, plus the archived segments for alerts
+        older than the radacct retention window.
+        """
+        ips = frozenset(ips)
+        cached = SubscriberService._cached
+        if cached is not None:
+            index, cached_ips, cached_since, cached_until, built_at = cached
+            if time.monotonic() - built_at < SUBSCRIBER_INDEX_TTL_SEC and ips <= cached_ips \
+                    and cached_since <= since and until <= cached_until:
+                return index
+
+        rows = []
+        ordered = sorted(ips)
+        for offset in range(0, len(ordered), IP_QUERY_BATCH):
+            result = await db.execute(
+                select(RadAcct.framedipaddress, RadAcct.acctstarttime, RadAcct.acctstoptime,
+                       RadAcct.username, RadAcct.callingstationid, RadAcct.acctsessionid)
+                .where(RadAcct.framedipaddress.in_(ordered[offset:offset + IP_QUERY_BATCH]))
+                .where(RadAcct.acctstarttime <= until)
+                .where(or_(RadAcct.acctstoptime == None, RadAcct.acctstoptime >= since))
+            )
+            rows.extend(result.all())
+        rows.extend(await asyncio.to_thread(RadAcctArchive.sessions_on, ordered, since, until))
+
+        index = SubscriberIndex(rows)
+        SubscriberService._cached = (index, ips, since, until, time.monotonic())
+        return index
+
+    @staticmethod
+    async def enrich_alerts(db: AsyncSession, alerts: List[dict]) -> List[dict]:
+        """
+        Sets alert["subscriber"] to whoever held the source IP at alert
+        time, or failing that the destination IP (inbound traffic), or None.
+        """
+        times = [parse_alert_time(a.get("timestamp")) for a in alerts]
+        ips = {a[k] for a in alerts for k in ("source_ip", "dest_ip") if a.get(k)}
+        known = [t for t in times if t is not None]
+        index = await SubscriberService.load_index(db, ips, min(known), max(known)) if ips and known else None
+
+        for alert, when in zip(alerts, times):
+            subscriber = None
+            if index is not None:
+                for direction, key in (("source", "source_ip"), ("dest", "dest_ip")):
+                    owner = index.owner_at(alert.get(key), when)
+                    if owner is not None:
+                        subscriber = dict(owner, ip=alert[key], direction=direction)
+                        break
+            alert["subscriber"] = subscriber
+        return alerts
@@ -1,75 +1,332 @@
+import io
 import os
 import json
+import shutil
+import ipaddress
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
 from models.network import VpnPeer
+from services.config_store import Collection, ConfigStore
+from services.ipam import PrefixTrie
+from services.response_cache import ResponseCache
 
 # Simulated host configuration paths
 HOST_WG_DIR = os.getenv("HOST_WG_DIR", "/etc/wireguard")
+WG_INTERFACE = os.getenv("WG_INTERFACE", "wg0")
+SOFTETHER_SCRIPT = "/opt/uac-controller/softether_bridge.cmd"
+# Rendered for L3 peers saved without allowed IPs
+DEFAULT_ALLOWED_IPS = "0.0.0.0/0"
+# Legacy JSON store, imported into the config store on first use
 VPN_CONFIG_STORE = "/opt/uac-controller/vpn_peers.json"
 
+peers_collection = Collection("vpn_peers", model=VpnPeer, legacy_file=VPN_CONFIG_STORE, legacy_key=lambda p: p["name"])
+
+class PeerConflictError(ValueError):
+    """ Raised when a peer clashes with an existing one (name, key or routed prefix) """
+    def __init__(self, message: str, field: str):
+        super().__init__(message)
+        self.field = field
+
+class PeerRegistry:
+    """
+    Indexes of the saved peers by name, public key and allowed-IP prefix
+    (one trie per mode and address family; only the prefixes a peer was
+    saved with are indexed). Rebuilt only when the peer collection's
+    version moves, so lookups and conflict checks stay O(1) / O(prefix
+    length) with thousands of spokes.
+    """
+    _lock = threading.RLock()
+    _version = -1
+    _by_name: Dict[str, dict] = {}
+    _by_key: Dict[str, str] = {}
+    _tries: Dict[Tuple[str, int], PrefixTrie] = {}
+
+    @staticmethod
+    def _trie_key(peer: dict, network) -> Tuple[str, int]:
+        # SoftEther (L2) bridges don't route through wg0, so their prefixes never compete with L3 ones
+        return (peer.get("mode") or "L3", network.version)
+
+    @staticmethod
+    def parse_allowed_ips(allowed_ips: Optional[str]) -> List[object]:
+        if not allowed_ips:
+            return []
+        networks = []
+        for part in allowed_ips.split(","):
+            part = part.strip()
+            if part:
+                try:
+                    networks.append(ipaddress.ip_network(part, strict=False))
+                except ValueError as e:
+                    raise ValueError(f"Invalid allowed IP '{part}': {e}")
+        return networks
+
+    @staticmethod
+    def _refresh():
+        version = ConfigStore.collection_version(peers_collection.name)
+        if version == PeerRegistry._version:
+            return
+        by_name, by_key = {}, {}
+        tries = {(mode, family): PrefixTrie(bits) for mode in ("L2", "L3") for family, bits in ((4, 32), (6, 128))}
+        for name, peer in peers_collection.items():
+            by_name[name] = peer
+            by_key[peer["public_key"]] = name
+            try:
+                networks = PeerRegistry.parse_allowed_ips(peer.get("allowed_ips"))
+            except ValueError as e:
+                print(f"Warning: peer {name} has invalid allowed IPs: {e}")
+                networks = []
+            for network in networks:
+                tries[PeerRegistry._trie_key(peer, network)].insert(network, name)
+        PeerRegistry._by_name, PeerRegistry._by_key = by_name, by_key
+        PeerRegistry._tries = tries
+        PeerRegistry._version = version
+
+    @staticmethod
+    def _index(name: str, peer: dict):
+        PeerRegistry._by_name[name] = peer
+        PeerRegistry._by_key[peer["public_key"]] = name
+        for network in PeerRegistry.parse_allowed_ips(peer.get("allowed_ips")):
+            PeerRegistry._tries[PeerRegistry._trie_key(peer, network)].insert(network, name)
+
+    @staticmethod
+    def _unindex(name: str):
+        peer = PeerRegistry._by_name.pop(name, None)
+        if peer is None:
+            return
+        PeerRegistry._by_key.pop(peer["public_key"], None)
+        for network in PeerRegistry.parse_allowed_ips(peer.get("allowed_ips")):
+            PeerRegistry._tries[PeerRegistry._trie_key(peer, network)].remove(network, name)
+
+    @staticmethod
+    def record_write(version_before: int, added: Optional[dict] = None, removed: Optional[str] = None):
+        """
+        Patches the indexes after our own single-peer commit instead of
+        rebuilding them, provided nobody else wrote peers in between.
+        """
+        with PeerRegistry._lock:
+            if PeerRegistry._version != version_before:
+                return
+            if ConfigStore.collection_version(peers_collection.name) != version_before + 1:
+                return
+            if removed:
+                PeerRegistry._unindex(removed)
+            if added:
+                PeerRegistry._index(added["name"], added)
+            PeerRegistry._version = version_before + 1
+
+    @staticmethod
+    def version() -> int:
+        with PeerRegistry._lock:
+            PeerRegistry._refresh()
+            return PeerRegistry._version
+
+    @staticmethod
+    def get(name: str) -> Optional[dict]:
+        with PeerRegistry._lock:
+            PeerRegistry._refresh()
+            peer = PeerRegistry._by_name.get(name)
+            return dict(peer) if peer else None
+
+    @staticmethod
+    def find_by_public_key(public_key: str) -> Optional[dict]:
+        with PeerRegistry._lock:
+            PeerRegistry._refresh()
+            name = PeerRegistry._by_key.get(public_key)
+            return dict(PeerRegistry._by_name[name]) if name else None
+
+    @staticmethod
+    def find_by_address(address: str) -> Optional[dict]:
+        """ Returns the L3 peer wg0 routes `address` to: the most specific allowed-IP prefix holding it """
+        network = ipaddress.ip_network(address, strict=False)
+        with PeerRegistry._lock:
+            PeerRegistry._refresh()
+            owner = PeerRegistry._tries[("L3", network.version)].longest_match(network)
+            return dict(PeerRegistry._by_name[owner]) if owner else None
+
+    @staticmethod
+    def check(peer: dict):
+        """ Raises PeerConflictError if `peer` clashes with any saved peer """
+        with PeerRegistry._lock:
+            PeerRegistry._refresh()
+            if peer["name"] in PeerRegistry._by_name:
+                raise PeerConflictError("Peer name already exists", "name")
+            owner = PeerRegistry._by_key.get(peer["public_key"])
+            if owner:
+                raise PeerConflictError(f"Public key already used by peer {owner}", "public_key")
+            # WireGuard routes by longest prefix, so a hub's default route next to a spoke's /24 is fine;
+            # only the same prefix on two peers is ambiguous
+            for network in PeerRegistry.parse_allowed_ips(peer.get("allowed_ips")):
+                owner = PeerRegistry._tries[PeerRegistry._trie_key(peer, network)].find_exact(network)
+                if owner:
+                    raise PeerConflictError(f"Allowed IPs {network} already routed to peer {owner}", "allowed_ips")
+
+class WireGuardSync:
+    """
+    Applies WireGuard peer changes to the running interface as a delta
+    (`wg set ... peer X remove` / `peer Y endpoint ...`) in a single `wg`
+    call, instead of restarting the tunnel for every peer.
+    """
+    STATE_FILE = os.path.join(HOST_WG_DIR, f".{WG_INTERFACE}.applied.json")
+
+    @staticmethod
+    def _peer_spec(p: dict) -> Tuple[str, str]:
+        return (p["endpoint"], p.get("allowed_ips") or DEFAULT_ALLOWED_IPS)
+
+    @staticmethod
+    def _running_state() -> Optional[Dict[str, Tuple[str, str]]]:
+        """ Reads peers from the live interface, None if it's not up/available """
+        if not shutil.which("wg"):
+            return None
+        try:
+            out = subprocess.run(["wg", "show", WG_INTERFACE, "dump"], capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if out.returncode != 0:
+            return None
+        state = {}
+        # First line describes the interface itself
+        for line in out.stdout.splitlines()[1:]:
+            fields = line.split("\t")
+            if len(fields) >= 4:
+                state[fields[0]] = (fields[2], fields[3])
+        return state
+
+    @staticmethod
+    def _saved_state() -> Dict[str, Tuple[str, str]]:
+        try:
+            with open(WireGuardSync.STATE_FILE, "r") as f:
+                return {k: tuple(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def diff(current: Dict[str, Tuple[str, str]], desired: Dict[str, Tuple[str, str]]) -> List[str]:
+        """ Builds the `wg set` arguments turning `current` into `desired` """
+        args = []
+        for key in current.keys() - desired.keys():
+            args += ["peer", key, "remove"]
+        for key, (endpoint, allowed_ips) in desired.items():
+            current_spec = current.get(key)
+            if current_spec is None or current_spec[0] != endpoint or _normalize_ips(current_spec[1]) != _normalize_ips(allowed_ips):
+                args += ["peer", key, "endpoint", endpoint, "allowed-ips", allowed_ips, "persistent-keepalive", "25"]
+        return args
+
+    @staticmethod
+    def sync(l3_peers: List[dict]) -> int:
+        """ Pushes the peer delta to the interface, returns the number of peers changed """
+        desired = {p["public_key"]: WireGuardSync._peer_spec(p) for p in l3_peers}
+        running = WireGuardSync._running_state()
+        current = running if running is not None else WireGuardSync._saved_state()
+        args = WireGuardSync.diff(current, desired)
+
+        if args and running is not None:
+            result = subprocess.run(["wg", "set", WG_INTERFACE] + args, capture_output=True, text=True, timeout=60)
+            if result.returncode != 0:
+                raise RuntimeError(f"wg set failed: {result.stderr.strip()}")
+
+        try:
+            tmp_path = WireGuardSync.STATE_FILE + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(desired, f)
+            os.replace(tmp_path, WireGuardSync.STATE_FILE)
+        except OSError as e:
+            print(f"Warning: could not record applied WireGuard state: {e}")
+        return args.count("peer")
+
+def _normalize_ips(allowed_ips: str) -> frozenset:
+    return frozenset(part.strip() for part in allowed_ips.split(",") if part.strip() and part.strip() != "(none)")
+
+def _write_if_changed(path: str, content: str) -> bool:
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
 class VpnConfigService:
     @staticmethod
     def get_all_peers() -> list:
-        if not os.path.exists(VPN_CONFIG_STORE):
-            return []
-        with open(VPN_CONFIG_STORE, "r") as f:
-            return json.load(f)
+        return peers_collection.all()
 
     @staticmethod
     def save_peers(peers: list):
-        with open(VPN_CONFIG_STORE, "w") as f:
-            json.dump(peers, f, indent=4)
+        peers_collection.replace_all([(p["name"], p) for p in peers])
+        ResponseCache.invalidate("vpn")
 
     @staticmethod
     def add_peer(peer_data: VpnPeer):
-        peers = VpnConfigService.get_all_peers()
         peer_dict = peer_data.model_dump()
-        peers.append(peer_dict)
-        VpnConfigService.save_peers(peers)
-        
-        # Trigger config generation
-        VpnConfigService.generate_configs(peers)
+        # Check and insert under the store's write lock so concurrent adds can't both pass
+        with ConfigStore.transaction():
+            PeerRegistry.check(peer_dict)
+            version = PeerRegistry.version()
+            peers_collection.put(peer_dict["name"], peer_dict)
+        PeerRegistry.record_write(version, added=peer_dict)
+        ResponseCache.invalidate("vpn")
         return peer_dict
 
     @staticmethod
     def delete_peer(peer_name: str):
-        peers = VpnConfigService.get_all_peers()
-        peers = [p for p in peers if p["name"] != peer_name]
-        VpnConfigService.save_peers(peers)
-        VpnConfigService.generate_configs(peers)
+        with ConfigStore.transaction():
+            version = PeerRegistry.version()
+            deleted = peers_collection.delete(peer_name)
+        if deleted:
+            PeerRegistry.record_write(version, removed=peer_name)
+            ResponseCache.invalidate("vpn")
+
+    @staticmethod
+    def apply_configs():
+        """ Regenerates tunnel configs from the currently saved peers """
+        VpnConfigService.generate_configs(VpnConfigService.get_all_peers())
+
+    @staticmethod
+    def render_wireguard(l3_peers: list) -> str:
+        buf = io.StringIO()
+        buf.write("[Interface]\n# UAC WireGuard (L3) Interface\nPrivateKey = <LOCAL_PRIVATE_KEY>\nListenPort = 51820\n\n")
+        for p in l3_peers:
+            buf.write(f"# Peer: {p['name']}\n")
+            buf.write(f"[Peer]\nPublicKey = {p['public_key']}\nEndpoint = {p['endpoint']}\nAllowedIPs = {p.get('allowed_ips') or DEFAULT_ALLOWED_IPS}\nPersistentKeepalive = 25\n\n")
+        return buf.getvalue()
+
+    @staticmethod
+    def render_softether(l2_peers: list) -> str:
+        # We generate a virtual hub configuration script
+        buf = io.StringIO()
+        buf.write("Hub UACBRIDGE\n")
+        for p in l2_peers:
+            buf.write(f"CascadeCreate {p['name']} /SERVER:{p['endpoint']} /HUB:DEFAULT /USERNAME:bridge\n")
+            buf.write(f"CascadeOnline {p['name']}\n")
+            if p.get("target_vlan"):
+                buf.write(f"BridgeCreate {p['name']} /DEVICE:{p['target_vlan']} /TAP:no\n")
+        return buf.getvalue()
 
     @staticmethod
     def generate_configs(peers: list):
         """
         Translates the JSON peer list into absolute system configurations.
+        wg0.conf is kept as the persistent copy for wg-quick; the running
+        tunnel only receives the peers that actually changed.
         """
         l3_peers = [p for p in peers if p.get("mode") == "L3"]
         l2_peers = [p for p in peers if p.get("mode") == "L2"]
-        
+
         # 1. WireGuard Config (L3)
-        wg_conf = "[Interface]\n# UAC WireGuard (L3) Interface\nPrivateKey = <LOCAL_PRIVATE_KEY>\nListenPort = 51820\n\n"
-        for p in l3_peers:
-            wg_conf += f"# Peer: {p['name']}\n"
-            wg_conf += f"[Peer]\nPublicKey = {p['public_key']}\nEndpoint = {p['endpoint']}\nAllowedIPs = {p.get('allowed_ips', '0.0.0.0/0')}\nPersistentKeepalive = 25\n\n"
-        
-        # Write wg0.conf
         os.makedirs(HOST_WG_DIR, exist_ok=True)
         try:
-            with open(f"{HOST_WG_DIR}/wg0.conf", "w") as f:
-                f.write(wg_conf)
+            _write_if_changed(f"{HOST_WG_DIR}/{WG_INTERFACE}.conf", VpnConfigService.render_wireguard(l3_peers))
+            WireGuardSync.sync(l3_peers)
         except PermissionError:
             print("Warning: Permission denied writing WireGuard configurations (expected if not root).")
-            
+
         # 2. SoftEther vpncmd scripts (L2)
-        # We generate a virtual hub configuration script
-        vpncmd_script = "Hub UACBRIDGE\n"
-        for p in l2_peers:
-            vpncmd_script += f"CascadeCreate {p['name']} /SERVER:{p['endpoint']} /HUB:DEFAULT /USERNAME:bridge\n"
-            vpncmd_script += f"CascadeOnline {p['name']}\n"
-            if p.get("target_vlan"):
-                vpncmd_script += f"BridgeCreate {p['name']} /DEVICE:{p['target_vlan']} /TAP:no\n"
-        
         try:
-            with open("/opt/uac-controller/softether_bridge.cmd", "w") as f:
-                f.write(vpncmd_script)
+            _write_if_changed(SOFTETHER_SCRIPT, VpnConfigService.render_softether(l2_peers))
         except Exception:
             pass
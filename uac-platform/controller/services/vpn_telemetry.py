@@ -0,0 +1,165 @@
+import os
+import time
+import shutil
+import subprocess
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# One `wg show all dump` per interval covers every peer on every interface
+TELEMETRY_INTERVAL_SEC = float(os.getenv("UAC_VPN_TELEMETRY_INTERVAL", "10"))
+TELEMETRY_HISTORY = int(os.getenv("UAC_VPN_TELEMETRY_HISTORY", "60"))
+# WireGuard re-handshakes every 2 minutes on an active tunnel
+HANDSHAKE_TIMEOUT_SEC = 180
+
+def parse_dump(text: str) -> Dict[str, dict]:
+    """
+    Parses `wg show all dump` into {public_key: counters}.
+    Interface lines have 5 tab-separated fields, peer lines 9:
+    interface, public-key, preshared-key, endpoint, allowed-ips,
+    latest-handshake, rx-bytes, tx-bytes, persistent-keepalive.
+    """
+    peers = {}
+    for line in text.splitlines():
+        fields = line.split("\t")
+        if len(fields) != 9:
+            continue
+        try:
+            peers[fields[1]] = {
+                "interface": fields[0],
+                "endpoint": None if fields[3] == "(none)" else fields[3],
+                "latest_handshake": int(fields[5]),
+                "rx_bytes": int(fields[6]),
+                "tx_bytes": int(fields[7])
+            }
+        except ValueError:
+            continue
+    return peers
+
+def _read_wg_dump() -> Optional[str]:
+    if not shutil.which("wg"):
+        return None
+    try:
+        out = subprocess.run(["wg", "show", "all", "dump"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout if out.returncode == 0 else None
+
+class VpnTelemetryService:
+    """
+    Keeps a ring buffer of (timestamp, rx, tx, handshake) samples per peer
+    public key. Throughput is derived from the two most recent samples.
+    """
+    dump_reader: Callable[[], Optional[str]] = staticmethod(_read_wg_dump)
+
+    _lock = threading.Lock()
+    # Held while a dump runs, so concurrent requests after the interval expired share one `wg` call
+    _sample_lock = threading.Lock()
+    _history: Dict[str, deque] = {}
+    _latest: Dict[str, dict] = {}
+    _last_sample = 0.0
+    _thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def ingest(text: str, now: Optional[float] = None):
+        """ Records one dump; peers missing from it are forgotten """
+        now = time.time() if now is None else now
+        parsed = parse_dump(text)
+        with VpnTelemetryService._lock:
+            history = VpnTelemetryService._history
+            for key in list(history):
+                if key not in parsed:
+                    del history[key]
+            for key, counters in parsed.items():
+                samples = history.get(key)
+                if samples is None:
+                    samples = history[key] = deque(maxlen=TELEMETRY_HISTORY)
+                samples.append((now, counters["rx_bytes"], counters["tx_bytes"], counters["latest_handshake"]))
+            VpnTelemetryService._latest = parsed
+            VpnTelemetryService._last_sample = now
+
+    @staticmethod
+    def sample(force: bool = False) -> bool:
+        """ Takes a new dump unless the last one is younger than the interval """
+        if not force and time.time() - VpnTelemetryService._last_sample < TELEMETRY_INTERVAL_SEC:
+            return False
+        with VpnTelemetryService._sample_lock:
+            # Whoever held the lock before us may just have taken it
+            if not force and time.time() - VpnTelemetryService._last_sample < TELEMETRY_INTERVAL_SEC:
+                return False
+            text = VpnTelemetryService.dump_reader()
+            if text is None:
+                return False
+            VpnTelemetryService.ingest(text)
+            return True
+
+    @staticmethod
+    def _rate(samples: deque, index: int) -> Optional[float]:
+        if len(samples) < 2:
+            return None
+        (t1, *prev), (t2, *last) = samples[-2], samples[-1]
+        delta = last[index] - prev[index]
+        if t2 <= t1 or delta < 0:
+            # Counter reset (interface or peer re-created)
+            return None
+        return round(delta * 8 / (t2 - t1), 1)
+
+    @staticmethod
+    def get_peer_stats(public_key: str, include_history: bool = False, now: Optional[float] = None) -> Optional[dict]:
+        now = time.time() if now is None else now
+        with VpnTelemetryService._lock:
+            counters = VpnTelemetryService._latest.get(public_key)
+            samples = VpnTelemetryService._history.get(public_key)
+            if counters is None or not samples:
+                return None
+            handshake = counters["latest_handshake"]
+            stats = {
+                "online": handshake > 0 and now - handshake < HANDSHAKE_TIMEOUT_SEC,
+                "last_handshake": handshake or None,
+                "endpoint": counters["endpoint"],
+                "rx_bytes": counters["rx_bytes"],
+                "tx_bytes": counters["tx_bytes"],
+                "rx_bps": VpnTelemetryService._rate(samples, 0),
+                "tx_bps": VpnTelemetryService._rate(samples, 1),
+                "sampled_at": samples[-1][0]
+            }
+            if include_history:
+                stats["history"] = [
+                    {"timestamp": t, "rx_bytes": rx, "tx_bytes": tx, "last_handshake": hs}
+                    for t, rx, tx, hs in samples
+                ]
+            return stats
+
+    @staticmethod
+    def join(peers: List[dict], include_history: bool = False) -> List[dict]:
+        """ Attaches live telemetry (or None) to each configured peer """
+        VpnTelemetryService.sample()
+        now = time.time()
+        for peer in peers:
+            peer["telemetry"] = VpnTelemetryService.get_peer_stats(peer.get("public_key"), include_history, now)
+        return peers
+
+    @staticmethod
+    def _loop():
+        while True:
+            try:
+                VpnTelemetryService.sample(force=True)
+            except Exception as e:
+                print(f"Warning: VPN telemetry sample failed: {e}")
+            time.sleep(TELEMETRY_INTERVAL_SEC)
+
+    @staticmethod
+    def start():
+        """ Starts the background sampler so history keeps filling between requests """
+        if VpnTelemetryService._thread is not None or not shutil.which("wg"):
+            return
+        VpnTelemetryService._thread = threading.Thread(target=VpnTelemetryService._loop, name="uac-vpn-telemetry", daemon=True)
+        VpnTelemetryService._thread.start()
+
+def _reset_after_fork():
+    # The sampler thread doesn't survive fork(); each worker starts its own in start()
+    VpnTelemetryService._lock = threading.Lock()
+    VpnTelemetryService._sample_lock = threading.Lock()
+    VpnTelemetryService._thread = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,24 @@
+"""
+Points every path and connection setting at a throwaway directory before
+any controller module is imported (they are read at import time).
+"""
+import os
+import sys
+import tempfile
+
+CONTROLLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CONTROLLER_DIR)
+
+_TEST_ROOT = tempfile.mkdtemp(prefix="uac-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TEST_ROOT, 'radius.db')}",
+    "UAC_CONFIG_DB": os.path.join(_TEST_ROOT, "config.db"),
+    "HOST_FS_ROOT": os.path.join(_TEST_ROOT, "host-fs"),
+    "HOST_WG_DIR": os.path.join(_TEST_ROOT, "host-fs", "etc", "wireguard"),
+    "SYS_CLASS_NET": os.path.join(_TEST_ROOT, "sys", "class", "net"),
+    "SNAPSHOT_DIR": os.path.join(_TEST_ROOT, "snapshots"),
+    "RADACCT_ARCHIVE_DIR": os.path.join(_TEST_ROOT, "radacct-archive"),
+    "RESPONSE_CACHE_ENABLED": "false",
+})
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from services.config_snapshots import ConfigSnapshotService
+from services.firewall import FIREWALL_DIR
+from services.ipam import IpamService
+from services.netplan import CHILLI_DIR, NETPLAN_DIR
+from services.response_cache import ResponseCache
+
+def _write(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+@pytest.fixture
+def effects(monkeypatch):
+    """ Records the cache tags invalidated and the IPAM reloads """
+    calls = {"tags": set(), "ipam_reloads": 0}
+
+    def invalidate(*tags):
+        calls["tags"].update(tags)
+
+    def reload():
+        calls["ipam_reloads"] += 1
+
+    monkeypatch.setattr(ResponseCache, "invalidate", staticmethod(invalidate))
+    monkeypatch.setattr(IpamService, "reload", staticmethod(reload))
+    return calls
+
+def test_rolling_back_netplan_files_reloads_ipam_and_purges_network(effects):
+    netplan = os.path.join(NETPLAN_DIR, "10-uac-vlan100.yaml")
+    _write(netplan, "network: {version: 2}\n")
+    version = ConfigSnapshotService.record("test")["version"]
+    _write(netplan, "network: {version: 2, vlans: {}}\n")
+    _write(os.path.join(NETPLAN_DIR, "10-uac-vlan200.yaml"), "network: {version: 2}\n")
+
+    result = ConfigSnapshotService.rollback(version)
+    assert result["files_restored"] == [netplan]
+    assert result["files_removed"] == [os.path.join(NETPLAN_DIR, "10-uac-vlan200.yaml")]
+    assert result["collections"] == []
+    assert effects["tags"] == {"network"}
+    assert effects["ipam_reloads"] == 1
+
+def test_rolling_back_firewall_files_purges_security_only(effects):
+    rules = os.path.join(FIREWALL_DIR, "rules.sh")
+    _write(rules, "#!/bin/sh\n")
+    version = ConfigSnapshotService.record("test")["version"]
+    _write(rules, "#!/bin/sh\niptables -A FORWARD -j DROP\n")
+
+    ConfigSnapshotService.rollback(version)
+    with open(rules) as f:
+        assert f.read() == "#!/bin/sh\n"
+    assert effects["tags"] == {"security"}
+    assert effects["ipam_reloads"] == 0
+
+def test_host_owned_files_survive_a_rollback(effects):
+    generated = os.path.join(NETPLAN_DIR, "20-profile-eth1.yaml")
+    _write(generated, "network: {version: 2}\n")
+    chilli = os.path.join(CHILLI_DIR, "profile-eth1.conf")
+    _write(chilli, "HS_LANIF=eth1\n")
+    version = ConfigSnapshotService.record("test")["version"]
+
+    # Installed by the host after that version, and edited by hand
+    cloud_init = os.path.join(NETPLAN_DIR, "50-cloud-init.yaml")
+    _write(cloud_init, "network: {version: 2, ethernets: {eth0: {dhcp4: true}}}\n")
+    local = os.path.join(CHILLI_DIR, "local.conf")
+    _write(local, "HS_DEBUG=1\n")
+    os.remove(generated)
+    os.remove(chilli)
+
+    result = ConfigSnapshotService.rollback(version)
+    assert sorted(result["files_restored"]) == sorted([generated, chilli])
+    assert result["files_removed"] == []
+    with open(cloud_init) as f:
+        assert "dhcp4" in f.read()
+    assert os.path.exists(local)
+    # Never captured either: the rolled-back state has no file changes against the target
+    changes = ConfigSnapshotService.diff(version, result["version"])["files"]
+    assert not any(paths for paths in changes.values())
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from services import ids
+from services.ids import IDSService
+
+def _suricata_line(n: int, event_type: str = "alert") -> str:
+    return json.dumps({
+        "timestamp": f"2026-02-23T10:{n // 60:02d}:{n % 60:02d}.000000+0000", "event_type": event_type,
+        "src_ip": f"10.0.{n // 256}.{n % 256}", "dest_ip": "8.8.8.8",
+        "alert": {"signature": f"sig {n}", "severity": 2, "category": "Test"},
+    }) + "\n"
+
+@pytest.fixture
+def logs(monkeypatch, tmp_path):
+    suricata, snort = tmp_path / "eve.json", tmp_path / "alert_json.txt"
+    suricata.write_text("")
+    snort.write_text("")
+    monkeypatch.setattr(ids, "SURICATA_LOG", str(suricata))
+    monkeypatch.setattr(ids, "SNORT_LOG", str(snort))
+    # Small blocks so lines straddle block boundaries
+    monkeypatch.setattr(ids, "IDS_TAIL_BLOCK_BYTES", 100)
+    monkeypatch.setattr(IDSService, "get_config", staticmethod(lambda: {"engine": "suricata"}))
+    return suricata, snort
+
+def test_newest_alerts_come_first(logs):
+    suricata, _ = logs
+    lines = [_suricata_line(n, "alert" if n % 3 else "flow") for n in range(1000)]
+    # The engine is halfway through writing the next event
+    suricata.write_text("".join(lines) + '{"timestamp":"2026-02-23T11:')
+
+    alerts = IDSService.get_recent_alerts(limit=5)
+    assert [a["signature"] for a in alerts] == ["sig 998", "sig 997", "sig 995", "sig 994", "sig 992"]
+    assert alerts[0] == {"timestamp": "2026-02-23T10:16:38.000000+0000", "source_ip": "10.0.3.230", "dest_ip": "8.8.8.8",
+                         "signature": "sig 998", "severity": 2, "category": "Test", "engine": "Suricata"}
+
+def test_short_logs_return_every_alert(logs):
+    suricata, _ = logs
+    suricata.write_text(_suricata_line(1) + "\n" + _suricata_line(2))
+    assert [a["signature"] for a in IDSService.get_recent_alerts(limit=50)] == ["sig 2", "sig 1"]
+
+def test_snort_alerts_newest_first(logs, monkeypatch):
+    _, snort = logs
+    monkeypatch.setattr(IDSService, "get_config", staticmethod(lambda: {"engine": "snort"}))
+    snort.write_text("".join(
+        json.dumps({"timestamp": f"26/02/23-10:15:{n:02d}.00000", "src_addr": "10.0.0.50", "msg": f"msg {n}", "priority": 3}) + "\n"
+        for n in range(40)
+    ))
+    alerts = IDSService.get_recent_alerts(limit=3)
+    assert [a["signature"] for a in alerts] == ["msg 39", "msg 38", "msg 37"]
+    assert alerts[0]["engine"] == "Snort"
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database
+from models.db import Base, RadAcct
+from routers import ids as ids_router
+from services import ids
+from services.ids import IDSService
+from services.subscriber_index import SubscriberService
+
+def _alert(minute: int, src_ip: str) -> str:
+    return json.dumps({"timestamp": f"2026-02-23T10:{minute:02d}:00.000000+0000", "event_type": "alert",
+                       "src_ip": src_ip, "dest_ip": "8.8.8.8", "alert": {"signature": f"sig {minute}"}}) + "\n"
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    eve = tmp_path / "eve.json"
+    eve.write_text("".join(_alert(m, "10.0.0.1") for m in range(50)) + "".join(_alert(m, "10.0.0.2") for m in range(50, 60)))
+    (tmp_path / "alert_json.txt").write_text("")
+    monkeypatch.setattr(ids, "SURICATA_LOG", str(eve))
+    monkeypatch.setattr(ids, "SNORT_LOG", str(tmp_path / "alert_json.txt"))
+    monkeypatch.setattr(IDSService, "get_config", staticmethod(lambda: {"engine": "suricata"}))
+    monkeypatch.setattr(SubscriberService, "_cached", None)
+
+    Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        # Only the newest alerts' source held a session
+        db.add(RadAcct(radacctid=1, acctsessionid="s1", username="alice", framedipaddress="10.0.0.2",
+                       acctstarttime=datetime(2026, 2, 23, 10, 45), acctstoptime=datetime(2026, 2, 23, 11, 0)))
+        db.commit()
+    app = FastAPI()
+    app.include_router(ids_router.router)
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(database.async_engine.dispose)
+    Base.metadata.drop_all(bind=database.engine)
+
+def test_newest_alerts_are_enriched(client):
+    alerts = client.get("/system/ids/alerts").json()
+    assert len(alerts) == 60
+    assert alerts[0]["signature"] == "sig 59"
+    assert [a["subscriber"]["username"] for a in alerts[:10]] == ["alice"] * 10
+    assert alerts[10]["subscriber"] is None
+
+def test_database_errors_leave_alerts_unenriched(client, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    async def unavailable(db, alerts):
+        raise OperationalError("SELECT", {}, Exception("database is down"))
+
+    monkeypatch.setattr(SubscriberService, "enrich_alerts", staticmethod(unavailable))
+    alerts = client.get("/system/ids/alerts").json()
+    assert alerts[0]["signature"] == "sig 59" and "subscriber" not in alerts[0]
+
+def test_enrichment_bugs_are_not_hidden(client, monkeypatch):
+    async def broken(db, alerts):
+        raise TypeError("bug")
+
+    monkeypatch.setattr(SubscriberService, "enrich_alerts", staticmethod(broken))
+    with pytest.raises(TypeError):
+        client.get("/system/ids/alerts")
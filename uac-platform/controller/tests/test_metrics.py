@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from services import metrics
+from services.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    """ Fresh metrics publishing to a shared directory, as under serve.py """
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(MetricsRegistry, "_metrics", [])
+    requests = Counter("test_requests_total", "Requests", ("route",))
+    latency = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    in_progress = Gauge("test_in_progress", "In progress")
+    startup = Gauge("test_startup_seconds", "Startup", multiprocess_mode="all")
+    for metric in (requests, latency, in_progress, startup):
+        MetricsRegistry.register(metric)
+    return tmp_path, requests, latency, in_progress, startup
+
+def _exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def _write_worker(directory, pid: int, data: dict):
+    with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+        json.dump(data, f)
+
+def _sample(text: str, name: str) -> float:
+    return float(next(line.rsplit(" ", 1)[1] for line in text.splitlines() if line.startswith(name + " ")))
+
+def test_render_adds_up_every_worker(registry):
+    directory, requests, latency, in_progress, startup = registry
+    requests.inc(route="/health")
+    latency.observe(0.05)
+    in_progress.set(2)
+    startup.set(0.5)
+
+    # A live worker (the test runner's parent) and one that has exited
+    _write_worker(directory, os.getppid(), {
+        "test_requests_total": [[["/health"], 3]],
+        "test_latency_seconds": [[[], [[0, 1, 0], 0.5, 1]]],
+        "test_in_progress": [[[], 1]],
+        "test_startup_seconds": [[[], 0.25]],
+    })
+    _write_worker(directory, _exited_pid(), {
+        "test_requests_total": [[["/health"], 10]],
+        "test_in_progress": [[[], 7]],
+        "test_startup_seconds": [[[], 9.0]],
+    })
+
+    text = MetricsRegistry.render()
+    # Counts of exited workers are kept so the total never goes backwards
+    assert _sample(text, 'test_requests_total{route="/health"}') == 14
+    assert _sample(text, 'test_latency_seconds_bucket{le="0.1"}') == 1
+    assert _sample(text, 'test_latency_seconds_bucket{le="1"}') == 2
+    assert _sample(text, "test_latency_seconds_count") == 2
+    # Gauges only describe the live workers
+    assert _sample(text, "test_in_progress") == 3
+    assert _sample(text, f'test_startup_seconds{{pid="{os.getpid()}"}}') == 0.5
+    assert _sample(text, f'test_startup_seconds{{pid="{os.getppid()}"}}') == 0.25
+    assert "9.0" not in text
+    # The answering worker published its own values first
+    assert os.path.exists(os.path.join(directory, f"{os.getpid()}.json"))
+
+def test_unreadable_worker_files_are_skipped(registry):
+    directory, requests, *_ = registry
+    requests.inc(route="/health")
+    (directory / "12345.json").write_text("{truncated")
+    (directory / "notes.txt").write_text("ignored")
+    assert _sample(MetricsRegistry.render(), 'test_requests_total{route="/health"}') == 1
+
+def test_without_a_directory_only_this_process_is_rendered(registry, monkeypatch):
+    directory, requests, *_ = registry
+    monkeypatch.setattr(metrics, "METRICS_DIR", "")
+    requests.inc(route="/health")
+    _write_worker(directory, os.getppid(), {"test_requests_total": [[["/health"], 3]]})
+    assert _sample(MetricsRegistry.render(), 'test_requests_total{route="/health"}') == 1
+    assert "pid=" not in MetricsRegistry.render()
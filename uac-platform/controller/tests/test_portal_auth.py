@@ -0,0 +1,66 @@
+import asyncio
+import ipaddress
+
+import pytest
+
+from services import portal_auth
+from services.portal_auth import LoginThrottledError, NegativeCache, PortalAuthService, TokenBucketLimiter
+from services.radius_client import ACCESS_ACCEPT, ACCESS_CHALLENGE, ACCESS_REJECT, AuthResult
+
+class FakeRadius:
+    """ Answers from {username: code}; counts the requests it got """
+    def __init__(self, codes: dict):
+        self.codes = codes
+        self.requests = []
+
+    async def authenticate(self, username, password, calling_station_id=None, framed_ip=None):
+        self.requests.append((username, calling_station_id))
+        return AuthResult(self.codes.get(username, ACCESS_REJECT), [])
+
+@pytest.fixture
+def radius(monkeypatch):
+    monkeypatch.setattr(PortalAuthService, "limiter", TokenBucketLimiter(rate=0.0, burst=3))
+    monkeypatch.setattr(PortalAuthService, "negative_cache", NegativeCache(ttl=30))
+    server = FakeRadius({"alice": ACCESS_ACCEPT, "bob": ACCESS_ACCEPT, "otp-user": ACCESS_CHALLENGE})
+    monkeypatch.setattr(PortalAuthService, "get_pool", staticmethod(lambda: server))
+    return server
+
+def _login(username, password="pw", **kwargs):
+    return asyncio.run(PortalAuthService.login(username, password, **kwargs))
+
+def test_rotating_the_mac_does_not_reset_the_address_bucket(radius):
+    for i in range(3):
+        _login(f"guess{i}", mac=f"02:00:00:00:00:{i:02x}", client_address="10.0.0.9")
+    with pytest.raises(LoginThrottledError):
+        _login("guess3", mac="02:00:00:00:00:ff", client_address="10.0.0.9")
+
+def test_claiming_another_subscribers_mac_does_not_lock_them_out(radius):
+    for i in range(3):
+        _login(f"mallory{i}", mac="02:aa:aa:aa:aa:aa", client_address="10.0.0.66")
+    assert _login("alice", mac="02:aa:aa:aa:aa:aa", client_address="10.0.0.10")["accepted"]
+
+def test_one_username_is_throttled_across_addresses(radius):
+    for i in range(3):
+        _login("bob", "wrong", client_address=f"10.0.1.{i}")
+    with pytest.raises(LoginThrottledError):
+        _login("bob", "wrong", client_address="10.0.1.200")
+
+def test_a_challenge_is_not_cached_as_a_rejection(radius):
+    result = _login("otp-user", client_address="10.0.0.20")
+    assert result == {"accepted": False, "cached": False, "challenge": True, "message": "Additional authentication required"}
+    _login("otp-user", client_address="10.0.0.21")
+    # Both went to the server; a rejection would have been answered from the cache
+    assert len(radius.requests) == 2
+
+    _login("nobody", client_address="10.0.0.22")
+    assert _login("nobody", client_address="10.0.0.23")["cached"] is True
+    assert len(radius.requests) == 3
+
+def test_client_address_only_believes_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(portal_auth, "PORTAL_TRUSTED_PROXIES", [ipaddress.ip_network("172.18.0.0/16")])
+    # Spoofed hops before the proxy's own entry are ignored
+    assert PortalAuthService.client_address("172.18.0.5", "1.2.3.4, 10.0.0.7") == "10.0.0.7"
+    assert PortalAuthService.client_address("172.18.0.5", "10.0.0.7, 172.18.0.2") == "10.0.0.7"
+    # A direct client can't pick its own address
+    assert PortalAuthService.client_address("10.0.0.8", "10.0.0.7") == "10.0.0.8"
+    assert PortalAuthService.client_address("172.18.0.5", None) == "172.18.0.5"
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import database
+from models.db import Base, RadAcct
+from services import radacct_archive
+from services.radacct_archive import RadAcctArchive, RadAcctArchiver
+from services.subscriber_index import SubscriberService
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+def _session(n: int, ip: str, start: datetime, stop: datetime) -> RadAcct:
+    # Explicit ids: SQLite only autoincrements INTEGER primary keys, not BIGINT
+    return RadAcct(radacctid=n, acctsessionid=f"s{n}", username=f"user{n}", acctstarttime=start, acctstoptime=stop,
+                   acctsessiontime=int((stop - start).total_seconds()),
+                   acctinputoctets=1000 * n, acctoutputoctets=100 * n, callingstationid=f"aa:bb:cc:00:00:{n:02x}",
+                   framedipaddress=ip)
+
+@pytest.fixture
+def radacct(monkeypatch):
+    monkeypatch.setattr(RadAcctArchive, "_segments", {})
+    monkeypatch.setattr(RadAcctArchive, "_version", None)
+    Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        db.add_all([
+            # Two days past the retention window, then one inside it
+            _session(1, "10.0.0.1", NOW - timedelta(days=40, hours=2), NOW - timedelta(days=40, hours=1)),
+            _session(2, "10.0.0.2", NOW - timedelta(days=35, hours=2), NOW - timedelta(days=35, hours=1)),
+            _session(3, "10.0.0.1", NOW - timedelta(days=2, hours=2), NOW - timedelta(days=2, hours=1)),
+        ])
+        db.commit()
+    yield
+    Base.metadata.drop_all(bind=database.engine)
+    shutil.rmtree(radacct_archive.RADACCT_ARCHIVE_DIR, ignore_errors=True)
+    SubscriberService._cached = None
+
+def _catalog() -> dict:
+    with open(os.path.join(radacct_archive.RADACCT_ARCHIVE_DIR, radacct_archive.CATALOG_FILE)) as f:
+        return json.load(f)
+
+def test_each_segment_is_published_as_soon_as_it_is_written(radacct, monkeypatch):
+    archive_rows = RadAcctArchiver._archive_rows
+
+    def fail_on_second_day(db, day, rows):
+        if day.date() == (NOW - timedelta(days=35)).date():
+            raise RuntimeError("disk full")
+        archive_rows(db, day, rows)
+
+    monkeypatch.setattr(RadAcctArchiver, "_archive_rows", staticmethod(fail_on_second_day))
+    with pytest.raises(RuntimeError):
+        RadAcctArchiver.run(retention_days=30, now=NOW)
+
+    # The first day's segment is visible even though the run never finished
+    assert _catalog()["segments_written"] == 1
+    assert RadAcctArchive.totals()["sessions"] == 1
+
+    monkeypatch.undo()
+    assert RadAcctArchiver.run(retention_days=30, now=NOW)["segments_written"] == 1
+    assert RadAcctArchive.totals()["sessions"] == 2
+    with database.SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(RadAcct)) == 1
+
+def test_subscriber_index_includes_archived_sessions(radacct):
+    RadAcctArchiver.run(retention_days=30, now=NOW)
+
+    async def load():
+        async with database.AsyncSessionLocal() as db:
+            index = await SubscriberService.load_index(db, {"10.0.0.1", "10.0.0.2", "10.9.9.9"},
+                                                       NOW - timedelta(days=60), NOW)
+        await database.async_engine.dispose()
+        return index
+
+    index = asyncio.run(load())
+    assert index.sessions == 3
+    archived = index.owner_at("10.0.0.1", NOW - timedelta(days=40, hours=1, minutes=30))
+    assert archived["username"] == "user1" and archived["mac"] == "aa:bb:cc:00:00:01"
+    assert index.owner_at("10.0.0.2", NOW - timedelta(days=35, hours=1, minutes=30))["session_id"] == "s2"
+    assert index.owner_at("10.0.0.1", NOW - timedelta(days=2, hours=1, minutes=30))["username"] == "user3"
+    assert index.owner_at("10.0.0.1", NOW - timedelta(days=20)) is None
+
+@pytest.mark.parametrize("distinct", [None, 10 ** 6])
+def test_archived_sessions_by_dictionary_or_bloom_filter(radacct, distinct):
+    RadAcctArchiver.run(retention_days=30, now=NOW)
+    if distinct:
+        # Segments this large are probed per address through their bloom filter
+        for segment in RadAcctArchive.segments():
+            segment.columns["framedipaddress"]["distinct"] = distinct
+    rows = RadAcctArchive.sessions_on(["10.0.0.1", "10.9.9.9"], NOW - timedelta(days=60), NOW)
+    assert [(ip, username, session_id) for ip, _, _, username, _, session_id in rows] == [("10.0.0.1", "user1", "s1")]
+    assert RadAcctArchive.sessions_on(["10.0.0.2"], NOW - timedelta(days=30), NOW) == []
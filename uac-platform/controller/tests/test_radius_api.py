@@ -0,0 +1,52 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import database
+from models.db import Base, RadCheck, RadReply
+from routers import radius
+
+@pytest.fixture(scope="module")
+def client():
+    # conftest's DATABASE_URL is a SQLite file, so the routers run on the aiosqlite engine
+    assert database.ASYNC_DATABASE_URL.startswith("sqlite+aiosqlite://")
+    Base.metadata.create_all(bind=database.engine)
+    app = FastAPI()
+    app.include_router(radius.router)
+    with TestClient(app) as client:
+        yield client
+        # The pooled aiosqlite connections belong to this client's event loop
+        client.portal.call(database.async_engine.dispose)
+    Base.metadata.drop_all(bind=database.engine)
+
+def test_create_and_get_user(client):
+    response = client.post("/radius/users", json={
+        "username": "alice", "password": "s3cret", "vlan_id": "100", "session_timeout": 3600
+    })
+    assert response.status_code == 200
+    assert response.json() == {"message": "User alice created successfully"}
+
+    user = client.get("/radius/users/alice").json()
+    assert user["username"] == "alice"
+    assert user["checks"] == ["Cleartext-Password"]
+    assert sorted(user["replies"]) == ["Session-Timeout", "Tunnel-Medium-Type", "Tunnel-Private-Group-Id", "Tunnel-Type"]
+
+    # Written through the async session, visible to the sync engine
+    with database.SessionLocal() as db:
+        assert db.scalar(select(RadCheck.value).where(RadCheck.username == "alice")) == "s3cret"
+        vlan = db.scalar(select(RadReply.value).where(RadReply.username == "alice", RadReply.attribute == "Tunnel-Private-Group-Id"))
+        assert vlan == "100"
+
+def test_create_user_without_optional_attributes(client):
+    assert client.post("/radius/users", json={"username": "bob", "password": "pw"}).status_code == 200
+    assert client.get("/radius/users/bob").json() == {"username": "bob", "checks": ["Cleartext-Password"], "replies": []}
+
+def test_duplicate_username_is_rejected(client):
+    client.post("/radius/users", json={"username": "carol", "password": "pw"})
+    response = client.post("/radius/users", json={"username": "carol", "password": "other"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already exists"
+
+def test_unknown_user_is_404(client):
+    assert client.get("/radius/users/nobody").status_code == 404
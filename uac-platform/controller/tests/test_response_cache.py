@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import response_cache
+from services.response_cache import ResponseCache, cached
+
+@pytest.fixture
+def server(monkeypatch):
+    """ One FakeServer behind both clients, as Redis is shared by every worker """
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(ResponseCache, "_thread_locks", {})
+    monkeypatch.setattr(ResponseCache, "_async_locks", {})
+    server = fakeredis.FakeServer()
+    ResponseCache.configure(fakeredis.FakeRedis(server=server), fakeredis.FakeAsyncRedis(server=server))
+    yield server
+    ResponseCache.configure()
+
+class Counter:
+    def __init__(self, value=None, delay: float = 0.0):
+        self.calls = 0
+        self.value = value if value is not None else {"ok": True}
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+    async def async_call(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+def test_hit_then_miss_after_invalidate(server):
+    compute = Counter({"interfaces": ["eth0"]})
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute) == (b'{"interfaces":["eth0"]}', "MISS")
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute) == (b'{"interfaces":["eth0"]}', "HIT")
+    assert compute.calls == 1
+
+    ResponseCache.invalidate("vpn")
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute)[1] == "HIT"
+
+    ResponseCache.invalidate("network")
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute)[1] == "MISS"
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute)[1] == "HIT"
+    assert compute.calls == 2
+
+def test_entries_expire_with_their_ttl(server):
+    compute = Counter()
+    ResponseCache.get_or_compute("k", ("network",), 0.05, compute)
+    time.sleep(0.1)
+    assert ResponseCache.get_or_compute("k", ("network",), 0.05, compute)[1] == "MISS"
+    assert compute.calls == 2
+
+def test_cached_endpoint_sets_x_cache_and_keys_on_parameters(server):
+    app = FastAPI()
+    compute = Counter()
+
+    @app.get("/items")
+    @cached("test.items", ttl=30, tags=("network",))
+    def items(page: int = 1):
+        compute()
+        return {"page": page}
+
+    client = TestClient(app)
+    first = client.get("/items", params={"page": 1})
+    assert first.json() == {"page": 1} and first.headers["X-Cache"] == "MISS"
+    assert client.get("/items", params={"page": 1}).headers["X-Cache"] == "HIT"
+    assert client.get("/items", params={"page": 2}).headers["X-Cache"] == "MISS"
+    ResponseCache.invalidate("network")
+    assert client.get("/items", params={"page": 1}).headers["X-Cache"] == "MISS"
+    assert compute.calls == 3
+
+def test_concurrent_misses_compute_once(server):
+    compute = Counter({"slow": True}, delay=0.2)
+    results = []
+
+    def request():
+        results.append(ResponseCache.get_or_compute("k", ("network",), 30, compute))
+
+    threads = [threading.Thread(target=request) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert compute.calls == 1
+    assert {body for body, _ in results} == {b'{"slow":true}'}
+    assert sorted(status for _, status in results) == ["HIT"] * 9 + ["MISS"]
+
+def test_concurrent_async_misses_compute_once(server):
+    compute = Counter({"slow": True}, delay=0.2)
+
+    async def run():
+        return await asyncio.gather(*(
+            ResponseCache.get_or_compute_async("k", ("analytics",), 10, compute.async_call) for _ in range(10)
+        ))
+
+    results = asyncio.run(run())
+    assert compute.calls == 1
+    assert sorted(status for _, status in results) == ["HIT"] * 9 + ["MISS"]
+
+def test_other_worker_waits_for_the_fill_lock(server):
+    # Another worker holds the fill lock in Redis and stores its result shortly after
+    key = ResponseCache.entry_key("network.interfaces", {})
+    other_worker = fakeredis.FakeRedis(server=server)
+    other_worker.set(key + ":fill", b"1")
+    threading.Timer(0.1, lambda: other_worker.set(key, ResponseCache._encode([0], b'{"from":"other"}'))).start()
+
+    compute = Counter({"from": "us"})
+    assert ResponseCache.get_or_compute(key, ("network",), 30, compute) == (b'{"from":"other"}', "HIT")
+    assert compute.calls == 0
+
+def test_bypass_when_redis_raises(server):
+    server.connected = False
+    compute = Counter()
+
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute) == (b'{"ok":true}', "BYPASS")
+    assert not ResponseCache.available()
+    # Still bypassed while the retry window lasts, even once Redis is back
+    server.connected = True
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute)[1] == "BYPASS"
+    assert compute.calls == 2
+
+    ResponseCache._down_until = 0.0
+    assert ResponseCache.get_or_compute("k", ("network",), 30, compute)[1] == "MISS"
+
+def test_async_bypass_and_invalidate_when_redis_raises(server):
+    server.connected = False
+    compute = Counter()
+    body, status = asyncio.run(ResponseCache.get_or_compute_async("k", ("vpn",), 5, compute.async_call))
+    assert (body, status) == (b'{"ok":true}', "BYPASS")
+    # Write paths never fail because of the cache
+    ResponseCache.invalidate("vpn")
+
+def test_compute_errors_propagate(server):
+    def broken():
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        ResponseCache.get_or_compute("k", ("network",), 30, broken)
+    # The fill lock was released, so the next request computes right away
+    assert ResponseCache.get_or_compute("k", ("network",), 30, Counter())[1] == "MISS"
@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+import database
+import main
+from models.db import Base
+
+def test_missing_tables_are_503_not_500():
+    Base.metadata.drop_all(bind=database.engine)
+    # No lifespan: DB_AUTO_CREATE isn't set here, and the schema must stay missing
+    client = TestClient(main.app, raise_server_exceptions=False)
+    for path in ("/analytics/summary", "/radius/users/alice"):
+        response = client.get(path)
+        assert response.status_code == 503
+        assert response.json() == {"detail": "Database schema is not initialized"}
@@ -0,0 +1,46 @@
+import pytest
+
+from models.network import VpnPeer
+from services.vpn import PeerConflictError, PeerRegistry, VpnConfigService
+
+@pytest.fixture(autouse=True)
+def no_peers():
+    VpnConfigService.save_peers([])
+    yield
+    VpnConfigService.save_peers([])
+
+def _peer(name: str, **fields) -> VpnPeer:
+    return VpnPeer(name=name, endpoint="203.0.113.1:51820", public_key=f"{name}-key=", **fields)
+
+def test_default_l3_peers_and_an_l2_peer_coexist():
+    VpnConfigService.add_peer(_peer("hq"))
+    VpnConfigService.add_peer(_peer("branch"))
+    VpnConfigService.add_peer(_peer("bridge", mode="L2", allowed_ips="192.168.50.0/24", target_vlan="50"))
+    assert {p["name"] for p in VpnConfigService.get_all_peers()} == {"hq", "branch", "bridge"}
+    # Nothing was routed explicitly through wg0, and L2 prefixes aren't wg0 routes
+    assert PeerRegistry.find_by_address("192.168.50.10") is None
+
+def test_hub_default_route_and_spoke_prefixes_use_the_longest_match():
+    VpnConfigService.add_peer(_peer("hub", allowed_ips="0.0.0.0/0"))
+    VpnConfigService.add_peer(_peer("spoke", allowed_ips="10.1.0.0/24, 10.1.1.0/24"))
+    VpnConfigService.add_peer(_peer("site", allowed_ips="10.1.0.128/25"))
+    assert PeerRegistry.find_by_address("10.1.0.200")["name"] == "site"
+    assert PeerRegistry.find_by_address("10.1.0.5")["name"] == "spoke"
+    assert PeerRegistry.find_by_address("8.8.8.8")["name"] == "hub"
+
+def test_the_same_prefix_twice_is_rejected_per_mode():
+    VpnConfigService.add_peer(_peer("spoke", allowed_ips="10.2.0.0/24"))
+    with pytest.raises(PeerConflictError) as conflict:
+        VpnConfigService.add_peer(_peer("other", allowed_ips="10.2.0.0/24"))
+    assert conflict.value.field == "allowed_ips"
+    assert "spoke" in str(conflict.value)
+    # A bridged site may use the same subnet: it isn't routed through wg0
+    VpnConfigService.add_peer(_peer("bridge", mode="L2", allowed_ips="10.2.0.0/24", target_vlan="20"))
+    with pytest.raises(PeerConflictError):
+        VpnConfigService.add_peer(_peer("bridge2", mode="L2", allowed_ips="10.2.0.0/24", target_vlan="21"))
+
+def test_removed_prefixes_can_be_reused():
+    VpnConfigService.add_peer(_peer("spoke", allowed_ips="10.3.0.0/24"))
+    VpnConfigService.delete_peer("spoke")
+    VpnConfigService.add_peer(_peer("spoke2", allowed_ips="10.3.0.0/24"))
+    assert PeerRegistry.find_by_address("10.3.0.1")["name"] == "spoke2"
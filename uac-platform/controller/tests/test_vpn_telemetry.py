@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from services import vpn_telemetry
+from services.vpn_telemetry import VpnTelemetryService, parse_dump
+
+PEER_A = "QwPF6dnB8rUzB2VM2+7RsT1oTRpzLrUh7dQWqNDJqQg="
+PEER_IDLE = "HnT/0cO0j0ThJmA4v+6mW0bQBXp1jX0WbnF1/2Zy9m8="
+PEER_WG1 = "Z1bZ2KqM8D3X0fJ3gQ4lYqH6vW7rU8sT9nO0pM1aL2k="
+
+with open(os.path.join(FIXTURES_DIR, "wg_show_all_dump.txt")) as f:
+    DUMP = f.read()
+
+def _dump(counters: dict, drop: tuple = ()) -> str:
+    """ The fixture with {public_key: (rx, tx)} substituted and the peers in `drop` left out """
+    lines = []
+    for line in DUMP.splitlines():
+        fields = line.split("\t")
+        if len(fields) == 9:
+            if fields[1] in drop:
+                continue
+            if fields[1] in counters:
+                fields[6], fields[7] = (str(v) for v in counters[fields[1]])
+        lines.append("\t".join(fields))
+    return "\n".join(lines) + "\n"
+
+@pytest.fixture(autouse=True)
+def fresh_telemetry(monkeypatch):
+    monkeypatch.setattr(VpnTelemetryService, "_history", {})
+    monkeypatch.setattr(VpnTelemetryService, "_latest", {})
+    monkeypatch.setattr(VpnTelemetryService, "_last_sample", 0.0)
+    monkeypatch.setattr(VpnTelemetryService, "dump_reader", staticmethod(lambda: None))
+
+def test_parse_dump_reads_peer_lines_only():
+    peers = parse_dump(DUMP)
+    assert set(peers) == {PEER_A, PEER_IDLE, PEER_WG1}
+    assert peers[PEER_A] == {"interface": "wg0", "endpoint": "198.51.100.7:51820", "latest_handshake": 1700000000,
+                             "rx_bytes": 1000000, "tx_bytes": 500000}
+    assert peers[PEER_IDLE]["endpoint"] is None
+    assert peers[PEER_WG1]["interface"] == "wg1"
+
+def test_parse_dump_skips_malformed_lines():
+    broken = DUMP.replace("\t1000000\t", "\tnot-a-number\t")
+    assert PEER_A not in parse_dump(broken)
+    assert parse_dump("") == {}
+
+def test_join_attaches_rates_from_the_last_two_samples():
+    VpnTelemetryService.ingest(_dump({PEER_A: (1_000_000, 500_000)}), now=1000.0)
+    VpnTelemetryService.ingest(_dump({PEER_A: (1_250_000, 600_000)}), now=1010.0)
+    # Pretend the last sample is fresh so join() doesn't try to run `wg`
+    VpnTelemetryService._last_sample = time.time()
+
+    peers = VpnTelemetryService.join([
+        {"name": "site-a", "public_key": PEER_A},
+        {"name": "idle", "public_key": PEER_IDLE},
+        {"name": "unknown", "public_key": "not-on-any-interface"},
+    ])
+    by_name = {p["name"]: p["telemetry"] for p in peers}
+    assert by_name["site-a"]["rx_bps"] == 250_000 * 8 / 10
+    assert by_name["site-a"]["tx_bps"] == 100_000 * 8 / 10
+    assert by_name["site-a"]["rx_bytes"] == 1_250_000
+    assert by_name["site-a"]["online"] is False  # the fixture's handshake is long past
+    assert by_name["idle"]["last_handshake"] is None
+    assert by_name["idle"]["online"] is False
+    assert by_name["unknown"] is None
+
+def test_single_sample_and_counter_reset_have_no_rate():
+    VpnTelemetryService.ingest(_dump({PEER_A: (5000, 5000)}), now=1000.0)
+    assert VpnTelemetryService.get_peer_stats(PEER_A, now=1000.0)["rx_bps"] is None
+    VpnTelemetryService.ingest(_dump({PEER_A: (10, 10)}), now=1010.0)
+    stats = VpnTelemetryService.get_peer_stats(PEER_A, now=1010.0)
+    assert stats["rx_bps"] is None and stats["tx_bps"] is None
+
+def test_ring_buffer_keeps_the_latest_samples(monkeypatch):
+    monkeypatch.setattr(vpn_telemetry, "TELEMETRY_HISTORY", 5)
+    for i in range(8):
+        VpnTelemetryService.ingest(_dump({PEER_A: (i * 1000, i * 100)}), now=1000.0 + i * 10)
+
+    history = VpnTelemetryService.get_peer_stats(PEER_A, include_history=True, now=1100.0)["history"]
+    assert [h["timestamp"] for h in history] == [1030.0, 1040.0, 1050.0, 1060.0, 1070.0]
+    assert history[-1]["rx_bytes"] == 7000
+
+def test_peers_missing_from_a_dump_are_forgotten():
+    VpnTelemetryService.ingest(DUMP, now=1000.0)
+    VpnTelemetryService.ingest(_dump({}, drop=(PEER_WG1,)), now=1010.0)
+    assert VpnTelemetryService.get_peer_stats(PEER_WG1) is None
+    assert len(VpnTelemetryService._history[PEER_A]) == 2
+
+def test_concurrent_expired_samples_run_wg_once(monkeypatch):
+    calls = []
+
+    def slow_dump():
+        calls.append(1)
+        time.sleep(0.1)
+        return DUMP
+
+    monkeypatch.setattr(VpnTelemetryService, "dump_reader", staticmethod(slow_dump))
+    threads = [threading.Thread(target=VpnTelemetryService.sample) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert VpnTelemetryService.get_peer_stats(PEER_A) is not None